@@ -1,21 +1,167 @@
+import os
 import numpy as np
+from collections import OrderedDict
+from threading import Lock
+from core.detection_config import DETECTION_CONFIG
+
+AUDIO_SAMPLE_RATE = 16000
+
+# Decoded soundtracks with their voice activity, shared by the audio methods of
+# an analysis; keyed by file identity so a reused temp path never serves
+# another clip, and dropped by release_audio() when the analysis ends
+AUDIO_CACHE_ENTRIES = 2
+_audio_cache = OrderedDict()
+_audio_cache_lock = Lock()
+
+def _file_key(audio_path):
+    """(path, inode, mtime, size): changes whenever the file at a path is replaced or rewritten"""
+    stat = os.stat(audio_path)
+    return audio_path, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+def _decoded_audio(audio_path):
+    """Cache entry for a soundtrack: decoded samples, rate and voiced spans"""
+    key = _file_key(audio_path)
+    with _audio_cache_lock:
+        entry = _audio_cache.get(key)
+        if entry is not None:
+            _audio_cache.move_to_end(key)
+            return entry
+    
+    import librosa
+    audio, sr = librosa.load(audio_path, sr=AUDIO_SAMPLE_RATE)
+    segments = tuple(detect_voice_activity(audio, sr))
+    if segments:
+        voiced_audio = np.concatenate([audio[s:e] for s, e in segments])
+    else:
+        voiced_audio = np.zeros(0, dtype=audio.dtype)
+    entry = {'audio': audio, 'sr': sr, 'voiced_audio': voiced_audio, 'segments': segments}
+    
+    with _audio_cache_lock:
+        _audio_cache[key] = entry
+        while len(_audio_cache) > AUDIO_CACHE_ENTRIES:
+            _audio_cache.popitem(last=False)
+    return entry
+
+def release_audio(audio_path):
+    """Drop the cached decode of a soundtrack once its analysis is done"""
+    with _audio_cache_lock:
+        for key in [key for key in _audio_cache if key[0] == audio_path]:
+            del _audio_cache[key]
+
+def _load_audio(audio_path):
+    """Decode the soundtrack once and share it between the audio methods"""
+    entry = _decoded_audio(audio_path)
+    return entry['audio'], entry['sr']
+
+def _frame_features(audio, frame_length):
+    """Short-time RMS energy and zero-crossing rate on non-overlapping frames"""
+    n_frames = len(audio) // frame_length
+    if n_frames == 0:
+        return np.zeros(0), np.zeros(0)
+    
+    framed = audio[:n_frames * frame_length].reshape(n_frames, frame_length)
+    energy = np.sqrt(np.mean(framed.astype(np.float64) ** 2, axis=1))
+    zcr = np.mean(np.signbit(framed[:, 1:]) != np.signbit(framed[:, :-1]), axis=1)
+    return energy, zcr
+
+def detect_voice_activity(audio, sr):
+    """Energy/zero-crossing voice activity detector.
+    
+    Returns a list of (start_sample, end_sample) spans that contain voiced speech.
+    """
+    frame_length = int(sr * DETECTION_CONFIG['vad_frame_ms'] / 1000)
+    energy, zcr = _frame_features(audio, frame_length)
+    if len(energy) == 0:
+        return []
+    
+    # Adaptive threshold between the noise floor and the loud frames
+    noise_floor = np.percentile(energy, 10)
+    peak = np.percentile(energy, 95)
+    threshold = max(noise_floor + DETECTION_CONFIG['vad_energy_ratio'] * (peak - noise_floor), 1e-4)
+    
+    # Voiced speech is loud with a low zero-crossing rate (noise/fricatives are high)
+    voiced = (energy > threshold) & (zcr < DETECTION_CONFIG['vad_zcr_max'])
+    
+    # Bridge short pauses between words, then drop blips too short to be speech
+    hangover = max(1, DETECTION_CONFIG['vad_hangover_ms'] // DETECTION_CONFIG['vad_frame_ms'])
+    min_speech = max(1, DETECTION_CONFIG['vad_min_speech_ms'] // DETECTION_CONFIG['vad_frame_ms'])
+    
+    runs = []
+    start = None
+    for i, is_voiced in enumerate(voiced):
+        if is_voiced and start is None:
+            start = i
+        elif not is_voiced and start is not None:
+            runs.append([start, i])
+            start = None
+    if start is not None:
+        runs.append([start, len(voiced)])
+    
+    merged = []
+    for run in runs:
+        if merged and run[0] - merged[-1][1] <= hangover:
+            merged[-1][1] = run[1]
+        else:
+            merged.append(run)
+    
+    return [(s * frame_length, e * frame_length) for s, e in merged if e - s >= min_speech]
+
+def get_voiced_audio(audio_path):
+    """Load audio and keep only voiced spans.
+    
+    Returns (voiced_audio, sr, segments, total_samples) where segments are sample spans.
+    """
+    entry = _decoded_audio(audio_path)
+    return entry['voiced_audio'], entry['sr'], entry['segments'], len(entry['audio'])
+
+def get_voice_activity_summary(audio_path):
+    """Segment map of voiced speech for analysis_summary"""
+    try:
+        voiced_audio, sr, segments, total_samples = get_voiced_audio(audio_path)
+    except Exception:
+        return None
+    
+    total_seconds = total_samples / sr if sr else 0.0
+    voiced_seconds = len(voiced_audio) / sr if sr else 0.0
+    return {
+        'segments': [{'start': round(s / sr, 3), 'end': round(e / sr, 3)} for s, e in segments],
+        'segment_count': len(segments),
+        'voiced_seconds': round(voiced_seconds, 3),
+        'total_seconds': round(total_seconds, 3),
+        'voiced_ratio': round(voiced_seconds / total_seconds, 3) if total_seconds > 0 else 0.0
+    }
 
 def analyze_audio_video_sync(audio_path, mouth_movements):
     if audio_path is None or len(mouth_movements) < 5:
         return 0.5
     
     try:
-        import librosa
-        audio, sr = librosa.load(audio_path, sr=16000)
+        audio, sr = _load_audio(audio_path)
+        _, _, segments, _ = get_voiced_audio(audio_path)
+        if not segments:
+            return 0.5  # No speech to correlate against
         
         # Extract audio energy envelope
         hop_length = 512
-        energy = librosa.feature.rms(y=audio, hop_length=hop_length)[0]
+        energy, _ = _frame_features(audio, hop_length)
+        
+        # Per-hop voiced mask from the VAD segment map
+        voiced_mask = np.zeros(len(energy), dtype=bool)
+        for s, e in segments:
+            voiced_mask[s // hop_length:(e + hop_length - 1) // hop_length] = True
         
         # Resample to match video frames
         target_length = len(mouth_movements)
-        if len(energy) > target_length:
-            energy = np.interp(np.linspace(0, len(energy), target_length), np.arange(len(energy)), energy)
+        positions = np.linspace(0, len(energy) - 1, target_length)
+        energy = np.interp(positions, np.arange(len(energy)), energy)
+        voiced_mask = voiced_mask[np.round(positions).astype(int)]
+        
+        # Correlate only where someone is actually speaking
+        mouth_movements = np.asarray(mouth_movements, dtype=np.float64)
+        if np.sum(voiced_mask) < 5:
+            return 0.5
+        energy = energy[voiced_mask]
+        mouth_movements = mouth_movements[voiced_mask]
         
         # Normalize
         energy = (energy - np.min(energy)) / (np.max(energy) - np.min(energy) + 1e-7)
@@ -31,7 +177,7 @@ def analyze_audio_video_sync(audio_path, mouth_movements):
             return 0.6
         else:
             return 0.3  # Poor sync (deepfake)
-    except:
+    except Exception:
         return 0.5
 
 def detect_audio_anomalies(audio_path):
@@ -40,7 +186,9 @@ def detect_audio_anomalies(audio_path):
     
     try:
         import librosa
-        audio, sr = librosa.load(audio_path, sr=16000)
+        audio, sr, _, _ = get_voiced_audio(audio_path)
+        if len(audio) < sr * DETECTION_CONFIG['vad_min_speech_ms'] / 1000:
+            return 0.5  # Not enough speech to judge
         
         # Spectral analysis
         spectral_centroids = librosa.feature.spectral_centroid(y=audio, sr=sr)[0]
@@ -57,7 +205,7 @@ def detect_audio_anomalies(audio_path):
             return 0.3  # Unnatural (synthetic)
         else:
             return 0.6
-    except:
+    except Exception:
         return 0.5
 
 def analyze_pitch_consistency(audio_path):
@@ -66,17 +214,15 @@ def analyze_pitch_consistency(audio_path):
     
     try:
         import librosa
-        audio, sr = librosa.load(audio_path, sr=16000)
+        audio, sr, _, _ = get_voiced_audio(audio_path)
+        if len(audio) < sr * DETECTION_CONFIG['vad_min_speech_ms'] / 1000:
+            return 0.5
         
         # Extract pitch
         pitches, magnitudes = librosa.piptrack(y=audio, sr=sr)
-        pitch_values = []
-        
-        for t in range(pitches.shape[1]):
-            index = magnitudes[:, t].argmax()
-            pitch = pitches[index, t]
-            if pitch > 0:
-                pitch_values.append(pitch)
+        strongest = magnitudes.argmax(axis=0)
+        pitch_values = pitches[strongest, np.arange(pitches.shape[1])]
+        pitch_values = pitch_values[pitch_values > 0]
         
         if len(pitch_values) < 10:
             return 0.5
@@ -90,5 +236,21 @@ def analyze_pitch_consistency(audio_path):
             return 0.3  # Too consistent (synthetic)
         else:
             return 0.6
-    except:
+    except Exception:
         return 0.5
+
+def analyze_audio_track(audio_path, mouth_movements=None):
+    """Run the audio methods on voiced spans only and report the segment map"""
+    individual_scores = {
+        'audio_anomalies': detect_audio_anomalies(audio_path),
+        'pitch_consistency': analyze_pitch_consistency(audio_path)
+    }
+    if mouth_movements is not None:
+        individual_scores['audio_sync'] = analyze_audio_video_sync(audio_path, mouth_movements)
+    
+    return {
+        'individual_scores': individual_scores,
+        'analysis_summary': {
+            'voice_activity': get_voice_activity_summary(audio_path) if audio_path else None
+        }
+    }
@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 from skimage.feature import local_binary_pattern
+from core.detection_utils import get_face_cascade
 
 def analyze_color_gradient_discontinuity(frame):
     """Check gradient discontinuity between face & background"""
@@ -8,7 +9,7 @@ def analyze_color_gradient_discontinuity(frame):
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
         # Face detection
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        face_cascade = get_face_cascade()
         faces = face_cascade.detectMultiScale(gray, 1.1, 4)
         
         if len(faces) == 0:
@@ -40,7 +41,7 @@ def detect_texture_mismatch_lbp(frame):
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
         # Face detection
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        face_cascade = get_face_cascade()
         faces = face_cascade.detectMultiScale(gray, 1.1, 4)
         
         if len(faces) == 0:
@@ -87,7 +88,7 @@ def analyze_edge_sharpness_transition(frame):
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
         # Face detection
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        face_cascade = get_face_cascade()
         faces = face_cascade.detectMultiScale(gray, 1.1, 4)
         
         if len(faces) == 0:
@@ -126,7 +127,7 @@ def detect_blending_artifacts(frame):
         
         # Face detection
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        face_cascade = get_face_cascade()
         faces = face_cascade.detectMultiScale(gray, 1.1, 4)
         
         if len(faces) == 0:
@@ -157,7 +158,7 @@ def analyze_frequency_domain_artifacts(frame):
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
         # Face detection
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        face_cascade = get_face_cascade()
         faces = face_cascade.detectMultiScale(gray, 1.1, 4)
         
         if len(faces) == 0:
@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 from scipy.signal import correlate
+from core.detection_utils import get_face_cascade
 
 def extract_visual_intensity_envelope(frames):
     """Extract visual intensity envelope from frames"""
@@ -11,7 +12,7 @@ def extract_visual_intensity_envelope(frames):
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if len(frame.shape) == 3 else frame
             
             # Focus on face region if detectable
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            face_cascade = get_face_cascade()
             faces = face_cascade.detectMultiScale(gray, 1.1, 4)
             
             if len(faces) > 0:
@@ -73,7 +74,7 @@ def analyze_mouth_movement_correlation(frames):
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if len(frame.shape) == 3 else frame
             
             # Detect face
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            face_cascade = get_face_cascade()
             faces = face_cascade.detectMultiScale(gray, 1.1, 4)
             
             if len(faces) > 0:
@@ -1,39 +1,39 @@
 import cv2
 import numpy as np
-from core.detection_utils import get_face_detector, get_landmark_predictor, eye_aspect_ratio, mouth_aspect_ratio, get_head_pose
+from core.detection_utils import (
+    get_landmark_predictor, eye_aspect_ratios, mouth_aspect_ratios, head_pose_vectors
+)
+from core.face_tracking import build_face_tracks
+from core.shared_intermediates import compute_gray_stack, compute_landmarks
 from core.detection_config import DETECTION_CONFIG
 
-def detect_blink_irregularity(frames):
-    predictor = get_landmark_predictor()
-    detector = get_face_detector()
-    
-    if predictor is None:
+def _strided_points(frames, stride, landmarks=None):
+    """(N, 68, 2) landmarks of the frames at multiples of stride that have a face.
+    
+    Uses the shared landmark stack when given, otherwise tracks faces over
+    the sampled frames and predicts their landmarks.
+    """
+    if landmarks is None:
+        gray = compute_gray_stack(list(frames[::stride]))
+        landmarks = compute_landmarks(gray, build_face_tracks(gray))
+        return landmarks['points'] if landmarks is not None else np.zeros((0, 68, 2), dtype=np.int16)
+    
+    return landmarks['points'][landmarks['frame_indices'] % stride == 0]
+
+def detect_blink_irregularity(frames, landmarks=None):
+    if landmarks is None and get_landmark_predictor() is None:
         return 0.5
     
-    ear_values = []
-    blink_count = 0
-    prev_ear = 0.3
+    points = _strided_points(frames, 2, landmarks)
+    if len(points) == 0:
+        return 0.5
     
-    for frame in frames[::2]:
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = detector(gray)
-        
-        if len(faces) == 0:
-            continue
-        
-        landmarks = predictor(gray, faces[0])
-        left_eye = np.array([(landmarks.part(i).x, landmarks.part(i).y) for i in range(36, 42)])
-        right_eye = np.array([(landmarks.part(i).x, landmarks.part(i).y) for i in range(42, 48)])
-        
-        ear = (eye_aspect_ratio(left_eye) + eye_aspect_ratio(right_eye)) / 2.0
-        ear_values.append(ear)
-        
-        if ear < DETECTION_CONFIG['ear_threshold'] and prev_ear >= DETECTION_CONFIG['ear_threshold']:
-            blink_count += 1
-        prev_ear = ear
+    ear_values = (eye_aspect_ratios(points[:, 36:42]) + eye_aspect_ratios(points[:, 42:48])) / 2.0
     
-    if len(ear_values) == 0:
-        return 0.5
+    # A blink starts where EAR drops below the threshold (open eyes assumed before the first frame)
+    threshold = DETECTION_CONFIG['ear_threshold']
+    prev_ear = np.concatenate([[0.3], ear_values[:-1]])
+    blink_count = int(np.sum((ear_values < threshold) & (prev_ear >= threshold)))
     
     blink_rate = blink_count / (len(frames) / 30.0)
     ear_variance = np.var(ear_values)
@@ -46,26 +46,11 @@ def detect_blink_irregularity(frames):
     else:
         return 0.2
 
-def analyze_lip_sync(frames, audio_path=None):
-    predictor = get_landmark_predictor()
-    detector = get_face_detector()
-    
-    if predictor is None or audio_path is None:
+def analyze_lip_sync(frames, audio_path=None, landmarks=None):
+    if (landmarks is None and get_landmark_predictor() is None) or audio_path is None:
         return 0.5
     
-    mouth_movements = []
-    
-    for frame in frames[::3]:
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = detector(gray)
-        
-        if len(faces) == 0:
-            continue
-        
-        landmarks = predictor(gray, faces[0])
-        mouth = np.array([(landmarks.part(i).x, landmarks.part(i).y) for i in range(48, 68)])
-        mar = mouth_aspect_ratio(mouth)
-        mouth_movements.append(mar)
+    mouth_movements = mouth_aspect_ratios(_strided_points(frames, 3, landmarks)[:, 48:68])
     
     if len(mouth_movements) < 5:
         return 0.5
@@ -80,36 +65,16 @@ def analyze_lip_sync(frames, audio_path=None):
     else:
         return 0.3
 
-def analyze_head_pose(frames):
-    predictor = get_landmark_predictor()
-    detector = get_face_detector()
-    
-    if predictor is None:
+def analyze_head_pose(frames, landmarks=None):
+    if landmarks is None and get_landmark_predictor() is None:
         return 0.5
     
-    pose_vectors = []
-    
-    for frame in frames[::4]:
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = detector(gray)
-        
-        if len(faces) == 0:
-            continue
-        
-        landmarks = predictor(gray, faces[0])
-        landmark_points = np.array([(landmarks.part(i).x, landmarks.part(i).y) for i in range(68)])
-        
-        rotation = get_head_pose(landmark_points, frame.shape)
-        if rotation is not None:
-            pose_vectors.append(rotation.flatten())
-    
+    pose_vectors = head_pose_vectors(_strided_points(frames, 4, landmarks), frames[0].shape)
     if len(pose_vectors) < 3:
         return 0.5
     
-    pose_changes = [np.linalg.norm(pose_vectors[i+1] - pose_vectors[i]) for i in range(len(pose_vectors)-1)]
-    
-    if len(pose_changes) == 0:
-        return 0.5
+    # The thresholds below are in rotation-vector distance between consecutive poses
+    pose_changes = np.linalg.norm(np.diff(pose_vectors, axis=0), axis=1)
     
     avg_change = np.mean(pose_changes)
     variance = np.var(pose_changes)
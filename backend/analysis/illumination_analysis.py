@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 from scipy.stats import entropy
+from core.detection_utils import get_face_cascade
 
 def color_histogram_difference(face, background):
     """Compare face region histogram with background"""
@@ -89,7 +90,7 @@ def analyze_illumination_consistency(frames):
             frame = frames[i]
             
             # Face detection for region analysis
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            face_cascade = get_face_cascade()
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
             faces = face_cascade.detectMultiScale(gray, 1.1, 4)
             
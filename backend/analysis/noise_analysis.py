@@ -28,14 +28,19 @@ def analyze_fft_spectrum(frame):
     else:
         return 0.6
 
-def detect_prnu_noise(frames):
+def detect_prnu_noise(frames, gray_frames=None):
     if len(frames) < 3:
         return 0.5
     
+    if gray_frames is None:
+        gray_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames[::5]]
+    else:
+        gray_frames = gray_frames[::5]
+    
     noise_patterns = []
     
-    for frame in frames[::5]:
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY).astype(np.float32)
+    for gray in gray_frames:
+        gray = gray.astype(np.float32)
         denoised = cv2.GaussianBlur(gray, (5, 5), 1.5)
         noise = gray - denoised
         noise_patterns.append(noise)
@@ -2,20 +2,21 @@ import cv2
 import numpy as np
 from core.detection_config import DETECTION_CONFIG
 
-def analyze_optical_flow(frames):
+def analyze_optical_flow(frames, flow_magnitudes=None):
     if len(frames) < 2:
         return 0.5
     
-    flow_magnitudes = []
-    prev_gray = cv2.cvtColor(frames[0], cv2.COLOR_BGR2GRAY)
-    
-    for frame in frames[1::2]:
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        flow = cv2.calcOpticalFlowFarneback(prev_gray, gray, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+    if flow_magnitudes is None:
+        flow_magnitudes = []
+        prev_gray = cv2.cvtColor(frames[0], cv2.COLOR_BGR2GRAY)
         
-        magnitude, angle = cv2.cartToPolar(flow[..., 0], flow[..., 1])
-        flow_magnitudes.append(np.mean(magnitude))
-        prev_gray = gray
+        for frame in frames[1::2]:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            flow = cv2.calcOpticalFlowFarneback(prev_gray, gray, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+            
+            magnitude, angle = cv2.cartToPolar(flow[..., 0], flow[..., 1])
+            flow_magnitudes.append(np.mean(magnitude))
+            prev_gray = gray
     
     if len(flow_magnitudes) == 0:
         return 0.5
@@ -31,18 +32,28 @@ def analyze_optical_flow(frames):
     else:
         return 0.6
 
-def analyze_frame_consistency(frames):
+def analyze_frame_consistency(frames, gray_frames=None):
     if len(frames) < 3:
         return 0.5
     
+    if gray_frames is None:
+        gray_frames = [cv2.cvtColor(f, cv2.COLOR_BGR2GRAY) for f in frames]
+    
     frame_diffs = []
     
-    for i in range(len(frames) - 1):
-        gray1 = cv2.cvtColor(frames[i], cv2.COLOR_BGR2GRAY)
-        gray2 = cv2.cvtColor(frames[i+1], cv2.COLOR_BGR2GRAY)
+    for i in range(len(gray_frames) - 1):
+        gray1 = gray_frames[i]
+        gray2 = gray_frames[i+1]
         diff = cv2.absdiff(gray1, gray2)
         frame_diffs.append(np.mean(diff))
     
+    return frame_difference_score(frame_diffs)
+
+def frame_difference_score(frame_diffs):
+    """Score of the mean absolute differences between consecutive grey frames"""
+    if len(frame_diffs) < 2:
+        return 0.5
+    
     diff_variance = np.var(frame_diffs)
     avg_diff = np.mean(frame_diffs)
     
@@ -54,12 +65,22 @@ def analyze_frame_consistency(frames):
     else:
         return 0.6
 
-def detect_temporal_artifacts(frames):
+def detect_temporal_artifacts(frames, gray_frames=None):
     if len(frames) < 5:
         return 0.5
     
     # Check for periodic patterns (GAN artifacts)
-    brightness_values = [np.mean(cv2.cvtColor(f, cv2.COLOR_BGR2GRAY)) for f in frames]
+    if gray_frames is None:
+        brightness_values = [np.mean(cv2.cvtColor(f, cv2.COLOR_BGR2GRAY)) for f in frames]
+    else:
+        brightness_values = [np.mean(g) for g in gray_frames]
+    
+    return brightness_periodicity_score(brightness_values)
+
+def brightness_periodicity_score(brightness_values):
+    """Score of a per-frame mean brightness series, low when it has a strong periodic component"""
+    if len(brightness_values) < 5:
+        return 0.5
     
     fft = np.fft.fft(brightness_values)
     power = np.abs(fft) ** 2
@@ -6,7 +6,10 @@ import os
 import sys
 from dotenv import load_dotenv
 from middleware.security_headers import add_security_headers
+from middleware.auth import token_required
 from utils.logger import logger
+from utils.upload_stream import UploadRequest
+from core.detection_config import UPLOAD_CONFIG
 
 # Import models and services
 from models.user import User
@@ -31,6 +34,11 @@ cloudinary.config(
 
 app = Flask(__name__)
 
+# Uploads are hashed and sniffed while the body streams in; bodies over the
+# largest upload limit are refused from Content-Length before being read
+app.request_class = UploadRequest
+app.config['MAX_CONTENT_LENGTH'] = max(UPLOAD_CONFIG['max_bytes'].values()) + UPLOAD_CONFIG['form_overhead_bytes']
+
 # CORS configuration
 allowed_origins = os.getenv('ALLOWED_ORIGINS', 'http://localhost:3000').split(',')
 CORS(app, resources={r"/api/*": {"origins": allowed_origins}}, supports_credentials=True)
@@ -73,6 +81,10 @@ from detectors.simple_pretrained_detector import SimplePretrainedDetector
 detector = SimplePretrainedDetector()
 logger.info("AI Detection system initialized with text/watermark detection")
 
+# Media storage backend: a misconfigured one stops the app here instead of failing every upload
+from services.media_storage import get_media_uploader
+logger.info(f"Media storage backend: {get_media_uploader().storage.name}")
+
 # Create database indexes
 if db is not None:
     from utils.db_indexes import create_indexes
@@ -98,6 +110,22 @@ if db is not None:
         logger.info("Advanced analysis routes registered")
     except Exception as e:
         logger.error(f"Failed to register advanced routes: {e}")
+    
+    # Register asynchronous job routes
+    try:
+        from routes.jobs import create_job_routes
+        app.register_blueprint(create_job_routes(db, detector), url_prefix='/api')
+        logger.info("Async job routes registered")
+    except Exception as e:
+        logger.error(f"Failed to register job routes: {e}")
+    
+    # Register live stream WebSocket routes (needs flask-sock)
+    try:
+        from routes.live import create_live_routes
+        app.register_blueprint(create_live_routes(app, db, detector), url_prefix='/api')
+        logger.info("Live stream routes registered")
+    except Exception as e:
+        logger.error(f"Failed to register live stream routes: {e}")
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -128,10 +156,29 @@ def health_check():
         }
     })
 
+@app.route('/api/media/<path:key>', methods=['GET'])
+@token_required(db)
+def serve_media(current_user, key):
+    """Media stored by the local storage backend, to users with an analysis of it"""
+    from flask import send_from_directory
+    from services.media_storage import get_media_uploader, LocalStorage
+    
+    storage = get_media_uploader().storage
+    if not isinstance(storage, LocalStorage) or db is None:
+        return jsonify({'error': 'Endpoint not found'}), 404
+    # Someone else's media is reported as missing, not forbidden
+    if not Analysis(db).user_has_media(current_user['_id'], f"{storage.base_url}/{key}"):
+        return jsonify({'error': 'Endpoint not found'}), 404
+    return send_from_directory(storage.directory, key)
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
 
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({'error': getattr(error, 'description', None) or 'File too large'}), 413
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
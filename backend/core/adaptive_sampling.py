@@ -0,0 +1,171 @@
+import time
+import cv2
+import numpy as np
+from typing import Dict, List
+from core.detection_config import SAMPLING_CONFIG
+
+def evenly_spaced(total_frames: int, count: int) -> List[int]:
+    """count indices spread evenly over the clip"""
+    count = max(0, min(count, total_frames))
+    return [int(i * total_frames / count) for i in range(count)]
+
+def probe_video(cap, total_frames: int, probes: int) -> Dict:
+    """Low-resolution pass over the whole clip.
+    
+    Returns, per probed frame: the histogram distance to the previous probe
+    (scene change), the mean thumbnail difference (motion), whether a face
+    was found and how much the mouth region of that face changed.
+    """
+    from core.detection_utils import get_face_cascade
+    
+    probe_indices = evenly_spaced(total_frames, max(2, probes))
+    width = SAMPLING_CONFIG['probe_width']
+    face_width = SAMPLING_CONFIG['face_probe_width']
+    cascade = None
+    if SAMPLING_CONFIG['detect_faces']:
+        try:
+            cascade = get_face_cascade()
+        except Exception as e:
+            # Motion and scene changes still drive the allocation
+            print(f"Adaptive sampling without face signal: {e}")
+    # Dense probes decode straight through, sparse ones seek
+    sequential = total_frames / len(probe_indices) <= SAMPLING_CONFIG['sequential_stride']
+    
+    signals = {'indices': [], 'scene': [], 'motion': [], 'face': [], 'mouth': []}
+    prev_thumb = prev_hist = prev_mouth = None
+    position = 0
+    if sequential:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    
+    for frame_idx in probe_indices:
+        if sequential:
+            while position < frame_idx and cap.grab():
+                position += 1
+            ret, frame = cap.read()
+            position += 1
+        else:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            ret, frame = cap.read()
+        if not ret:
+            break
+        
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        height = max(1, int(round(gray.shape[0] * width / gray.shape[1])))
+        thumb = cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA)
+        hist = cv2.calcHist([thumb], [0], None, [32], [0, 256])
+        cv2.normalize(hist, hist)
+        
+        scene = motion = mouth = 0.0
+        if prev_thumb is not None:
+            scene = float(cv2.compareHist(prev_hist, hist, cv2.HISTCMP_BHATTACHARYYA))
+            motion = float(np.mean(cv2.absdiff(thumb, prev_thumb))) / 255.0
+        
+        face = 0
+        if cascade is not None:
+            face_height = max(1, int(round(gray.shape[0] * face_width / gray.shape[1])))
+            small = cv2.resize(gray, (face_width, face_height), interpolation=cv2.INTER_AREA)
+            faces = cascade.detectMultiScale(small, 1.2, 4, minSize=(20, 20))
+            if len(faces):
+                x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+                # Lower third of the face box, centre half of its width
+                region = small[y + 2 * h // 3:y + h, x + w // 4:x + 3 * w // 4]
+                mouth_patch = cv2.resize(region, (24, 12), interpolation=cv2.INTER_AREA) if region.size else None
+                if mouth_patch is not None and prev_mouth is not None:
+                    mouth = float(np.mean(cv2.absdiff(mouth_patch, prev_mouth))) / 255.0
+                prev_mouth = mouth_patch
+                face = 1
+            else:
+                prev_mouth = None
+        
+        signals['indices'].append(frame_idx)
+        signals['scene'].append(scene)
+        signals['motion'].append(motion)
+        signals['face'].append(face)
+        signals['mouth'].append(mouth)
+        prev_thumb, prev_hist = thumb, hist
+    
+    return {key: np.array(values) for key, values in signals.items()}
+
+def _interval_values(values):
+    # Probe i's signals describe the change from probe i-1; shift them onto the interval starting at each probe
+    return np.append(values[1:], values[-1])
+
+def _normalise(values):
+    scale = np.percentile(values, 95) if len(values) else 0.0
+    return np.clip(values / scale, 0.0, 1.0) if scale > 0 else np.zeros_like(values, dtype=float)
+
+def allocate_frames(signals: Dict, total_frames: int, budget: int):
+    """Spread a frame budget over the clip by information; returns (indices, shot boundaries found).
+    
+    The first probe after each strong scene change is taken outright (up to
+    max_cut_share of the budget). The rest is placed at quantiles of a
+    density mixing a uniform share, which keeps the whole clip covered,
+    with motion, faces in motion and mouth activity.
+    """
+    probe_indices = signals['indices']
+    if len(probe_indices) < 2:
+        return evenly_spaced(total_frames, budget), 0
+    
+    ends = np.append(probe_indices[1:], total_frames)
+    motion = _normalise(_interval_values(signals['motion']))
+    mouth = _normalise(_interval_values(signals['mouth']))
+    face = _interval_values(signals['face'])
+    
+    weights = SAMPLING_CONFIG['weights']
+    importance = weights['motion'] * motion + weights['face_motion'] * face * motion + weights['mouth'] * face * mouth
+    
+    threshold = SAMPLING_CONFIG['scene_cut_threshold']
+    cut_positions = [i for i in range(1, len(probe_indices)) if signals['scene'][i] >= threshold]
+    strongest = sorted(cut_positions, key=lambda i: signals['scene'][i], reverse=True)
+    chosen = {int(probe_indices[i]) for i in strongest[:int(budget * SAMPLING_CONFIG['max_cut_share'])]}
+    
+    uniform = np.full(len(probe_indices), 1.0 / len(probe_indices))
+    uniform_share = SAMPLING_CONFIG['uniform_share']
+    density = uniform if importance.sum() <= 0 else \
+        uniform_share * uniform + (1 - uniform_share) * importance / importance.sum()
+    cdf = np.cumsum(density)
+    
+    remaining = budget - len(chosen)
+    for k in range(remaining):
+        target = (k + 0.5) / remaining * cdf[-1]
+        i = min(int(np.searchsorted(cdf, target)), len(cdf) - 1)
+        fraction = (target - (cdf[i] - density[i])) / density[i] if density[i] > 0 else 0.0
+        start = probe_indices[i]
+        chosen.add(min(total_frames - 1, int(start + fraction * (ends[i] - start))))
+    
+    # Quantiles that landed on the same frame are replaced by evenly spaced ones
+    for frame_idx in evenly_spaced(total_frames, budget):
+        if len(chosen) >= budget:
+            break
+        chosen.add(frame_idx)
+    return sorted(chosen)[:budget], len(cut_positions)
+
+def sample_frame_indices(cap, total_frames: int, budget: int, probes: int = None):
+    """Frame indices for a budget and a report of how they were chosen.
+    
+    With probes (SAMPLING_CONFIG['max_probes'] by default) the clip is
+    probed and the budget allocated adaptively; with none, or when every
+    frame fits in the budget, frames are evenly spaced.
+    """
+    probes = SAMPLING_CONFIG['max_probes'] if probes is None else probes
+    budget = min(budget, total_frames)
+    if not SAMPLING_CONFIG['enabled'] or probes <= 0 or budget >= total_frames or budget < 2:
+        return evenly_spaced(total_frames, budget), {'strategy': 'even', 'frames': budget}
+    
+    started = time.perf_counter()
+    try:
+        signals = probe_video(cap, total_frames, min(probes, total_frames))
+    except Exception as e:
+        print(f"Adaptive sampling probe failed: {e}")
+        return evenly_spaced(total_frames, budget), {'strategy': 'even', 'frames': budget}
+    
+    indices, shot_boundaries = allocate_frames(signals, total_frames, budget)
+    return indices, {
+        'strategy': 'adaptive',
+        'frames': len(indices),
+        'probes': len(signals['indices']),
+        'shot_boundaries': shot_boundaries,
+        'face_probes': int(signals['face'].sum()) if len(signals['face']) else 0,
+        'coverage': [round(indices[0] / total_frames, 3), round(indices[-1] / total_frames, 3)] if indices else None,
+        'probe_seconds': round(time.perf_counter() - started, 3)
+    }
@@ -0,0 +1,115 @@
+import time
+from typing import List, Dict
+from core.detection_config import ANALYSIS_PROFILES, DEFAULT_ANALYSIS_PROFILE
+
+def get_profile(name: str = None) -> Dict:
+    """Settings of a named analysis profile (raises ValueError for unknown names)"""
+    name = (name or DEFAULT_ANALYSIS_PROFILE).strip().lower()
+    if name not in ANALYSIS_PROFILES:
+        raise ValueError(f"Unknown analysis profile '{name}'. Choose one of: {', '.join(ANALYSIS_PROFILES)}")
+    return {'name': name, **ANALYSIS_PROFILES[name]}
+
+def resolve_profile(requested: str = None, user: Dict = None) -> Dict:
+    """Per-request choice, else the account default, else DEFAULT_ANALYSIS_PROFILE"""
+    if requested:
+        return get_profile(requested)
+    account_default = (user or {}).get('analysis_profile')
+    if account_default in ANALYSIS_PROFILES:
+        return get_profile(account_default)
+    return get_profile()
+
+def list_profiles() -> List[Dict]:
+    """Public description of every profile"""
+    return [
+        {
+            'name': name,
+            'description': settings['description'],
+            'budget_seconds': settings['budget_seconds'],
+            'max_frames': settings['max_frames'],
+            'default': name == DEFAULT_ANALYSIS_PROFILE
+        }
+        for name, settings in ANALYSIS_PROFILES.items()
+    ]
+
+def estimate_profile_latency(profile: Dict, width: int, height: int, total_frames: int = 1,
+                             is_video: bool = True) -> Dict:
+    """Predicted latency of an analysis from the learned cost model.
+    
+    The CNN pass over the sampled frames always runs; registry methods only
+    get what the budget leaves, so a job is oversized when the CNN alone
+    is predicted to overrun the budget.
+    """
+    from core.cost_model import cost_model
+    from core.detection_registry import DETECTION_METHODS
+    from core.frame_processor import frame_processor
+    
+    frames = max(1, min(profile['max_frames'], total_frames)) if is_video else 1
+    mandatory = cost_model.predict('pretrained_cnn', width, height, frames)
+    
+    pipeline = None
+    predicted = mandatory
+    if is_video:
+        methods = profile.get('methods') or list(DETECTION_METHODS.keys())
+        pipeline = cost_model.predict_pipeline(methods, width, height, frames, workers=frame_processor.max_workers)
+        predicted += min(pipeline['predicted_wall_seconds'], max(0.0, profile['budget_seconds'] - mandatory))
+    
+    return {
+        'profile': profile['name'],
+        'frames': frames,
+        'resolution': [width, height],
+        'mandatory_seconds': round(mandatory, 3),
+        'pipeline': pipeline,
+        'predicted_seconds': round(predicted, 3),
+        'budget_seconds': profile['budget_seconds'],
+        'fits_budget': mandatory <= profile['budget_seconds']
+    }
+
+class AnalysisDeadline:
+    """Wall-clock budget shared by every stage of one analysis"""
+    
+    def __init__(self, budget_seconds: float):
+        self.budget_seconds = budget_seconds
+        self.started = time.perf_counter()
+    
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+    
+    def remaining(self) -> float:
+        return max(0.0, self.budget_seconds - self.elapsed())
+    
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+def run_profile_methods(frames: List, profile: Dict, deadline: AnalysisDeadline, audio_path: str = None):
+    """Run registry methods within what is left of the budget.
+    
+    Returns (method results, metadata) where metadata lists the executed
+    methods and the reason every other registered method was skipped.
+    """
+    from core.detection_registry import DETECTION_METHODS
+    from core.frame_processor import frame_processor
+    
+    allowed = profile.get('methods') or list(DETECTION_METHODS.keys())
+    skipped = {name: 'not in profile' for name in DETECTION_METHODS if name not in allowed}
+    
+    results = {}
+    schedule = {}
+    if frames and not deadline.expired():
+        results = frame_processor.create_detection_pipeline(
+            frames, audio_path=audio_path, methods=allowed, budget_seconds=deadline.remaining()
+        )
+        schedule = results.pop('_schedule', {}) or {}
+        skipped.update(schedule.get('skipped', {}))
+    else:
+        skipped.update({name: 'budget' for name in allowed})
+    
+    metadata = {
+        'profile': profile['name'],
+        'budget_seconds': profile['budget_seconds'],
+        'elapsed_seconds': round(deadline.elapsed(), 3),
+        'executed': sorted(results),
+        'skipped': skipped,
+        'critical_path': schedule.get('critical_path', []),
+        'memoized': schedule.get('memoized', [])
+    }
+    return results, metadata
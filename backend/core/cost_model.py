@@ -0,0 +1,291 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+import numpy as np
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are still atomic, concurrent merges are not serialized
+    fcntl = None
+
+# Shared by every process of the backend, whatever its working directory
+DEFAULT_STORAGE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'method_costs.json')
+
+# Resolution the declared registry costs refer to
+REFERENCE_PIXELS = 640 * 480
+
+# Per-frame costs of stages that are not registry nodes (seconds at REFERENCE_PIXELS)
+BASELINE_COSTS = {
+    'pretrained_cnn': 0.05
+}
+
+class MethodCostModel:
+    """Learned per-method latency model fitted from production timings.
+    
+    Every executed method reports wall time, CPU time, input resolution and
+    frame count. Per method we fit seconds = intercept + slope * work where
+    work is megapixels x frames, and fall back to the registry's declared
+    cost until enough observations exist.
+    
+    Web and Celery worker processes share one storage file: each saves the
+    observations it made since its last save merged into what is stored.
+    """
+    
+    def __init__(self, storage_path=DEFAULT_STORAGE_PATH):
+        self.storage_path = storage_path
+        self.window_size = 200  # Observations kept per method
+        self.min_samples = 5  # Observations needed before a fit replaces the declared cost
+        self.refit_every = 25  # New observations per method between refits
+        self.refresh_interval = timedelta(hours=1)
+        self.save_every = 50  # Observations between writes to storage
+        self._lock = threading.Lock()
+        self._pending = {}  # method -> observations not saved yet
+        self._dirty = False
+        self.cost_data = self.load_cost_data()
+    
+    def load_cost_data(self):
+        """Load the cost table from storage"""
+        try:
+            if os.path.exists(self.storage_path):
+                with open(self.storage_path, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Failed to load cost data: {e}")
+        return {
+            "observations": {},
+            "models": {},
+            "observation_count": 0,
+            "last_updated": datetime.now().isoformat()
+        }
+    
+    def save_cost_data(self):
+        """Merge this process's new observations and fits into storage.
+        
+        The read-merge-write runs under an exclusive lock file shared with
+        the other processes, and the table is written to a temporary file
+        renamed over the old one, so no reader sees a partial file. Nothing
+        is written when nothing changed.
+        """
+        with self._lock:
+            if not self._dirty:
+                return True
+            pending, self._pending = self._pending, {}
+            models = {name: dict(model) for name, model in self.cost_data["models"].items()}
+            self._dirty = False
+        
+        try:
+            with self._file_lock():
+                stored = self.load_cost_data()
+                for method, observations in pending.items():
+                    merged = stored["observations"].get(method, []) + observations
+                    stored["observations"][method] = merged[-self.window_size:]
+                stored["observation_count"] = stored.get("observation_count", 0) + \
+                    sum(len(observations) for observations in pending.values())
+                for name, model in models.items():
+                    current = stored["models"].get(name)
+                    if current is None or current["fitted_at"] < model["fitted_at"]:
+                        stored["models"][name] = model
+                stored["last_updated"] = datetime.now().isoformat()
+                self._write(stored)
+        except Exception as e:
+            print(f"Failed to save cost data: {e}")
+            with self._lock:
+                for method, observations in pending.items():
+                    self._pending[method] = observations + self._pending.get(method, [])
+                self._dirty = True
+            return False
+        
+        with self._lock:
+            # Adopt what other processes stored, on top of what was recorded during the write
+            for method, observations in stored["observations"].items():
+                recent = observations + self._pending.get(method, [])
+                self.cost_data["observations"][method] = recent[-self.window_size:]
+            for name, model in stored["models"].items():
+                current = self.cost_data["models"].get(name)
+                if current is None or current["fitted_at"] < model["fitted_at"]:
+                    self.cost_data["models"][name] = model
+            self.cost_data["observation_count"] = stored["observation_count"] + \
+                sum(len(observations) for observations in self._pending.values())
+            self.cost_data["last_updated"] = stored["last_updated"]
+        return True
+    
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.storage_path}.lock", 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    
+    def _write(self, data):
+        fd, partial = tempfile.mkstemp(
+            dir=os.path.dirname(self.storage_path) or '.', prefix='.method_costs.', suffix='.tmp'
+        )
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(partial, self.storage_path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+    
+    @staticmethod
+    def _work(width, height, frame_count):
+        return (width * height / 1e6) * max(1, frame_count)
+    
+    def record(self, method_name, wall_seconds, cpu_seconds, width, height, frame_count):
+        """Record one execution of a method"""
+        try:
+            observation = {
+                "wall_seconds": round(float(wall_seconds), 5),
+                "cpu_seconds": round(float(cpu_seconds), 5) if cpu_seconds is not None else None,
+                "width": int(width),
+                "height": int(height),
+                "frames": int(frame_count),
+                "timestamp": datetime.now().isoformat()
+            }
+            with self._lock:
+                observations = self.cost_data["observations"].setdefault(method_name, [])
+                observations.append(observation)
+                if len(observations) > self.window_size:
+                    self.cost_data["observations"][method_name] = observations[-self.window_size:]
+                self._pending.setdefault(method_name, []).append(observation)
+                self._dirty = True
+                
+                self.cost_data["observation_count"] = self.cost_data.get("observation_count", 0) + 1
+                unsaved = sum(len(pending) for pending in self._pending.values())
+                
+                model = self.cost_data["models"].get(method_name)
+                stale = model is None or \
+                    model["samples_since_fit"] + 1 >= self.refit_every or \
+                    datetime.now() - datetime.fromisoformat(model["fitted_at"]) > self.refresh_interval
+                if model is not None:
+                    model["samples_since_fit"] += 1
+            
+            if stale:
+                self.fit_method(method_name)
+            if unsaved >= self.save_every:
+                self.save_cost_data()
+        
+        except Exception as e:
+            print(f"Failed to record cost for {method_name}: {e}")
+    
+    def fit_method(self, method_name):
+        """Least-squares fit of wall time against megapixel-frames"""
+        try:
+            with self._lock:
+                observations = list(self.cost_data["observations"].get(method_name, []))
+            if len(observations) < self.min_samples:
+                return None
+            
+            work = np.array([self._work(o["width"], o["height"], o["frames"]) for o in observations])
+            wall = np.array([o["wall_seconds"] for o in observations])
+            cpu = [o["cpu_seconds"] for o in observations if o["cpu_seconds"] is not None]
+            
+            if np.ptp(work) > 1e-9:
+                slope, intercept = np.polyfit(work, wall, 1)
+                slope, intercept = max(0.0, slope), max(0.0, intercept)
+            else:
+                # Every observation had the same input size, only the level is known
+                slope, intercept = 0.0, float(np.mean(wall))
+            
+            predicted = intercept + slope * work
+            residual = np.sum((wall - predicted) ** 2)
+            total = np.sum((wall - np.mean(wall)) ** 2)
+            
+            model = {
+                "intercept": round(float(intercept), 6),
+                "slope_per_megapixel_frame": round(float(slope), 6),
+                "r2": round(float(1 - residual / total), 3) if total > 0 else 1.0,
+                "mean_wall_seconds": round(float(np.mean(wall)), 4),
+                "p95_wall_seconds": round(float(np.percentile(wall, 95)), 4),
+                "cpu_ratio": round(float(np.sum(cpu) / max(np.sum(wall), 1e-9)), 3) if cpu else None,
+                "samples": len(observations),
+                "samples_since_fit": 0,
+                "fitted_at": datetime.now().isoformat()
+            }
+            with self._lock:
+                self.cost_data["models"][method_name] = model
+                self._dirty = True
+            return model
+        
+        except Exception as e:
+            print(f"Failed to fit cost model for {method_name}: {e}")
+            return None
+    
+    def refresh(self):
+        """Refit every method with enough observations"""
+        with self._lock:
+            methods = list(self.cost_data["observations"].keys())
+        refreshed = [m for m in methods if self.fit_method(m) is not None]
+        self.save_cost_data()
+        return refreshed
+    
+    def predict(self, method_name, width, height, frame_count):
+        """Predicted wall seconds for one execution"""
+        with self._lock:
+            model = self.cost_data["models"].get(method_name)
+        if model is not None:
+            return model["intercept"] + model["slope_per_megapixel_frame"] * self._work(width, height, frame_count)
+        
+        # Declared cost, scaled from the reference resolution
+        pixel_scale = (width * height / REFERENCE_PIXELS) if width and height else 1.0
+        if method_name in BASELINE_COSTS:
+            return BASELINE_COSTS[method_name] * max(1, frame_count) * pixel_scale
+        from core.detection_registry import expected_seconds
+        return expected_seconds(method_name, frame_count) * pixel_scale
+    
+    def predict_pipeline(self, methods, width, height, frame_count, workers=1, has_audio=False):
+        """Predicted latency of a set of registry methods plus the intermediates they need"""
+        from core.detection_registry import get_node_spec, node_frame_count, uses_audio, ROOT_INPUTS
+        
+        methods = [m for m in methods if get_node_spec(m) and (has_audio or not uses_audio(m))]
+        
+        per_node = {}
+        finish = {}
+        
+        def chain(name):
+            # Longest predicted path ending at this node
+            if name not in finish:
+                spec = get_node_spec(name)
+                dims = (0, 0) if uses_audio(name) else (width, height)
+                per_node[name] = self.predict(name, *dims, node_frame_count(name, frame_count))
+                finish[name] = per_node[name] + max(
+                    (chain(dep) for dep in spec['inputs'] if dep not in ROOT_INPUTS), default=0.0
+                )
+            return finish[name]
+        
+        critical = max((chain(m) for m in methods), default=0.0)
+        serial = sum(per_node.values())
+        
+        return {
+            'per_method_seconds': {m: round(per_node[m], 4) for m in methods if m in per_node},
+            'serial_seconds': round(serial, 4),
+            'critical_path_seconds': round(critical, 4),
+            # Work-span bound for `workers` parallel workers
+            'predicted_wall_seconds': round(max(critical, serial / max(1, workers)), 4)
+        }
+    
+    def get_summary(self):
+        """Fitted models and observation counts for the performance endpoint"""
+        with self._lock:
+            return {
+                "observation_count": self.cost_data.get("observation_count", 0),
+                "last_updated": self.cost_data.get("last_updated"),
+                "models": {name: dict(model) for name, model in self.cost_data["models"].items()},
+                "methods_observed": {
+                    name: len(obs) for name, obs in self.cost_data["observations"].items()
+                }
+            }
+
+# Global instance
+cost_model = MethodCostModel()
+atexit.register(cost_model.save_cost_data)
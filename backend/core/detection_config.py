@@ -36,7 +36,14 @@ DETECTION_CONFIG = {
     'exposure_consistency_threshold': 0.4,
     'gamma_consistency_threshold': 0.35,
     'coherence_threshold': 0.3,
-    'prnu_extension_threshold': 0.4
+    'prnu_extension_threshold': 0.4,
+    
+    # Voice activity gating for audio analysis
+    'vad_frame_ms': 30,
+    'vad_energy_ratio': 0.1,
+    'vad_zcr_max': 0.25,
+    'vad_hangover_ms': 210,
+    'vad_min_speech_ms': 150
 }
 
 WEIGHTS = {
@@ -56,7 +63,7 @@ ADVANCED_WEIGHTS = {
     'forensics': {'illumination': 0.06, 'boundary_artifacts': 0.06, 'metadata': 0.04, 'compression': 0.04}
 }
 
-# Enterprise fusion weights (v3)
+# Enterprise fusion weights (v3), used by fusion.fusion_engine.AdvancedFusionEngine
 ENTERPRISE_WEIGHTS = {
     'facial': {'blink': 0.10, 'lip_sync': 0.08, 'head_pose': 0.07},
     'temporal': {
@@ -71,14 +78,104 @@ ENTERPRISE_WEIGHTS = {
         'illumination': 0.05, 'boundary_artifacts': 0.05, 'exposure_consistency': 0.04,
         'gamma_consistency': 0.03, 'metadata': 0.03, 'compression': 0.03
     },
-    'cross_modal': {'coherence': 0.06, 'audio_sync': 0.04, 'audio_anomalies': 0.03}
+    'cross_modal': {'coherence': 0.06, 'audio_sync': 0.04, 'audio_anomalies': 0.03, 'pitch_consistency': 0.03}
 }
 
 VIDEO_CONFIG = {
     'frame_width': 640,
     'frame_height': 480,
     'min_fps': 15,
-    'max_file_size': 500 * 1024 * 1024
+    'max_file_size': 500 * 1024 * 1024,
+    
+    # Temporal segments for distributed (Celery chord) analysis
+    'segment_seconds': 10,
+    'segment_overlap_seconds': 1.0,  # context shared with the previous segment, not scored twice
+    'max_segments': 16,
+    
+    # Local sharding: long clips are split into temporal segments analyzed on the
+    # frame processor's worker processes, one segment per core
+    'local_sharding': True,
+    'local_shard_min_seconds': 120,
+    'local_shard_min_frames': 4,  # sampled frames per shard, below this a clip is not worth splitting
+    'local_shard_workers': None,  # None = the frame processor's process_workers
+    
+    # Share of the fused registry-method score in a video's verdict when every planned
+    # method ran; it shrinks with the methods' information weight left out by the budget,
+    # and the CNN frame mean carries the rest
+    'method_fusion_weight': 0.4
+}
+
+# Motion / scene-change adaptive frame sampling (core/adaptive_sampling.py): a
+# low-resolution probe pass over the whole clip decides where the frame budget goes
+SAMPLING_CONFIG = {
+    'enabled': True,
+    'max_probes': 120,  # default probe count; analysis profiles set their own
+    'probe_width': 64,
+    'face_probe_width': 240,
+    'detect_faces': True,
+    'sequential_stride': 8,  # probes at most this many frames apart are decoded sequentially instead of seeking
+    'scene_cut_threshold': 0.5,  # Bhattacharyya distance between 32-bin grey histograms
+    'max_cut_share': 0.25,  # of the frame budget reserved for shot boundaries
+    'uniform_share': 0.4,  # of the rest spread evenly so the whole clip stays covered
+    'weights': {'motion': 1.0, 'face_motion': 1.0, 'mouth': 1.5}
+}
+
+# Triage of sampled video frames before CNN scoring and the detection methods
+# (core/frame_triage.py); statistics are taken on a grey thumbnail
+FRAME_TRIAGE_CONFIG = {
+    'enabled': True,
+    'thumbnail_width': 160,
+    'black_mean': 16.0,  # fades: mean brightness below this...
+    'black_std': 8.0,  # ...and almost no contrast
+    'min_sharpness': 20.0,  # Laplacian variance of the thumbnail, below this a frame counts as blurred
+    'duplicate_distance': 3,  # dHash bits, a frame this close to the last kept one is merged into it
+    'backfill_candidates': 2,  # alternatives tried between a rejected frame and the next sample
+    'min_frames': 8  # merged duplicates are restored if triage would leave fewer frames
+}
+
+# Face tracks shared by the facial methods (core/face_tracking.py)
+FACE_TRACKING_CONFIG = {
+    'detect_every': 5,  # full detection on every Nth processed frame, LK tracking in between
+    'max_points': 40,  # corners tracked per face box
+    'min_points': 8,  # fewer surviving points counts as a lost track and forces re-detection
+    'max_fb_error': 2.0,  # forward-backward LK error (px) above which a point is dropped
+    'min_box_size': 24,
+    'match_iou': 0.3  # a detection overlapping a track this much keeps its track id
+}
+
+# Progressive video verdicts (core/progressive_verdict.py): the sampled clip is
+# analyzed in windows and a running score with a confidence interval is streamed
+# after each one; with early_stop the analysis ends once the interval is decided
+PROGRESSIVE_CONFIG = {
+    'enabled': True,
+    'windows': 6,
+    'min_window_frames': 4,
+    'confidence_level': 0.95,
+    'threshold': 50.0,  # authenticity score separating AUTHENTIC_HUMAN from AI_GENERATED
+    'early_stop': False,  # default when the request does not ask
+    'min_frames': 8,  # analyzed before an early stop is allowed
+    'min_windows': 2
+}
+
+# Progress sessions streamed by /api/progress (routes/analysis_stream.py); each
+# belongs to the user whose analysis reports to it
+PROGRESS_STREAM_CONFIG = {
+    'ttl_seconds': 900,  # sessions not updated for this long are dropped, streamed or not
+    'max_session_id_length': 64
+}
+
+# Live stream analysis over WebSocket (core/live_analysis.py, routes/live.py):
+# per-frame features are computed once on arrival and kept in a rolling window
+LIVE_CONFIG = {
+    'window_frames': 48,
+    'frame_width': 320,  # frames are downscaled to this width before analysis
+    'push_interval_seconds': 1.0,  # scores are pushed at this cadence when the window changed
+    'queue_frames': 2,  # decoded frames waiting for the session worker; older ones are dropped
+    'cpu_share': 0.5,  # CPU-seconds per wall second a session may use, frames beyond it are dropped
+    'cpu_burst_seconds': 0.5,
+    'max_sessions': 8,
+    'max_message_bytes': 4 * 1024 * 1024,
+    'idle_timeout_seconds': 30
 }
 
 # Advanced detection configuration
@@ -116,7 +213,184 @@ PERFORMANCE_CONFIG = {
     'timeout_seconds': 600,
     'cache_intermediate': True,
     'max_concurrent_analyses': 3,
-    'frame_processing_threads': 4
+    'frame_processing_threads': 4,
+    'executor_backend': 'auto',  # thread | process | auto (per-method, by GIL behaviour)
+    'process_workers': None,  # None = os.cpu_count()
+    'process_start_method': 'spawn',
+    'shared_memory_transport': True,  # ship frames to worker processes via multiprocessing.shared_memory
+    'landmark_workers': 4,  # persistent threads for the landmark pass, each with its own dlib predictor
+    
+    # Asynchronous analysis jobs (/api/jobs); max_concurrent_analyses sets the worker count
+    'job_queue_size': 20,  # waiting jobs before submissions get 429
+    'job_result_ttl_seconds': 3600,
+    'job_max_retained_results': 500
+}
+
+# Analysis profiles: wall-clock budget per request and frames sampled from video.
+# sampling_probes sizes the adaptive sampling probe pass (0 = evenly spaced frames).
+# Methods are picked from the detection registry by expected information per
+# CPU-second until the budget runs out (None = every available method).
+ANALYSIS_PROFILES = {
+    'fast': {
+        'description': 'Pretrained CNN plus the cheapest forensic checks',
+        'budget_seconds': 3.0,
+        'max_frames': 8,
+        'sampling_probes': 32,
+        'methods': None
+    },
+    'standard': {
+        'description': 'Balanced coverage for interactive requests',
+        'budget_seconds': 15.0,
+        'max_frames': 10,
+        'sampling_probes': 64,
+        'methods': None
+    },
+    'forensic': {
+        'description': 'Every available method on a dense frame sample',
+        'budget_seconds': 120.0,
+        'max_frames': 50,
+        'sampling_probes': 240,
+        'methods': None
+    }
+}
+
+DEFAULT_ANALYSIS_PROFILE = 'standard'
+
+# Bump whenever detector code or models change scores; cached results of
+# other versions are never served
+DETECTOR_VERSION = '4.3.0'
+
+# Content-addressed result cache (services/result_cache.py)
+RESULT_CACHE_CONFIG = {
+    'enabled': True,
+    'memory_entries': 1024,  # in-process LRU tier
+    'ttl_seconds': 7 * 24 * 3600  # MongoDB tier, expired by a TTL index
+}
+
+# Per-method memo of raw detection outputs (services/method_memo.py), keyed by
+# input digest, method name, registry version and parameter fingerprint
+METHOD_MEMO_CONFIG = {
+    'enabled': True,
+    'memory_entries': 20000,  # in-process LRU tier (method outputs are small)
+    'ttl_seconds': 30 * 24 * 3600  # MongoDB tier, expired by a TTL index
+}
+
+# Perceptual-hash reuse of verdicts for re-encoded / resized images (services/near_duplicates.py)
+NEAR_DUPLICATE_CONFIG = {
+    'enabled': True,
+    'max_phash_distance': 6,  # of 64 bits
+    'max_dhash_distance': 10,
+    'chunks': 4,  # multi-index hashing substrings; probes flip up to max_phash_distance // chunks bits
+    'memory_entries': 200000,
+    'max_candidates': 500,  # MongoDB candidates verified per lookup
+    'confirm': True,  # re-run the CNN on the new image before reusing a verdict
+    'confirm_tolerance': 15.0  # max authenticity score difference for a confirmed match
+}
+
+# Temporal fingerprints of analysed videos (utils/video_fingerprint.py,
+# services/video_fingerprints.py): trimmed or re-encoded copies reuse the verdict
+VIDEO_FINGERPRINT_CONFIG = {
+    'enabled': True,
+    'rate': 2,  # keyframe hashes and audio sub-fingerprints per second
+    'max_seconds': 600,  # longer clips are fingerprinted over their first max_seconds
+    # Lookups on the request path fingerprint the first probe_seconds only; the
+    # full fingerprint is built and indexed in the background after analysis
+    'probe_seconds': 30,
+    'index_workers': 1,
+    'index_pending': 16,  # videos waiting to be fingerprinted, beyond that indexing is skipped
+    'min_std': 8.0,  # flat keyframes (black, fades) get no hash, they match everything
+    'max_hash_distance': 10,  # of 64 bits per keyframe
+    'chunks': 4,
+    'min_overlap_seconds': 3,
+    'min_match_ratio': 0.6,  # aligned keyframes within max_hash_distance
+    'min_query_coverage': 0.8,  # share of the new clip the match must span, a longer edit is analysed
+    'max_audio_ber': 0.35,  # aligned audio bit error rate above which a match is rejected
+    'memory_entries': 500000,  # keyframe hashes in the in-process index
+    'memory_videos': 20000,
+    'max_candidates': 50,
+    'confirm': True,  # re-score a few frames of the new clip before reusing a verdict
+    'confirm_frames': 4,
+    'confirm_tolerance': 15.0
+}
+
+# Nearest-neighbour index of CNN embeddings of analysed images and frames
+# (services/embedding_index.py); neighbours with an AI verdict are reported as a signal
+EMBEDDING_INDEX_CONFIG = {
+    'enabled': True,
+    'directory': 'embedding_index',
+    'seed': 20240601,  # fixed CNN initialisation, vectors are only comparable under the same weights
+    'batch_size': 16,
+    'k': 5,  # neighbours per analysed frame
+    'min_similarity': 0.8,  # cosine of centred embeddings
+    'min_neighbors': 3,  # similar neighbours needed before a score is reported
+    'nprobe': 8,  # coarse lists scanned per query
+    'max_lists': 1024,
+    'kmeans_iterations': 10,
+    'kmeans_sample': 20000,
+    'compact_rows': 2000,  # delta records that trigger a compaction
+    'compact_interval_seconds': 3600,  # or age of the oldest uncompacted insert
+    'max_rows': 500000  # oldest records are dropped at compaction
+}
+
+# Streaming upload ingestion (utils/upload_stream.py): the body is hashed and
+# sniffed while it is parsed, small images never touch the disk
+UPLOAD_CONFIG = {
+    'max_bytes': {
+        'image': 100 * 1024 * 1024,
+        'video': 500 * 1024 * 1024
+    },
+    'memory_image_bytes': 16 * 1024 * 1024,  # larger images are spilled to a temp file
+    'form_overhead_bytes': 64 * 1024  # multipart headers and form fields besides the file
+}
+
+# Media storage uploads (services/media_storage.py), run in the background
+# while the file is analysed; records get their cloudinary_url when it is ready
+MEDIA_STORAGE_CONFIG = {
+    'backend': 'cloudinary',  # 'cloudinary', 'local' or 's3'; MEDIA_STORAGE_BACKEND overrides
+    'max_workers': 4,  # concurrent uploads
+    'max_pending': 64,  # queued uploads; more wait submit_timeout_seconds for a slot, then go to a backlog on disk
+    'submit_timeout_seconds': 2.0,
+    'retries': 3,
+    'retry_backoff_seconds': 1.0,  # doubled after every failed attempt
+    'local_directory': 'media',
+    'local_base_url': '/api/media',
+    's3_bucket': 'deepfake-detector',  # S3_BUCKET overrides
+    's3_prefix': 'deepfake_detector/'
+}
+
+# Admission control for uploads (middleware/admission_control.py), evaluated
+# from headers before the request body is read
+ADMISSION_CONFIG = {
+    'enabled': True,
+    'degrade_pressure': 0.75,  # above this, requests are switched to degrade_profile
+    'shed_pressure': 0.95,  # above this, requests are rejected with 503
+    'degrade_profile': 'fast',
+    'large_job_seconds': 60.0,  # jobs predicted longer than this are shed instead of degraded under load
+    'min_free_memory_mb': 512,
+    'memory_comfort_mb': 2048,  # memory pressure starts rising below this much available memory
+    'upload_memory_factor': 3.0,  # working memory per uploaded byte (temp copy, decode buffers)
+    'video_size_hint_bytes': 15 * 1024 * 1024,  # uploads above this are assumed video when the type is unknown
+    'assumed_video_bitrate_mbps': 8.0,  # duration estimate when the client sends none
+    'assumed_resolution': (1280, 720),
+    'assumed_fps': 30,
+    'default_retry_after': 10
+}
+
+# Weighted fair queuing in front of the analysis workers (utils/fair_scheduler.py).
+# Class weights share worker time between priority classes; within a class
+# users share it equally unless listed in user_weights.
+FAIR_SCHEDULING_CONFIG = {
+    'class_weights': {
+        'interactive': 6,  # single images, someone is waiting on the page
+        'video': 3,
+        'batch': 1
+    },
+    'default_class': 'batch',
+    'user_weights': {},  # user id -> weight, e.g. for paid tiers
+    'per_user_concurrency': 2,  # jobs of one user running at once
+    'max_pending_per_user': 10,  # queued jobs per user before 429
+    'default_cost_seconds': 5.0,  # when no latency estimate is available
+    'wait_window': 200  # recent waits kept per class for the metrics
 }
 
 # Method availability by detector version
@@ -0,0 +1,256 @@
+import hashlib
+import importlib
+import json
+
+# Inputs supplied by the caller of an analysis
+ROOT_INPUTS = ('frames', 'audio_path')
+
+# Costs are roughly seconds for REFERENCE_FRAME_COUNT VGA frames on one core
+REFERENCE_FRAME_COUNT = 50
+
+# Inputs that do not grow with the number of frames analysed
+FIXED_SIZE_INPUTS = ('sample_frame', 'audio', 'audio_path')
+
+# Shared intermediates, computed at most once per analysis
+INTERMEDIATES = {
+    'gray': {
+        'module': 'core.shared_intermediates', 'function': 'compute_gray_stack',
+        'inputs': ('frames',), 'cost': 0.1, 'version': 1
+    },
+    'sample_frame': {
+        'module': 'core.shared_intermediates', 'function': 'compute_sample_frame',
+        'inputs': ('frames',), 'cost': 0.0, 'version': 1
+    },
+    'faces': {
+        'module': 'core.shared_intermediates', 'function': 'compute_faces',
+        'inputs': ('gray',), 'cost': 0.8, 'version': 2
+    },
+    'landmarks': {
+        'module': 'core.shared_intermediates', 'function': 'compute_landmarks',
+        'inputs': ('gray', 'faces'), 'cost': 0.5, 'version': 2
+    },
+    'flow': {
+        'module': 'core.shared_intermediates', 'function': 'compute_flow',
+        'inputs': ('gray',), 'cost': 2.5, 'version': 1
+    },
+    'audio': {
+        'module': 'core.shared_intermediates', 'function': 'prepare_audio',
+        'inputs': ('audio_path',), 'cost': 1.0, 'version': 1
+    }
+}
+
+# Detection methods: inputs are passed positionally in the declared order.
+# version is part of every memoized output's key: bump it when a method (or
+# intermediate) changes so only its outputs are recomputed.
+# information is the method's fusion weight (ENTERPRISE_WEIGHTS), used to rank
+# methods by expected information per CPU-second under a time budget.
+# releases_gil marks methods dominated by cv2/numpy kernels (scale on threads);
+# the others have per-block / per-pixel Python loops and only scale on processes.
+# context_frames (temporal methods) is how many sampled frames before a segment
+# the method needs to judge its first frames, which sizes the overlap between
+# temporal segments. merge says how per-segment outputs combine (see
+# core.video_segments.merge_segment_results): a weighted mean by default, or
+# 'series' to recompute the score with series_function over the whole clip.
+DETECTION_METHODS = {
+    # Facial
+    'blink': {
+        'module': 'analysis.facial_analysis', 'function': 'detect_blink_irregularity',
+        'inputs': ('frames', 'landmarks'), 'cost': 0.1, 'information': 0.1,
+        'releases_gil': True, 'version': 1
+    },
+    'lip_sync': {
+        'module': 'analysis.facial_analysis', 'function': 'analyze_lip_sync',
+        'inputs': ('frames', 'audio_path', 'landmarks'), 'cost': 0.1, 'information': 0.08,
+        'releases_gil': True, 'version': 1
+    },
+    'head_pose': {
+        'module': 'analysis.facial_analysis', 'function': 'analyze_head_pose',
+        'inputs': ('frames', 'landmarks'), 'cost': 0.2, 'information': 0.07,
+        'releases_gil': True, 'version': 3
+    },
+    
+    # Temporal
+    'optical_flow': {
+        'module': 'analysis.temporal_analysis', 'function': 'analyze_optical_flow',
+        'inputs': ('frames', 'flow'), 'cost': 0.1, 'information': 0.07,
+        'releases_gil': True, 'version': 1, 'context_frames': 2
+    },
+    'frame_consistency': {
+        'module': 'analysis.temporal_analysis', 'function': 'analyze_frame_consistency',
+        'inputs': ('frames', 'gray'), 'cost': 0.2, 'information': 0.06,
+        'releases_gil': True, 'version': 1, 'context_frames': 2
+    },
+    'temporal_artifacts': {
+        'module': 'analysis.temporal_analysis', 'function': 'detect_temporal_artifacts',
+        'inputs': ('frames', 'gray'), 'cost': 0.1, 'information': 0.05,
+        'releases_gil': True, 'version': 1,
+        'merge': 'series', 'series_function': 'brightness_periodicity_score'
+    },
+    'flicker': {
+        'module': 'analysis.flicker_analysis', 'function': 'analyze_flicker_artifacts',
+        'inputs': ('frames',), 'cost': 3.0, 'information': 0.04,
+        'releases_gil': False, 'version': 1, 'context_frames': 4
+    },
+    'temporal_noise_residual': {
+        'module': 'analysis.temporal_noise_residual', 'function': 'analyze_temporal_noise_residual',
+        'inputs': ('frames',), 'cost': 1.5, 'information': 0.03,
+        'releases_gil': True, 'version': 1, 'context_frames': 2
+    },
+    
+    # Noise & artifacts
+    'fft': {
+        'module': 'analysis.noise_analysis', 'function': 'analyze_fft_spectrum',
+        'inputs': ('sample_frame',), 'cost': 0.1, 'information': 0.05,
+        'releases_gil': True, 'version': 1
+    },
+    'edge_artifacts': {
+        'module': 'analysis.noise_analysis', 'function': 'analyze_edge_artifacts',
+        'inputs': ('sample_frame',), 'cost': 0.1, 'information': 0.04,
+        'releases_gil': True, 'version': 1
+    },
+    'prnu': {
+        'module': 'analysis.noise_analysis', 'function': 'detect_prnu_noise',
+        'inputs': ('frames', 'gray'), 'cost': 0.5, 'information': 0.04,
+        'releases_gil': True, 'version': 1
+    },
+    'bitplane': {
+        'module': 'analysis.bitplane_analysis', 'function': 'analyze_bitplane_artifacts',
+        'inputs': ('frames',), 'cost': 2.5, 'information': 0.04,
+        'releases_gil': False, 'version': 1
+    },
+    'color_correlation': {
+        'module': 'analysis.color_correlation_analysis', 'function': 'analyze_color_correlation_artifacts',
+        'inputs': ('frames',), 'cost': 2.0, 'information': 0.04,
+        'releases_gil': False, 'version': 1
+    },
+    'prnu_extension': {
+        'module': 'analysis.prnu_extension', 'function': 'analyze_sensor_pattern_noise',
+        'inputs': ('frames',), 'cost': 1.5, 'information': 0.04,
+        'releases_gil': True, 'version': 1
+    },
+    
+    # Forensics
+    'illumination': {
+        'module': 'analysis.illumination_analysis', 'function': 'analyze_illumination_consistency',
+        'inputs': ('frames',), 'cost': 1.0, 'information': 0.05,
+        'releases_gil': True, 'version': 1
+    },
+    'boundary_artifacts': {
+        'module': 'analysis.boundary_artifact_analysis', 'function': 'analyze_boundary_artifacts',
+        'inputs': ('frames',), 'cost': 2.0, 'information': 0.05,
+        'releases_gil': True, 'version': 1
+    },
+    'exposure_consistency': {
+        'module': 'analysis.exposure_analysis', 'function': 'analyze_exposure_consistency',
+        'inputs': ('frames',), 'cost': 0.5, 'information': 0.04,
+        'releases_gil': False, 'version': 1
+    },
+    'gamma_consistency': {
+        'module': 'analysis.exposure_analysis', 'function': 'analyze_gamma_consistency',
+        'inputs': ('frames',), 'cost': 0.5, 'information': 0.03,
+        'releases_gil': True, 'version': 1
+    },
+    
+    # Cross-modal
+    'coherence': {
+        'module': 'analysis.coherence_analysis', 'function': 'analyze_cross_modal_coherence',
+        'inputs': ('frames',), 'cost': 1.0, 'information': 0.06,
+        'releases_gil': True, 'version': 1
+    },
+    'audio_anomalies': {
+        'module': 'analysis.audio_analysis', 'function': 'detect_audio_anomalies',
+        'inputs': ('audio',), 'cost': 0.5, 'information': 0.03,
+        'releases_gil': True, 'version': 1
+    },
+    'pitch_consistency': {
+        'module': 'analysis.audio_analysis', 'function': 'analyze_pitch_consistency',
+        'inputs': ('audio',), 'cost': 1.0, 'information': 0.03,
+        'releases_gil': True, 'version': 1
+    }
+}
+
+def get_node_spec(name):
+    """Registry entry for a detection method or intermediate"""
+    return DETECTION_METHODS.get(name) or INTERMEDIATES.get(name)
+
+def resolve_callable(name):
+    """Import a registered method/intermediate, or None if its module is unavailable"""
+    spec = get_node_spec(name)
+    if spec is None:
+        return None
+    try:
+        return getattr(importlib.import_module(spec['module']), spec['function'])
+    except (ImportError, AttributeError) as e:
+        print(f"Detection method {name} unavailable: {e}")
+        return None
+
+def segment_context_frames(methods=None):
+    """Sampled frames of overlap a temporal segment needs for the given methods (all by default)"""
+    names = methods or DETECTION_METHODS.keys()
+    return max([DETECTION_METHODS[name].get('context_frames', 0) for name in names if name in DETECTION_METHODS],
+               default=0)
+
+def series_merge_functions(methods=None):
+    """{method: callable} for methods whose segment outputs are merged by recomputing over a series"""
+    functions = {}
+    for name in methods or DETECTION_METHODS.keys():
+        spec = DETECTION_METHODS.get(name)
+        if spec is None or spec.get('merge') != 'series':
+            continue
+        try:
+            functions[name] = getattr(importlib.import_module(spec['module']), spec['series_function'])
+        except (ImportError, AttributeError) as e:
+            print(f"Series merge for {name} unavailable: {e}")
+    return functions
+
+def information_coverage(executed, planned=None):
+    """Share of the planned methods' information (all registered methods by default) carried by the executed ones"""
+    planned = [name for name in (planned or DETECTION_METHODS.keys()) if name in DETECTION_METHODS]
+    total = sum(DETECTION_METHODS[name]['information'] for name in planned)
+    covered = sum(DETECTION_METHODS[name]['information'] for name in set(executed) if name in planned)
+    return covered / total if total else 0.0
+
+def frame_only_methods():
+    """Methods that only need the raw frame stack (eligible for worker processes)"""
+    return [name for name, spec in DETECTION_METHODS.items() if spec['inputs'] == ('frames',)]
+
+def uses_audio(name):
+    """Whether a node (transitively) consumes the soundtrack rather than pixels"""
+    spec = get_node_spec(name)
+    if spec is None:
+        return False
+    return any(i == 'audio_path' or (i not in ROOT_INPUTS and uses_audio(i)) for i in spec['inputs'])
+
+def node_frame_count(name, frame_count):
+    """Frames a node actually processes (1 for single-frame and audio nodes)"""
+    spec = get_node_spec(name)
+    if spec is None or all(i in FIXED_SIZE_INPUTS for i in spec['inputs']):
+        return 1
+    return frame_count
+
+def expected_seconds(name, frame_count):
+    """Declared cost of a node scaled to the number of frames being analysed"""
+    spec = get_node_spec(name)
+    if spec is None:
+        return 0.0
+    if all(i in FIXED_SIZE_INPUTS for i in spec['inputs']):
+        return spec['cost']
+    return spec['cost'] * frame_count / REFERENCE_FRAME_COUNT
+
+def method_fingerprint(name):
+    """Short hash of a node's version, inputs and the versions of the intermediates it reads"""
+    spec = get_node_spec(name)
+    if spec is None:
+        return None
+    settings = {
+        'version': spec.get('version', 1),
+        'inputs': list(spec['inputs']),
+        'upstream': {i: method_fingerprint(i) for i in spec['inputs'] if i not in ROOT_INPUTS}
+    }
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
+
+def methods_fingerprint(methods=None):
+    """Combined fingerprint of a set of methods (all registered methods by default)"""
+    names = sorted(methods or DETECTION_METHODS.keys())
+    settings = {name: method_fingerprint(name) for name in names}
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
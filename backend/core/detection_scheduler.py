@@ -0,0 +1,348 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict
+from core.detection_config import PERFORMANCE_CONFIG, METHOD_MEMO_CONFIG
+from core.detection_registry import (
+    ROOT_INPUTS, DETECTION_METHODS, get_node_spec, resolve_callable, node_frame_count, uses_audio,
+    method_fingerprint
+)
+from core.cost_model import cost_model
+
+class DetectionScheduler:
+    """Runs registered detection methods as a dependency DAG.
+    
+    Shared intermediates (gray stack, faces, landmarks, flow, audio) are
+    computed once, independent nodes run concurrently on the frame
+    processor's workers, and the report names the critical path.
+    """
+    
+    def __init__(self, processor=None, max_workers=None):
+        if processor is None:
+            from core.frame_processor import frame_processor
+            processor = frame_processor
+        self.processor = processor
+        self.max_workers = max_workers or processor.max_workers
+    
+    def build_graph(self, methods: List[str], root_values: Dict) -> Dict:
+        """Nodes needed for the requested methods: name -> {kind, inputs, cost, func}"""
+        nodes = {}
+        skipped = {}
+        
+        def add_node(name):
+            if name in nodes:
+                return True
+            if name in ROOT_INPUTS:
+                return root_values.get(name) is not None
+            spec = get_node_spec(name)
+            if spec is None:
+                skipped[name] = 'not registered'
+                return False
+            for dep in spec['inputs']:
+                if not add_node(dep):
+                    skipped.setdefault(name, f'missing input {dep}')
+                    return False
+            func = resolve_callable(name)
+            if func is None:
+                skipped[name] = 'module unavailable'
+                return False
+            nodes[name] = {
+                'kind': 'method' if name in DETECTION_METHODS else 'intermediate',
+                'inputs': tuple(spec['inputs']),
+                'deps': [d for d in spec['inputs'] if d not in ROOT_INPUTS],
+                'cost': spec['cost'],
+                'information': spec.get('information', 0.0),
+                'releases_gil': spec.get('releases_gil', True),
+                'func': func
+            }
+            return True
+        
+        for method_name in methods:
+            add_node(method_name)
+        
+        # Upward rank: own cost plus the most expensive chain that depends on it
+        dependents = {name: [] for name in nodes}
+        for name, node in nodes.items():
+            for dep in node['deps']:
+                dependents[dep].append(name)
+        
+        ranks = {}
+        def rank(name):
+            if name not in ranks:
+                ranks[name] = nodes[name]['cost'] + max((rank(d) for d in dependents[name]), default=0.0)
+            return ranks[name]
+        
+        for name in nodes:
+            nodes[name]['rank'] = rank(name)
+        
+        return {'nodes': nodes, 'skipped': {k: v for k, v in skipped.items() if k in methods}}
+    
+    def run(self, frames: List, audio_path=None, methods: List[str] = None, budget_seconds: float = None):
+        """Execute the DAG; returns (method results, schedule report).
+        
+        With a budget, ready nodes are ordered by expected information per
+        CPU-second and no node is launched once it would overrun the budget.
+        Methods skipped for lack of time are left out of the results.
+        """
+        methods = list(methods or DETECTION_METHODS.keys())
+        values = {'frames': frames, 'audio_path': audio_path}
+        
+        # Methods whose output for these exact inputs and version is memoized are not run
+        memo_keys, memoized = {}, {}
+        if METHOD_MEMO_CONFIG['enabled'] and len(frames):
+            from services.method_memo import get_method_memo
+            memo_keys = self._memo_keys(methods, values)
+            stored = get_method_memo().get_many(list(memo_keys.values()))
+            memoized = {name: stored[key] for name, key in memo_keys.items() if key in stored}
+        
+        graph = self.build_graph([m for m in methods if m not in memoized], values)
+        nodes = graph['nodes']
+        skipped = dict(graph['skipped'])
+        
+        # Learned latency per node at this resolution (declared cost until fitted)
+        height, width = frames[0].shape[:2] if len(frames) else (0, 0)
+        for name in nodes:
+            nodes[name]['frame_count'] = node_frame_count(name, len(frames))
+            # Audio nodes cost the same whatever the video resolution
+            nodes[name]['dims'] = (0, 0) if uses_audio(name) else (width, height)
+            nodes[name]['expected_seconds'] = cost_model.predict(name, *nodes[name]['dims'], nodes[name]['frame_count'])
+        if budget_seconds is not None:
+            self._assign_information_priority(nodes)
+            priority_key = 'priority'
+        else:
+            priority_key = 'rank'
+        
+        timings = {}
+        cpu_timings = {}
+        timing_lock = threading.Lock()
+        run_start = time.perf_counter()
+        
+        def record_timing(name, start, cpu_seconds=None):
+            with timing_lock:
+                timings[name] = (start, time.perf_counter() - run_start)
+                if cpu_seconds is not None:
+                    cpu_timings[name] = cpu_seconds
+        
+        def execute(name, args):
+            start = time.perf_counter() - run_start
+            cpu_start = time.thread_time()
+            try:
+                return nodes[name]['func'](*args)
+            finally:
+                record_timing(name, start, time.thread_time() - cpu_start)
+        
+        remaining = {name: set(node['deps']) for name, node in nodes.items()}
+        ready = [name for name, deps in remaining.items() if not deps]
+        over_budget = set()
+        failed = set()
+        in_flight = {}
+        process_tasks = set()
+        shared_stack = None
+        timed_out = False
+        # Managed explicitly: after a timeout, hung methods must not hold the request on shutdown
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        
+        def release_dependents(name):
+            for dependent, deps in remaining.items():
+                if name in deps:
+                    deps.discard(name)
+                    if not deps and dependent not in values:
+                        ready.append(dependent)
+        
+        try:
+            while ready or in_flight:
+                while ready:
+                    # Longest remaining chain (or best information per second) first
+                    ready.sort(key=lambda n: nodes[n][priority_key], reverse=True)
+                    name = ready.pop(0)
+                    node = nodes[name]
+                    
+                    if budget_seconds is not None:
+                        elapsed = time.perf_counter() - run_start
+                        if over_budget.intersection(node['deps']) or \
+                                elapsed + node['expected_seconds'] > budget_seconds:
+                            over_budget.add(name)
+                            values[name] = None
+                            if node['kind'] == 'method':
+                                skipped[name] = 'budget'
+                            release_dependents(name)
+                            continue
+                    
+                    args = [values.get(i) for i in node['inputs']]
+                    future = None
+                    if node['kind'] == 'method' and node['inputs'] == ('frames',) and \
+                            self.processor.select_backend(name, node['func']) == 'process':
+                        try:
+                            if shared_stack is None:
+                                shared_stack = self.processor._share_frames(frames)
+                            future = self.processor._submit_process_task(
+                                node['func'], frames, name, shared_stack, timed=True)
+                            process_tasks.add(name)
+                        except (BrokenProcessPool, RuntimeError) as e:
+                            print(f"Process pool unavailable for {name}, using threads: {e}")
+                            self.processor._reset_process_pool()
+                            future = None
+                    if future is None:
+                        future = executor.submit(execute, name, args)
+                    in_flight[future] = name
+                
+                if not in_flight:
+                    break
+                
+                done, _ = wait(in_flight, timeout=PERFORMANCE_CONFIG['timeout_seconds'], return_when=FIRST_COMPLETED)
+                if not done:
+                    print(f"Detection scheduler timed out waiting for: {sorted(in_flight.values())}")
+                    timed_out = True
+                    for future, name in in_flight.items():
+                        future.cancel()
+                        failed.add(name)
+                        values[name] = 0.5 if nodes[name]['kind'] == 'method' else None
+                    in_flight = {}
+                    break
+                
+                for future in done:
+                    name = in_flight.pop(future)
+                    try:
+                        if name in process_tasks:
+                            # Timed in the worker: the cost sample starts when the task did, not at submit
+                            values[name], seconds, cpu_seconds = future.result()
+                            record_timing(name, time.perf_counter() - run_start - seconds, cpu_seconds)
+                        else:
+                            values[name] = future.result()
+                    except Exception as e:
+                        print(f"Detection node {name} failed: {e}")
+                        failed.add(name)
+                        # Methods fall back to neutral; dependents of a failed
+                        # intermediate compute what they need themselves
+                        values[name] = 0.5 if nodes[name]['kind'] == 'method' else None
+                    release_dependents(name)
+        finally:
+            # Running threads cannot be interrupted; on a timeout they are left to finish unobserved
+            executor.shutdown(wait=not timed_out, cancel_futures=timed_out)
+            if shared_stack:
+                shared_stack.close()
+        
+        wall_seconds = time.perf_counter() - run_start
+        results = {
+            name: values.get(name, 0.5) for name, node in nodes.items()
+            if node['kind'] == 'method' and name not in over_budget
+        }
+        if memo_keys:
+            # Neutral fallbacks of failed methods are not worth remembering
+            from services.method_memo import get_method_memo
+            get_method_memo().put_many({
+                memo_keys[name]: (name, value) for name, value in results.items()
+                if name in memo_keys and name not in failed
+            })
+        results.update(memoized)
+        
+        # Methods abandoned on a timeout may still record their timing from a pool thread
+        with timing_lock:
+            timings, cpu_timings = dict(timings), dict(cpu_timings)
+        report = self._build_report(nodes, timings, wall_seconds, skipped)
+        report['budget_seconds'] = budget_seconds
+        report['memoized'] = sorted(memoized)
+        
+        # Feed the learned cost model (process tasks report the CPU time of their worker)
+        for name, (start, end) in timings.items():
+            cost_model.record(name, end - start, cpu_timings.get(name), *nodes[name]['dims'], nodes[name]['frame_count'])
+        
+        return results, report
+    
+    def _memo_keys(self, methods: List[str], values: Dict) -> Dict:
+        """Memo key per registered method, from the digests of the inputs it reads"""
+        from services.method_memo import MethodMemo, frame_digest, combine_digests, file_digest
+        
+        frames = values['frames']
+        frame_digests = [frame_digest(frame) for frame in frames]
+        digests = {
+            'frames': combine_digests(frame_digests),
+            # Single-frame methods only depend on the frame compute_sample_frame picks
+            'sample_frame': frame_digests[len(frames) // 2]
+        }
+        if values.get('audio_path'):
+            digests['audio_path'] = file_digest(values['audio_path'])
+        
+        def input_digest(name):
+            if name not in digests:
+                spec = get_node_spec(name)
+                parts = [input_digest(i) for i in spec['inputs']] if spec else [None]
+                digests[name] = None if None in parts else combine_digests(parts)
+            return digests[name]
+        
+        keys = {}
+        for name in methods:
+            if name in DETECTION_METHODS and input_digest(name) is not None:
+                keys[name] = MethodMemo.make_key(digests[name], name, method_fingerprint(name))
+        return keys
+    
+    def _assign_information_priority(self, nodes: Dict):
+        """Information per expected CPU-second, counting the intermediates a method needs"""
+        def upstream(name, seen):
+            for dep in nodes[name]['deps']:
+                if dep not in seen:
+                    seen.add(dep)
+                    upstream(dep, seen)
+            return seen
+        
+        needed_by = {name: [] for name in nodes}
+        for name, node in nodes.items():
+            if node['kind'] != 'method':
+                continue
+            deps = upstream(name, set())
+            total = node['expected_seconds'] + sum(nodes[d]['expected_seconds'] for d in deps)
+            node['priority'] = node['information'] / max(total, 1e-3)
+            for dep in deps:
+                needed_by[dep].append(node['priority'])
+        
+        # An intermediate is worth as much as the best method waiting on it
+        for name, node in nodes.items():
+            if node['kind'] == 'intermediate':
+                node['priority'] = max(needed_by[name], default=0.0)
+    
+    def _build_report(self, nodes: Dict, timings: Dict, wall_seconds: float, skipped: Dict) -> Dict:
+        """Per-node timings plus the critical path through the executed DAG"""
+        durations = {name: max(0.0, end - start) for name, (start, end) in timings.items()}
+        
+        # Longest chain of measured durations ending at each node
+        path_cost = {}
+        path_prev = {}
+        def longest(name):
+            if name not in path_cost:
+                best_dep, best = None, 0.0
+                for dep in nodes[name]['deps']:
+                    if longest(dep) > best:
+                        best_dep, best = dep, longest(dep)
+                path_cost[name] = best + durations.get(name, 0.0)
+                path_prev[name] = best_dep
+            return path_cost[name]
+        
+        critical_path, critical_seconds = [], 0.0
+        method_names = [n for n in nodes if nodes[n]['kind'] == 'method']
+        if method_names:
+            tail = max(method_names, key=longest)
+            critical_seconds = path_cost[tail]
+            while tail is not None:
+                critical_path.insert(0, tail)
+                tail = path_prev[tail]
+        
+        return {
+            'wall_seconds': round(wall_seconds, 4),
+            'serial_seconds': round(sum(durations.values()), 4),
+            'critical_path': critical_path,
+            'critical_path_seconds': round(critical_seconds, 4),
+            'bounding_method': critical_path[-1] if critical_path else None,
+            'nodes': {
+                name: {
+                    'kind': node['kind'],
+                    'inputs': list(node['inputs']),
+                    'declared_cost': node['cost'],
+                    'predicted_seconds': round(node.get('expected_seconds', 0.0), 4),
+                    'start': round(timings[name][0], 4) if name in timings else None,
+                    'seconds': round(durations[name], 4) if name in durations else None
+                }
+                for name, node in nodes.items()
+            },
+            'skipped': skipped
+        }
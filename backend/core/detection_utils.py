@@ -1,5 +1,6 @@
 import cv2
 import numpy as np
+import threading
 
 try:
     import dlib
@@ -9,6 +10,8 @@ except ImportError:
 
 detector = None
 predictor = None
+_cascade_local = threading.local()
+_predictor_local = threading.local()
 
 def get_face_detector():
     global detector
@@ -22,6 +25,14 @@ def get_face_detector():
             detector = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
     return detector
 
+def get_face_cascade():
+    """Haar face cascade, loaded once per thread (detectMultiScale isn't thread-safe)"""
+    cascade = getattr(_cascade_local, 'cascade', None)
+    if cascade is None:
+        cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        _cascade_local.cascade = cascade
+    return cascade
+
 def get_landmark_predictor():
     global predictor
     if predictor is None and DLIB_AVAILABLE:
@@ -31,6 +42,19 @@ def get_landmark_predictor():
             predictor = None
     return predictor
 
+def get_thread_landmark_predictor():
+    """Landmark predictor loaded once per thread (dlib objects must not be shared across threads)"""
+    if not DLIB_AVAILABLE:
+        return None
+    predictor = getattr(_predictor_local, 'predictor', None)
+    if predictor is None:
+        try:
+            predictor = dlib.shape_predictor('shape_predictor_68_face_landmarks.dat')
+        except:
+            return None
+        _predictor_local.predictor = predictor
+    return predictor
+
 def eye_aspect_ratio(eye):
     A = np.linalg.norm(eye[1] - eye[5])
     B = np.linalg.norm(eye[2] - eye[4])
@@ -43,6 +67,22 @@ def mouth_aspect_ratio(mouth):
     C = np.linalg.norm(mouth[0] - mouth[6])
     return (A + B) / (2.0 * C)
 
+def eye_aspect_ratios(eyes):
+    """EAR of a (N, 6, 2) stack of eye contours"""
+    eyes = eyes.astype(np.float64)
+    A = np.linalg.norm(eyes[:, 1] - eyes[:, 5], axis=1)
+    B = np.linalg.norm(eyes[:, 2] - eyes[:, 4], axis=1)
+    C = np.linalg.norm(eyes[:, 0] - eyes[:, 3], axis=1)
+    return np.divide(A + B, 2.0 * C, out=np.zeros_like(A), where=C > 0)
+
+def mouth_aspect_ratios(mouths):
+    """MAR of a (N, 20, 2) stack of mouth contours"""
+    mouths = mouths.astype(np.float64)
+    A = np.linalg.norm(mouths[:, 2] - mouths[:, 10], axis=1)
+    B = np.linalg.norm(mouths[:, 4] - mouths[:, 8], axis=1)
+    C = np.linalg.norm(mouths[:, 0] - mouths[:, 6], axis=1)
+    return np.divide(A + B, 2.0 * C, out=np.zeros_like(A), where=C > 0)
+
 def get_head_pose(landmarks, frame_shape):
     image_points = np.array([
         landmarks[30], landmarks[8], landmarks[36], landmarks[45], landmarks[48], landmarks[54]
@@ -61,3 +101,8 @@ def get_head_pose(landmarks, frame_shape):
     success, rotation_vector, translation_vector = cv2.solvePnP(model_points, image_points, camera_matrix, dist_coeffs, flags=cv2.SOLVEPNP_ITERATIVE)
     
     return rotation_vector if success else None
+
+def head_pose_vectors(landmarks, frame_shape):
+    """Rotation vectors (M, 3) of a (N, 68, 2) landmark stack, solvePnP per row; rows it fails on are dropped"""
+    vectors = [get_head_pose(points, frame_shape) for points in landmarks]
+    return np.array([v.flatten() for v in vectors if v is not None], dtype=np.float64).reshape(-1, 3)
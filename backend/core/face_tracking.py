@@ -0,0 +1,126 @@
+import cv2
+import numpy as np
+from typing import Dict, List, Optional
+from core.detection_config import FACE_TRACKING_CONFIG
+from core.detection_utils import get_face_detector, get_face_cascade, DLIB_AVAILABLE
+
+def detect_face_boxes(gray) -> List[tuple]:
+    """(x, y, w, h) of every face in a grey frame, largest first"""
+    detector = get_face_detector()
+    if DLIB_AVAILABLE and not isinstance(detector, cv2.CascadeClassifier):
+        boxes = [(r.left(), r.top(), r.width(), r.height()) for r in detector(gray)]
+    else:
+        # Cascades are per thread, the shared one isn't safe under the scheduler's threads
+        boxes = [tuple(int(v) for v in box) for box in get_face_cascade().detectMultiScale(gray, 1.1, 4)]
+    return sorted(boxes, key=lambda b: b[2] * b[3], reverse=True)
+
+def _iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    intersection = max(0, x2 - x1) * max(0, y2 - y1)
+    union = a[2] * a[3] + b[2] * b[3] - intersection
+    return intersection / union if union > 0 else 0.0
+
+def track_box(prev_gray, gray, box) -> Optional[tuple]:
+    """Follow a face box from prev_gray to gray with forward-backward checked LK flow; None on loss"""
+    x, y, w, h = box
+    mask = np.zeros(prev_gray.shape, dtype=np.uint8)
+    mask[max(0, y):y + h, max(0, x):x + w] = 255
+    points = cv2.goodFeaturesToTrack(prev_gray, FACE_TRACKING_CONFIG['max_points'], 0.01, 3, mask=mask)
+    if points is None or len(points) < FACE_TRACKING_CONFIG['min_points']:
+        return None
+    
+    lk = {'winSize': (15, 15), 'maxLevel': 3}
+    forward, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None, **lk)
+    backward, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, forward, None, **lk)
+    error = np.linalg.norm((points - backward).reshape(-1, 2), axis=1)
+    good = (status.ravel() == 1) & (back_status.ravel() == 1) & (error < FACE_TRACKING_CONFIG['max_fb_error'])
+    if good.sum() < FACE_TRACKING_CONFIG['min_points']:
+        return None
+    
+    before, after = points.reshape(-1, 2)[good], forward.reshape(-1, 2)[good]
+    shift = np.median(after - before, axis=0)
+    
+    # Scale from the change in pairwise point distances
+    d_before = np.linalg.norm(before[:, None] - before[None], axis=2)
+    d_after = np.linalg.norm(after[:, None] - after[None], axis=2)
+    valid = d_before > 1.0
+    scale = float(np.median(d_after[valid] / d_before[valid])) if valid.any() else 1.0
+    
+    cx, cy = x + w / 2 + shift[0], y + h / 2 + shift[1]
+    new_w, new_h = w * scale, h * scale
+    frame_h, frame_w = gray.shape[:2]
+    new_box = (int(round(cx - new_w / 2)), int(round(cy - new_h / 2)), int(round(new_w)), int(round(new_h)))
+    if min(new_box[2], new_box[3]) < FACE_TRACKING_CONFIG['min_box_size'] or \
+            not (0 <= cx < frame_w and 0 <= cy < frame_h):
+        return None
+    return new_box
+
+class FaceTrackBuilder:
+    """Per-frame face tracks from periodic detection plus optical-flow tracking.
+    
+    Full detection runs on every detect_every-th processed frame; boxes are
+    tracked in between and re-detected as soon as any track is lost.
+    Detections keep the id of the track they overlap, so a face keeps its
+    id across the clip.
+    """
+    
+    def __init__(self, detect_every=None):
+        self.detect_every = detect_every or FACE_TRACKING_CONFIG['detect_every']
+        self.next_id = 0
+        self.stats = {'detections': 0, 'tracked': 0, 'redetections': 0}
+    
+    def _assign_ids(self, boxes, previous):
+        """Detected boxes as track entries, reusing the id of the best-overlapping previous track"""
+        tracks = []
+        unused = list(previous)
+        for box in boxes:
+            match = max(unused, key=lambda t: _iou(box, t['box']), default=None)
+            if match is not None and _iou(box, match['box']) >= FACE_TRACKING_CONFIG['match_iou']:
+                unused.remove(match)
+                track_id = match['track_id']
+            else:
+                track_id = self.next_id
+                self.next_id += 1
+            tracks.append({'track_id': track_id, 'box': box, 'source': 'detected'})
+        return tracks
+    
+    def build(self, gray_frames: List, indices: List[int] = None) -> List:
+        """Per frame: list of {track_id, box, source} (largest face first), None for frames not processed"""
+        indices = list(range(len(gray_frames))) if indices is None else list(indices)
+        faces = [None] * len(gray_frames)
+        previous, prev_gray = [], None
+        
+        for n, i in enumerate(indices):
+            gray = gray_frames[i]
+            tracks = None
+            if n % self.detect_every != 0 and not previous:
+                # Nothing to follow, wait for the next scheduled detection
+                tracks = []
+            elif n % self.detect_every != 0 and prev_gray is not None:
+                boxes = [track_box(prev_gray, gray, t['box']) for t in previous]
+                if all(box is not None for box in boxes):
+                    tracks = [{'track_id': t['track_id'], 'box': box, 'source': 'tracked'}
+                              for t, box in zip(previous, boxes)]
+                    self.stats['tracked'] += 1
+                else:
+                    self.stats['redetections'] += 1
+            
+            if tracks is None:
+                tracks = self._assign_ids(detect_face_boxes(gray), previous)
+                self.stats['detections'] += 1
+            
+            tracks.sort(key=lambda t: t['box'][2] * t['box'][3], reverse=True)
+            faces[i] = tracks
+            previous, prev_gray = tracks, gray
+        return faces
+
+def build_face_tracks(gray_frames: List, indices: List[int] = None) -> List:
+    """Face tracks shared by every facial method (see FaceTrackBuilder)"""
+    return FaceTrackBuilder().build(gray_frames, indices)
+
+def face_rectangle(track: Dict):
+    """dlib rectangle of a track's box, for the landmark predictor"""
+    import dlib
+    x, y, w, h = track['box']
+    return dlib.rectangle(int(x), int(y), int(x + w), int(y + h))
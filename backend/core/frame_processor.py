@@ -1,18 +1,123 @@
 import cv2
 import numpy as np
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 import threading
 from typing import List, Dict, Callable
+from core.detection_config import PERFORMANCE_CONFIG
+from core.shared_frames import SharedFrameStack, attach_frames, get_segment_stats, cleanup_stale_segments
+from core.detection_registry import DETECTION_METHODS, resolve_callable, frame_only_methods
+
+EXECUTOR_BACKENDS = ('thread', 'process', 'auto')
+
+def method_releases_gil(method_name):
+    """Whether a method scales on threads; unknown methods are assumed to"""
+    spec = DETECTION_METHODS.get(method_name)
+    return spec.get('releases_gil', True) if spec else True
+
+def _is_picklable_function(func):
+    """Only module-level functions can be shipped to worker processes"""
+    qualname = getattr(func, '__qualname__', '')
+    return bool(getattr(func, '__module__', None)) and '<' not in qualname
+
+def _init_process_worker():
+    """Pre-load models and cascades once per worker process"""
+    try:
+        # One OpenCV thread per process, the pool itself provides the parallelism
+        cv2.setNumThreads(1)
+        from core.detection_utils import get_face_detector, get_landmark_predictor, get_face_cascade
+        get_face_detector()
+        get_landmark_predictor()
+        get_face_cascade()
+    except Exception as e:
+        print(f"Worker initialization error: {e}")
+
+def _process_detection_wrapper(detection_func: Callable, frames: List, method_name: str):
+    """Process-pool counterpart of _safe_detection_wrapper (must be module level)"""
+    try:
+        return detection_func(frames)
+    except Exception as e:
+        print(f"Detection method {method_name} error: {e}")
+        return 0.5
+
+def _timed_process_task(wrapper: Callable, *args):
+    """Run a process-pool wrapper as (result, wall seconds, CPU seconds), timed inside the worker"""
+    started, cpu_started = time.perf_counter(), time.process_time()
+    result = wrapper(*args)
+    return result, time.perf_counter() - started, time.process_time() - cpu_started
+
+def _process_shared_detection_wrapper(detection_func: Callable, descriptor: Dict, method_name: str):
+    """Run a detection method on frames attached zero-copy from shared memory"""
+    try:
+        shm, stack = attach_frames(descriptor)
+    except Exception as e:
+        print(f"Detection method {method_name} could not attach frames: {e}")
+        return 0.5
+    
+    try:
+        frames = list(stack)
+        result = detection_func(frames)
+        # Never hand back views into the segment, it is unlinked after the task
+        return float(result) if isinstance(result, np.generic) else result
+    except Exception as e:
+        print(f"Detection method {method_name} error: {e}")
+        return 0.5
+    finally:
+        frames = stack = None
+        try:
+            shm.close()
+        except BufferError:
+            pass
 
 class MultiThreadedFrameProcessor:
     """Multi-threaded frame analyzer for improved performance"""
     
-    def __init__(self, max_workers=None):
+    def __init__(self, max_workers=None, backend=None, process_workers=None):
         self.max_workers = max_workers or min(4, (os.cpu_count() or 1))
+        self.backend = backend or os.getenv('FRAME_PROCESSOR_BACKEND', PERFORMANCE_CONFIG['executor_backend'])
+        if self.backend not in EXECUTOR_BACKENDS:
+            raise ValueError(f"Unknown executor backend: {self.backend}")
+        self.process_workers = process_workers or PERFORMANCE_CONFIG['process_workers'] or (os.cpu_count() or 1)
         self.thread_local = threading.local()
+        self._process_pool = None
+        self._pool_lock = threading.Lock()
+    
+    def _get_process_pool(self):
+        """Lazily start the persistent, pre-initialized worker pool"""
+        with self._pool_lock:
+            if self._process_pool is None:
+                context = multiprocessing.get_context(PERFORMANCE_CONFIG['process_start_method'])
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=context,
+                    initializer=_init_process_worker
+                )
+            return self._process_pool
+    
+    def _reset_process_pool(self):
+        with self._pool_lock:
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False)
+                self._process_pool = None
+    
+    def shutdown(self):
+        """Stop the worker process pool"""
+        self._reset_process_pool()
+    
+    def select_backend(self, method_name: str, detection_func: Callable, backend: str = None) -> str:
+        """Pick 'thread' or 'process' for one method"""
+        backend = backend or self.backend
+        if backend == 'thread' or not _is_picklable_function(detection_func):
+            return 'thread'
+        if backend == 'process':
+            return 'process'
+        return 'thread' if method_releases_gil(method_name) else 'process'
     
     def process_frames_parallel(self, frames: List, detection_functions: Dict[str, Callable], 
-                              chunk_size: int = None) -> Dict:
+                              chunk_size: int = None, backend: str = None) -> Dict:
         """Process frames in parallel using multiple detection methods"""
         try:
             if not frames:
@@ -26,26 +131,47 @@ class MultiThreadedFrameProcessor:
             frame_chunks = [frames[i:i + chunk_size] for i in range(0, len(frames), chunk_size)]
             
             results = {}
+            shared_stack = None
             
-            # Process each detection method in parallel
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                # Submit tasks for each detection method
-                future_to_method = {}
-                
-                for method_name, detection_func in detection_functions.items():
-                    future = executor.submit(self._safe_detection_wrapper, 
-                                           detection_func, frames, method_name)
-                    future_to_method[future] = method_name
-                
-                # Collect results
-                for future in as_completed(future_to_method):
-                    method_name = future_to_method[future]
-                    try:
-                        result = future.result(timeout=30)  # 30 second timeout
-                        results[method_name] = result
-                    except Exception as e:
-                        print(f"Method {method_name} failed: {e}")
-                        results[method_name] = 0.5  # Default value
+            try:
+                # Process each detection method in parallel
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    # Submit tasks for each detection method
+                    future_to_method = {}
+                    
+                    for method_name, detection_func in detection_functions.items():
+                        if self.select_backend(method_name, detection_func, backend) == 'process':
+                            try:
+                                if shared_stack is None:
+                                    shared_stack = self._share_frames(frames)
+                                future = self._submit_process_task(detection_func, frames, method_name, shared_stack)
+                                future_to_method[future] = method_name
+                                continue
+                            except (BrokenProcessPool, RuntimeError) as e:
+                                print(f"Process pool unavailable for {method_name}, using threads: {e}")
+                                self._reset_process_pool()
+                        
+                        future = executor.submit(self._safe_detection_wrapper, 
+                                               detection_func, frames, method_name)
+                        future_to_method[future] = method_name
+                    
+                    # Collect results
+                    for future in as_completed(future_to_method):
+                        method_name = future_to_method[future]
+                        try:
+                            result = future.result(timeout=30)  # 30 second timeout
+                            results[method_name] = result
+                        except BrokenProcessPool as e:
+                            print(f"Method {method_name} failed: worker process died ({e})")
+                            self._reset_process_pool()
+                            results[method_name] = 0.5
+                        except Exception as e:
+                            print(f"Method {method_name} failed: {e}")
+                            results[method_name] = 0.5  # Default value
+            finally:
+                # Owner reference; in-flight tasks keep the segment alive until they finish
+                if shared_stack is not None:
+                    shared_stack.close()
             
             return results
             
@@ -53,6 +179,42 @@ class MultiThreadedFrameProcessor:
             print(f"Parallel processing error: {e}")
             return {}
     
+    def _share_frames(self, frames: List):
+        """Write the frame stack to shared memory once per call (False = pickle frames instead)"""
+        if not PERFORMANCE_CONFIG['shared_memory_transport']:
+            return False
+        try:
+            # Reclaim anything a crashed request left behind before allocating more
+            cleanup_stale_segments(PERFORMANCE_CONFIG['timeout_seconds'])
+            return SharedFrameStack(frames)
+        except Exception as e:
+            # Mixed frame shapes or no /dev/shm: fall back to pickling
+            print(f"Shared frame transport unavailable: {e}")
+            return False
+    
+    def _submit_process_task(self, detection_func: Callable, frames: List, method_name: str, shared_stack,
+                             timed=False):
+        """Submit one method to the process pool, by shared-memory descriptor when possible.
+        
+        A timed task's future resolves to (result, wall seconds, CPU seconds)
+        measured in the worker, so time spent queued for a worker is left out.
+        """
+        pool = self._get_process_pool()
+        def submit(wrapper, *args):
+            return pool.submit(_timed_process_task, wrapper, *args) if timed else pool.submit(wrapper, *args)
+        
+        if not shared_stack:
+            return submit(_process_detection_wrapper, detection_func, frames, method_name)
+        
+        shared_stack.acquire()
+        try:
+            future = submit(_process_shared_detection_wrapper, detection_func, shared_stack.descriptor(), method_name)
+        except Exception:
+            shared_stack.release()
+            raise
+        future.add_done_callback(lambda _: shared_stack.release())
+        return future
+    
     def _safe_detection_wrapper(self, detection_func: Callable, frames: List, method_name: str):
         """Wrapper for safe execution of detection functions"""
         try:
@@ -101,97 +263,33 @@ class MultiThreadedFrameProcessor:
             print(f"Frame {index} processing error: {e}")
             return 0.5
     
-    def create_detection_pipeline(self, frames: List) -> Dict:
-        """Create optimized detection pipeline"""
+    def create_detection_pipeline(self, frames: List, audio_path: str = None, methods: List[str] = None,
+                                  budget_seconds: float = None) -> Dict:
+        """Run the detection methods as a dependency DAG over shared intermediates"""
         try:
-            # Import detection functions
-            from facial_analysis import detect_blink_irregularity, analyze_lip_sync, analyze_head_pose
-            from temporal_analysis import analyze_optical_flow, analyze_frame_consistency, detect_temporal_artifacts
-            from noise_analysis import analyze_fft_spectrum, detect_prnu_noise, analyze_edge_artifacts
-            from flicker_analysis import analyze_flicker_artifacts
-            from bitplane_analysis import analyze_bitplane_artifacts
-            from color_correlation_analysis import analyze_color_correlation_artifacts
-            from illumination_analysis import analyze_illumination_consistency
-            from boundary_artifact_analysis import analyze_boundary_artifacts
-            from temporal_noise_residual import analyze_temporal_noise_residual
-            from exposure_analysis import analyze_exposure_consistency, analyze_gamma_consistency
-            from coherence_analysis import analyze_cross_modal_coherence
-            from prnu_extension import analyze_sensor_pattern_noise
-            
-            # Define detection methods that can run in parallel
-            parallel_methods = {
-                'flicker': lambda f: analyze_flicker_artifacts(f),
-                'bitplane': lambda f: analyze_bitplane_artifacts(f),
-                'color_correlation': lambda f: analyze_color_correlation_artifacts(f),
-                'illumination': lambda f: analyze_illumination_consistency(f),
-                'boundary_artifacts': lambda f: analyze_boundary_artifacts(f),
-                'temporal_noise_residual': lambda f: analyze_temporal_noise_residual(f),
-                'exposure_consistency': lambda f: analyze_exposure_consistency(f),
-                'gamma_consistency': lambda f: analyze_gamma_consistency(f),
-                'coherence': lambda f: analyze_cross_modal_coherence(f),
-                'prnu_extension': lambda f: analyze_sensor_pattern_noise(f)
-            }
-            
-            # Process methods in parallel
-            parallel_results = self.process_frames_parallel(frames, parallel_methods)
-            
-            # Sequential methods (require specific order or shared state)
-            sequential_results = {}
-            
-            try:
-                sequential_results['blink'] = detect_blink_irregularity(frames)
-            except:
-                sequential_results['blink'] = 0.5
-            
-            try:
-                sequential_results['optical_flow'] = analyze_optical_flow(frames)
-            except:
-                sequential_results['optical_flow'] = 0.5
-            
-            try:
-                sequential_results['frame_consistency'] = analyze_frame_consistency(frames)
-            except:
-                sequential_results['frame_consistency'] = 0.5
-            
-            try:
-                sequential_results['temporal_artifacts'] = detect_temporal_artifacts(frames)
-            except:
-                sequential_results['temporal_artifacts'] = 0.5
+            from core.detection_scheduler import DetectionScheduler
             
-            # Single frame methods (can be parallelized per frame)
-            if frames:
-                sample_frame = frames[len(frames)//2]
-                
-                try:
-                    sequential_results['fft'] = analyze_fft_spectrum(sample_frame)
-                except:
-                    sequential_results['fft'] = 0.5
-                
-                try:
-                    sequential_results['edge_artifacts'] = analyze_edge_artifacts(sample_frame)
-                except:
-                    sequential_results['edge_artifacts'] = 0.5
-                
-                try:
-                    sequential_results['prnu'] = detect_prnu_noise(frames)
-                except:
-                    sequential_results['prnu'] = 0.5
-            
-            # Combine results
-            all_results = {**parallel_results, **sequential_results}
-            
-            return all_results
+            results, schedule = DetectionScheduler(self).run(
+                frames, audio_path=audio_path, methods=methods, budget_seconds=budget_seconds
+            )
+            results['_schedule'] = schedule
+            return results
             
         except Exception as e:
             print(f"Detection pipeline error: {e}")
             return {}
     
-    def optimize_frame_sampling(self, total_frames: int, max_frames: int = 50) -> List[int]:
-        """Optimize frame sampling for analysis"""
+    def optimize_frame_sampling(self, total_frames: int, max_frames: int = 50, cap=None) -> List[int]:
+        """Optimize frame sampling for analysis (motion/scene adaptive when the capture is given)"""
         try:
             if total_frames <= max_frames:
                 return list(range(total_frames))
             
+            if cap is not None:
+                from core.adaptive_sampling import sample_frame_indices
+                frame_indices, _ = sample_frame_indices(cap, total_frames, max_frames)
+                return frame_indices
+            
             # Intelligent sampling strategy
             # Always include first, middle, and last frames
             key_frames = [0, total_frames // 2, total_frames - 1]
@@ -223,7 +321,7 @@ class MultiThreadedFrameProcessor:
             total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
             
             # Optimize frame sampling
-            frame_indices = self.optimize_frame_sampling(total_frames, max_frames)
+            frame_indices = self.optimize_frame_sampling(total_frames, max_frames, cap)
             
             # Extract selected frames
             frames = []
@@ -247,7 +345,8 @@ class MultiThreadedFrameProcessor:
                 'frames_analyzed': len(frames),
                 'frame_indices': frame_indices,
                 'parallel_processing': True,
-                'max_workers': self.max_workers
+                'max_workers': self.max_workers,
+                'schedule': results.pop('_schedule', None)
             }
             
             return results
@@ -256,10 +355,64 @@ class MultiThreadedFrameProcessor:
             print(f"Efficient video processing error: {e}")
             return {}
     
+    def benchmark_backends(self, frames: List = None, method_names: List[str] = None,
+                           backends: List[str] = None) -> Dict:
+        """Time the parallel pipeline methods on each executor backend"""
+        if frames is None:
+            rng = np.random.default_rng(0)
+            frames = [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(10)]
+        
+        detection_functions = {}
+        for method_name in (method_names or frame_only_methods()):
+            detection_func = resolve_callable(method_name)
+            if detection_func is not None:
+                detection_functions[method_name] = detection_func
+        
+        # Serial baseline: wall vs CPU time per method shows how much of it holds the GIL
+        method_timings = {}
+        for method_name, detection_func in detection_functions.items():
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            self._safe_detection_wrapper(detection_func, frames, method_name)
+            method_timings[method_name] = {
+                'wall_seconds': round(time.perf_counter() - wall_start, 4),
+                'cpu_seconds': round(time.process_time() - cpu_start, 4),
+                'releases_gil': method_releases_gil(method_name)
+            }
+        
+        backend_timings = {}
+        for backend in (backends or EXECUTOR_BACKENDS):
+            if backend != 'thread':
+                # Start the pool outside the timed region so we measure steady state
+                self._get_process_pool()
+            start = time.perf_counter()
+            self.process_frames_parallel(frames, detection_functions, backend=backend)
+            backend_timings[backend] = round(time.perf_counter() - start, 4)
+        
+        serial_seconds = sum(t['wall_seconds'] for t in method_timings.values())
+        recommended = min(backend_timings, key=backend_timings.get) if backend_timings else self.backend
+        
+        return {
+            'frames': len(frames),
+            'frame_shape': list(frames[0].shape) if frames else None,
+            'methods': method_timings,
+            'serial_seconds': round(serial_seconds, 4),
+            'backend_seconds': backend_timings,
+            'speedup': {b: round(serial_seconds / t, 2) for b, t in backend_timings.items() if t > 0},
+            'recommended_backend': recommended,
+            'current_backend': self.backend,
+            'thread_workers': self.max_workers,
+            'process_workers': self.process_workers,
+            'cpu_count': os.cpu_count()
+        }
+    
     def get_performance_stats(self) -> Dict:
         """Get performance statistics"""
         return {
             'max_workers': self.max_workers,
+            'executor_backend': self.backend,
+            'process_workers': self.process_workers,
+            'process_pool_started': self._process_pool is not None,
+            'shared_memory': get_segment_stats(),
             'cpu_count': os.cpu_count(),
             'parallel_processing_enabled': True,
             'recommended_max_frames': 50,
@@ -267,5 +420,4 @@ class MultiThreadedFrameProcessor:
         }
 
 # Global instance for reuse
-import os
 frame_processor = MultiThreadedFrameProcessor()
\ No newline at end of file
@@ -0,0 +1,129 @@
+import cv2
+from typing import Dict, List
+from core.detection_config import FRAME_TRIAGE_CONFIG
+from utils.perceptual_hash import dhash, hamming
+
+def frame_stats(frame) -> Dict:
+    """Cheap thumbnail statistics: brightness mean/std, Laplacian variance and a 64-bit dHash"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    width = FRAME_TRIAGE_CONFIG['thumbnail_width']
+    height = max(1, int(round(gray.shape[0] * width / gray.shape[1])))
+    thumb = cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA)
+    return {
+        'mean': float(thumb.mean()),
+        'std': float(thumb.std()),
+        'sharpness': float(cv2.Laplacian(thumb, cv2.CV_64F).var()),
+        'dhash': dhash(thumb)
+    }
+
+def slot_candidates(frame_indices: List[int], slot: int, limit: int) -> List[int]:
+    """Frame index of a sampling slot followed by backfill alternatives before the next sample"""
+    start = frame_indices[slot]
+    end = frame_indices[slot + 1] if slot + 1 < len(frame_indices) else limit
+    count = FRAME_TRIAGE_CONFIG['backfill_candidates']
+    candidates = [start]
+    for k in range(1, count + 1):
+        index = start + int(k * (end - start) / (count + 1))
+        if start < index < end and index not in candidates:
+            candidates.append(index)
+    return candidates
+
+class FrameTriage:
+    """Drops black, blurred and duplicate frames from one analysis' sample.
+    
+    A frame is black when its thumbnail is both dark and flat, blurred when
+    its Laplacian variance is low, and a duplicate when its dHash is within
+    duplicate_distance of the last kept frame (it is merged into that frame).
+    A slot whose candidates are all blurred keeps the sharpest, so uniformly
+    soft footage is never emptied; merged duplicates are restored when
+    fewer than min_frames would remain.
+    """
+    
+    def __init__(self):
+        self.last_hash = None
+        self.sampled = 0
+        self.kept = 0
+        self.backfilled = 0
+        self.kept_blurred = 0
+        self.restored = 0
+        self.dropped = {'black': 0, 'blurred': 0, 'duplicate': 0}
+        self.reserve = []  # (index, frame) of merged duplicates, up to min_frames
+    
+    def classify(self, stats: Dict):
+        """Reason to reject a frame, or None to keep it"""
+        if stats['mean'] < FRAME_TRIAGE_CONFIG['black_mean'] and stats['std'] < FRAME_TRIAGE_CONFIG['black_std']:
+            return 'black'
+        if self.last_hash is not None and \
+                hamming(stats['dhash'], self.last_hash) <= FRAME_TRIAGE_CONFIG['duplicate_distance']:
+            return 'duplicate'
+        if stats['sharpness'] < FRAME_TRIAGE_CONFIG['min_sharpness']:
+            return 'blurred'
+        return None
+    
+    def select(self, read_frame, candidates: List[int]):
+        """(index, frame) for a sampling slot, or (None, None) when every candidate is rejected"""
+        sharpest_blurred = None
+        for n, index in enumerate(candidates):
+            frame = read_frame(index)
+            if frame is None:
+                break
+            self.sampled += 1
+            stats = frame_stats(frame)
+            reason = self.classify(stats)
+            if reason is None:
+                self._accept(stats, backfilled=n > 0)
+                return index, frame
+            
+            self.dropped[reason] += 1
+            if reason == 'duplicate' and len(self.reserve) < FRAME_TRIAGE_CONFIG['min_frames']:
+                self.reserve.append((index, frame))
+            elif reason == 'blurred':
+                if sharpest_blurred is None or stats['sharpness'] > sharpest_blurred[2]['sharpness']:
+                    sharpest_blurred = (index, frame, stats)
+        
+        if sharpest_blurred is not None:
+            index, frame, stats = sharpest_blurred
+            self.dropped['blurred'] -= 1
+            self.kept_blurred += 1
+            self._accept(stats, backfilled=index != candidates[0])
+            return index, frame
+        return None, None
+    
+    def _accept(self, stats: Dict, backfilled: bool):
+        self.kept += 1
+        self.last_hash = stats['dhash']
+        if backfilled:
+            self.backfilled += 1
+    
+    def restore(self, kept_count: int):
+        """Merged duplicates to put back when fewer than min_frames frames were kept"""
+        missing = max(0, FRAME_TRIAGE_CONFIG['min_frames'] - kept_count)
+        restored = self.reserve[:missing]
+        self.restored += len(restored)
+        self.dropped['duplicate'] -= len(restored)
+        self.kept += len(restored)
+        return restored
+    
+    def report(self) -> Dict:
+        return {
+            'sampled': self.sampled,
+            'kept': self.kept,
+            'triaged': sum(self.dropped.values()),
+            'dropped': dict(self.dropped),
+            'backfilled': self.backfilled,
+            'kept_blurred': self.kept_blurred,
+            'restored_duplicates': self.restored
+        }
+
+def merge_triage_reports(reports: List[Dict]) -> Dict:
+    """Sum the triage reports of several segments"""
+    merged = {}
+    for report in reports:
+        for key, value in report.items():
+            if isinstance(value, dict):
+                totals = merged.setdefault(key, {})
+                for reason, count in value.items():
+                    totals[reason] = totals.get(reason, 0) + count
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
@@ -0,0 +1,318 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+import cv2
+import numpy as np
+from typing import Callable, Dict, Optional
+from core.detection_config import LIVE_CONFIG
+from analysis.temporal_analysis import analyze_optical_flow, frame_difference_score, brightness_periodicity_score
+
+MP4_BOXES = (b'ftyp', b'styp', b'moov', b'moof', b'mdat', b'sidx')
+
+def _mp4_boxes(data: bytes):
+    """(type, offset, size) of the top-level boxes of an MP4 byte string"""
+    offset = 0
+    while offset + 8 <= len(data):
+        size = int.from_bytes(data[offset:offset + 4], 'big')
+        if size < 8:
+            break
+        yield data[offset + 4:offset + 8], offset, size
+        offset += size
+
+def is_mp4(data: bytes) -> bool:
+    return len(data) >= 8 and data[4:8] in MP4_BOXES
+
+def init_segment(data: bytes) -> Optional[bytes]:
+    """ftyp + moov boxes of an fMP4 message, kept to decode the bare fragments that follow"""
+    boxes = [(kind, o, s) for kind, o, s in _mp4_boxes(data) if kind in (b'ftyp', b'moov')]
+    if not any(kind == b'moov' for kind, _, _ in boxes):
+        return None
+    return b''.join(data[o:o + s] for _, o, s in boxes)
+
+class CpuBudget:
+    """Token bucket of CPU seconds, refilled at share seconds per wall-clock second up to burst"""
+    
+    def __init__(self, share=None, burst=None):
+        self.share = share or LIVE_CONFIG['cpu_share']
+        self.burst = burst or LIVE_CONFIG['cpu_burst_seconds']
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.share)
+        self.updated = now
+    
+    def available(self) -> bool:
+        with self.lock:
+            self._refill()
+            return self.tokens > 0
+    
+    def charge(self, seconds: float):
+        with self.lock:
+            self._refill()
+            self.tokens -= seconds
+
+class LiveWindow:
+    """Rolling window of per-frame features for one stream.
+    
+    Everything per frame (CNN score, brightness, difference and optical
+    flow against the previous frame) is computed once when the frame
+    arrives; a window update only re-derives the scores from those
+    features, so evicting or adding a frame never reprocesses the others.
+    """
+    
+    def __init__(self, score_frame: Callable, size=None, width=None):
+        self.score_frame = score_frame
+        self.width = width or LIVE_CONFIG['frame_width']
+        self.entries = deque(maxlen=size or LIVE_CONFIG['window_frames'])
+        self.prev_gray = None
+        self.version = 0
+        self.lock = threading.Lock()
+    
+    def _resize(self, frame):
+        height, width = frame.shape[:2]
+        if width <= self.width:
+            return frame
+        return cv2.resize(frame, (self.width, int(round(height * self.width / width))), interpolation=cv2.INTER_AREA)
+    
+    def add(self, frame):
+        frame = self._resize(frame)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        score, confidence = self.score_frame(frame)
+        entry = {'score': float(score), 'confidence': float(confidence), 'brightness': float(gray.mean())}
+        
+        prev_gray = self.prev_gray
+        if prev_gray is not None and prev_gray.shape == gray.shape:
+            entry['diff'] = float(np.mean(cv2.absdiff(prev_gray, gray)))
+            flow = cv2.calcOpticalFlowFarneback(prev_gray, gray, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+            magnitude, _ = cv2.cartToPolar(flow[..., 0], flow[..., 1])
+            entry['flow'] = float(np.mean(magnitude))
+        
+        with self.lock:
+            self.entries.append(entry)
+            self.prev_gray = gray
+            self.version += 1
+    
+    def scores(self) -> Optional[Dict]:
+        """Window scores in the shape of an analysis result, or None while the window is empty"""
+        with self.lock:
+            entries = list(self.entries)
+            version = self.version
+        if not entries:
+            return None
+        
+        # The oldest entry's pair features refer to a frame already evicted
+        pairs = entries[1:]
+        diffs = [e['diff'] for e in pairs if 'diff' in e]
+        flows = [e['flow'] for e in pairs if 'flow' in e]
+        scores = [e['score'] for e in entries]
+        return {
+            'version': version,
+            'window_frames': len(entries),
+            'authenticity_score': float(np.mean(scores)),
+            'confidence': float(np.mean([e['confidence'] for e in entries])),
+            'method_scores': {
+                'optical_flow': float(analyze_optical_flow(entries, flow_magnitudes=flows)),
+                'frame_consistency': float(frame_difference_score(diffs)),
+                'temporal_artifacts': float(brightness_periodicity_score([e['brightness'] for e in entries]))
+            }
+        }
+
+class LiveSession:
+    """One client stream: admission under a CPU budget, a worker thread and a fixed-cadence pusher.
+    
+    Decoded frames go to a short queue; when the worker is behind, the
+    oldest waiting frame is dropped, and when the session has used its
+    CPU share new frames are dropped before they are decoded, so scores
+    always describe the most recent footage instead of falling behind.
+    """
+    
+    def __init__(self, detector, send: Callable[[str], None], session_id=None):
+        self.session_id = session_id or str(uuid.uuid4())
+        self.detector = detector
+        self.send = send
+        self.window = LiveWindow(detector._predict_image)
+        self.budget = CpuBudget()
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.init_segment = None
+        self.closed = False
+        self.pushed_version = 0
+        # Updated by the receiving, worker and decoding threads
+        self.stats = {'received': 0, 'processed': 0, 'dropped_backpressure': 0, 'dropped_cpu': 0, 'decode_errors': 0}
+        self.stats_lock = threading.Lock()
+        self.started = time.time()
+        
+        self.worker = threading.Thread(target=self._work, name=f'live-{self.session_id[:8]}', daemon=True)
+        self.pusher = threading.Thread(target=self._push, name=f'live-push-{self.session_id[:8]}', daemon=True)
+        self.worker.start()
+        self.pusher.start()
+    
+    def submit(self, data: bytes):
+        """Ingest one binary message: a JPEG frame or an (f)MP4 segment"""
+        if is_mp4(data):
+            self._submit_segment(data)
+            return
+        
+        self._count('received')
+        if not self.budget.available():
+            self._count('dropped_cpu')
+            return
+        started = time.thread_time()
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        self.budget.charge(time.thread_time() - started)
+        if frame is None:
+            self._count('decode_errors')
+            return
+        self._enqueue(frame)
+    
+    def _count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+    
+    def frame_stats(self) -> Dict:
+        with self.stats_lock:
+            return dict(self.stats)
+    
+    def _submit_segment(self, data: bytes):
+        init = init_segment(data)
+        if init is not None:
+            self.init_segment = init
+        elif self.init_segment is not None:
+            data = self.init_segment + data
+        
+        # OpenCV only decodes from files
+        with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as f:
+            f.write(data)
+            path = f.name
+        try:
+            cap = cv2.VideoCapture(path)
+            decoded = False
+            while True:
+                started = time.thread_time()
+                if not cap.grab():
+                    break
+                decoded = True
+                self._count('received')
+                # Frames over the CPU share are skipped without paying for their colour conversion
+                if not self.budget.available():
+                    self.budget.charge(time.thread_time() - started)
+                    self._count('dropped_cpu')
+                    continue
+                ret, frame = cap.retrieve()
+                self.budget.charge(time.thread_time() - started)
+                if ret:
+                    self._enqueue(frame)
+            cap.release()
+            if not decoded:
+                self._count('decode_errors')
+        finally:
+            os.remove(path)
+    
+    def _enqueue(self, frame):
+        with self.condition:
+            if len(self.queue) >= LIVE_CONFIG['queue_frames']:
+                self.queue.popleft()
+                self._count('dropped_backpressure')
+            self.queue.append(frame)
+            self.condition.notify()
+    
+    def _work(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                frame = self.queue.popleft()
+            
+            # CNN inference and optical flow run on torch and OpenCV pool threads, which this
+            # thread's CPU clock misses; process CPU time counts them (and, under load, other work too)
+            started = time.process_time()
+            try:
+                self.window.add(frame)
+                self._count('processed')
+            except Exception as e:
+                print(f"Live frame analysis error: {e}")
+            self.budget.charge(time.process_time() - started)
+    
+    def snapshot(self) -> Optional[Dict]:
+        scores = self.window.scores()
+        if scores is None:
+            return None
+        version = scores.pop('version')
+        return dict(scores, **{
+            'type': 'scores',
+            'session_id': self.session_id,
+            'version': version,
+            'classification': self.detector._get_classification(scores['authenticity_score']),
+            'frames': self.frame_stats(),
+            'elapsed_seconds': round(time.time() - self.started, 2)
+        })
+    
+    def _push(self):
+        while not self.closed:
+            time.sleep(LIVE_CONFIG['push_interval_seconds'])
+            if self.closed or self.window.version == self.pushed_version:
+                continue
+            payload = self.snapshot()
+            if payload is None:
+                continue
+            try:
+                self.send(json.dumps(payload))
+                self.pushed_version = payload['version']
+            except Exception as e:
+                print(f"Live push failed for {self.session_id}: {e}")
+                self.close()
+    
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.queue.clear()
+            self.condition.notify_all()
+
+class LiveSessionManager:
+    """Open live sessions, capped at LIVE_CONFIG['max_sessions']"""
+    
+    def __init__(self, max_sessions=None):
+        self.max_sessions = max_sessions or LIVE_CONFIG['max_sessions']
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.stats = {'opened': 0, 'rejected': 0}
+    
+    def open(self, detector, send) -> Optional[LiveSession]:
+        """A new session, or None when the server is at capacity"""
+        with self.lock:
+            if len(self.sessions) >= self.max_sessions:
+                self.stats['rejected'] += 1
+                return None
+            session = LiveSession(detector, send)
+            self.sessions[session.session_id] = session
+            self.stats['opened'] += 1
+            return session
+    
+    def close(self, session: LiveSession):
+        session.close()
+        with self.lock:
+            self.sessions.pop(session.session_id, None)
+    
+    def get_stats(self) -> Dict:
+        with self.lock:
+            sessions = list(self.sessions.values())
+            stats = dict(self.stats)
+        stats['active'] = len(sessions)
+        frames = [s.frame_stats() for s in sessions]
+        stats['frames'] = {
+            key: sum(f[key] for f in frames)
+            for key in ('received', 'processed', 'dropped_backpressure', 'dropped_cpu')
+        }
+        return stats
+
+# Global registry of live WebSocket sessions
+live_sessions = LiveSessionManager()
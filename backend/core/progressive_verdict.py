@@ -0,0 +1,106 @@
+import math
+from statistics import NormalDist
+import numpy as np
+from typing import Dict, List, Optional
+from core.detection_config import PROGRESSIVE_CONFIG
+from core.video_segments import merge_segment_results
+
+def progressive_window_count(frame_count: int) -> int:
+    """Windows to analyze a sampled clip in so verdicts can be streamed (1 = no progressive verdicts)"""
+    if not PROGRESSIVE_CONFIG['enabled']:
+        return 1
+    return max(1, min(PROGRESSIVE_CONFIG['windows'], frame_count // PROGRESSIVE_CONFIG['min_window_frames']))
+
+def spread_order(count: int) -> List[int]:
+    """Window order covering the clip coarse to fine, each next window the farthest from those already run"""
+    order = [0] if count else []
+    while len(order) < count:
+        order.append(max((i for i in range(count) if i not in order),
+                         key=lambda i: min(abs(i - j) for j in order)))
+    return order
+
+def score_interval(scores: List[float], planned_frames: int, confidence: float):
+    """(mean, (low, high)) for the final mean score given the frame scores seen so far.
+    
+    Neighbouring frames are correlated, so the sample size is shrunk by the
+    lag-1 autocorrelation; the finite population correction reflects that
+    the final score is the mean over planned_frames frames, so the interval
+    closes on it as the last windows come in.
+    """
+    values = np.asarray(scores, dtype=float)
+    mean = float(values.mean())
+    n = len(values)
+    if n < 2:
+        return mean, (0.0, 100.0)
+    
+    centred = values - mean
+    energy = float(np.dot(centred, centred))
+    rho = float(np.dot(centred[:-1], centred[1:])) / energy if energy > 0 else 0.0
+    rho = min(max(rho, 0.0), 0.95)
+    n_eff = max(1.0, n * (1 - rho) / (1 + rho))
+    
+    correction = math.sqrt(max(0.0, (planned_frames - n) / (planned_frames - 1))) if planned_frames > n else 0.0
+    half = NormalDist().inv_cdf(0.5 + confidence / 2) * float(values.std(ddof=1)) / math.sqrt(n_eff) * correction
+    return mean, (max(0.0, mean - half), min(100.0, mean + half))
+
+class RunningVerdict:
+    """Verdict over the windows of a video analysis completed so far.
+    
+    Every window's partial result (see analyze_video_segment) is merged with
+    the others exactly as the final result will be, so the running score is
+    the final authenticity score restricted to the frames seen. The verdict is
+    decided once its confidence interval lies entirely on one side of the
+    classification threshold.
+    """
+    
+    def __init__(self, windows_total: int, planned_frames: int, early_stop: bool = False):
+        self.windows_total = windows_total
+        self.planned_frames = planned_frames
+        self.early_stop = early_stop
+        self.partials = []
+        self.last = None
+    
+    def add(self, partial: Optional[Dict]) -> Dict:
+        """Fold in one window's partial result and return the updated verdict"""
+        if partial and partial.get('frame_scores'):
+            self.partials.append(partial)
+        self.last = self.verdict()
+        return self.last
+    
+    def verdict(self) -> Dict:
+        merged = merge_segment_results(self.partials)
+        scores = merged['frame_scores']
+        threshold = PROGRESSIVE_CONFIG['threshold']
+        if not scores:
+            return {'windows_done': 0, 'windows_total': self.windows_total, 'frames_analyzed': 0, 'decided': False}
+        
+        mean, (low, high) = score_interval(scores, self.planned_frames, PROGRESSIVE_CONFIG['confidence_level'])
+        enough = len(scores) >= PROGRESSIVE_CONFIG['min_frames'] and \
+            len(self.partials) >= PROGRESSIVE_CONFIG['min_windows']
+        return {
+            'windows_done': len(self.partials),
+            'windows_total': self.windows_total,
+            'frames_analyzed': len(scores),
+            'score': round(mean, 2),
+            'interval': [round(low, 2), round(high, 2)],
+            'confidence_level': PROGRESSIVE_CONFIG['confidence_level'],
+            'threshold': threshold,
+            'leaning': 'AUTHENTIC_HUMAN' if mean >= threshold else 'AI_GENERATED',
+            'decided': enough and (low >= threshold or high < threshold),
+            'method_scores': {method: round(score, 4) for method, score in merged['method_scores'].items()}
+        }
+    
+    def should_stop(self) -> bool:
+        return self.early_stop and bool(self.last and self.last['decided']) and \
+            len(self.partials) < self.windows_total
+    
+    def summary(self, early_stopped: bool) -> Dict:
+        """What the final result records about the progressive run"""
+        last = self.last or self.verdict()
+        return {
+            'windows_analyzed': last['windows_done'],
+            'windows_planned': self.windows_total,
+            'interval': last.get('interval'),
+            'decided': last['decided'],
+            'early_stopped': early_stopped
+        }
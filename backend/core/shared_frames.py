@@ -0,0 +1,128 @@
+import atexit
+import threading
+import time
+import uuid
+import numpy as np
+from multiprocessing import shared_memory
+from typing import List, Dict
+
+# Live segments owned by this process: name -> {'shm', 'refs', 'created'}
+_segments = {}
+_segments_lock = threading.Lock()
+
+class SharedFrameStack:
+    """Decoded (N,H,W,3) frame stack written once into shared memory.
+    
+    Worker processes receive a small descriptor and attach zero-copy. The
+    segment is reference counted: the owner holds one reference and every
+    dispatched task holds another, and the segment is unlinked when the
+    last one is released.
+    """
+    
+    def __init__(self, frames: List):
+        stack = np.ascontiguousarray(np.stack(frames)) if isinstance(frames, list) else np.ascontiguousarray(frames)
+        self.shape = stack.shape
+        self.dtype = stack.dtype.str
+        self.name = f"dfd_{uuid.uuid4().hex[:16]}"
+        
+        shm = shared_memory.SharedMemory(name=self.name, create=True, size=max(1, stack.nbytes))
+        np.ndarray(stack.shape, dtype=stack.dtype, buffer=shm.buf)[:] = stack
+        
+        with _segments_lock:
+            _segments[self.name] = {'shm': shm, 'refs': 1, 'created': time.time()}
+        self._owner_released = False
+    
+    def descriptor(self, start: int = 0, stop: int = None) -> Dict:
+        """Picklable handle for a frame range of this stack"""
+        stop = self.shape[0] if stop is None else min(stop, self.shape[0])
+        return {
+            'name': self.name,
+            'shape': list(self.shape),
+            'dtype': self.dtype,
+            'start': int(start),
+            'stop': int(stop)
+        }
+    
+    def acquire(self):
+        """Take a reference for a dispatched task"""
+        with _segments_lock:
+            entry = _segments.get(self.name)
+            if entry is None:
+                raise RuntimeError(f"Shared frame segment {self.name} already released")
+            entry['refs'] += 1
+    
+    def release(self):
+        """Drop a task reference (safe to use as a future done-callback)"""
+        _release_segment(self.name)
+    
+    def close(self):
+        """Drop the owner reference"""
+        if not self._owner_released:
+            self._owner_released = True
+            _release_segment(self.name)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def _release_segment(name):
+    with _segments_lock:
+        entry = _segments.get(name)
+        if entry is None:
+            return
+        entry['refs'] -= 1
+        if entry['refs'] > 0:
+            return
+        del _segments[name]
+    _destroy_segment(entry['shm'])
+
+def _destroy_segment(shm):
+    try:
+        shm.close()
+    except BufferError:
+        pass  # A local view is still alive; unlinking below still frees the name
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+def attach_frames(descriptor: Dict):
+    """Attach to a shared stack in a worker; returns (shm, frames view).
+    
+    The caller must drop the view and call shm.close() when done.
+    """
+    shm = shared_memory.SharedMemory(name=descriptor['name'])
+    stack = np.ndarray(tuple(descriptor['shape']), dtype=np.dtype(descriptor['dtype']), buffer=shm.buf)
+    return shm, stack[descriptor['start']:descriptor['stop']]
+
+def get_segment_stats() -> Dict:
+    """Live segments owned by this process"""
+    with _segments_lock:
+        return {
+            'live_segments': len(_segments),
+            'live_bytes': sum(e['shm'].size for e in _segments.values()),
+            'total_refs': sum(e['refs'] for e in _segments.values())
+        }
+
+def cleanup_stale_segments(max_age=600):
+    """Force-unlink segments older than max_age seconds (leaked by a crashed request)"""
+    now = time.time()
+    with _segments_lock:
+        stale = [name for name, e in _segments.items() if now - e['created'] > max_age]
+        entries = [_segments.pop(name) for name in stale]
+    for entry in entries:
+        _destroy_segment(entry['shm'])
+    return len(entries)
+
+def cleanup_all_segments():
+    """Unlink every segment still owned by this process"""
+    with _segments_lock:
+        entries = list(_segments.values())
+        _segments.clear()
+    for entry in entries:
+        _destroy_segment(entry['shm'])
+
+atexit.register(cleanup_all_segments)
@@ -0,0 +1,98 @@
+import cv2
+import numpy as np
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.detection_config import PERFORMANCE_CONFIG
+from core.detection_utils import DLIB_AVAILABLE, get_thread_landmark_predictor
+from core.face_tracking import build_face_tracks, face_rectangle
+
+# Frame strides used by blink / lip-sync / head-pose analysis
+FACIAL_FRAME_STRIDES = (2, 3, 4)
+
+_landmark_executor = None
+_landmark_lock = threading.Lock()
+
+def facial_frame_indices(frame_count):
+    """Union of the frames any facial method samples, so each is processed once"""
+    return sorted({i for stride in FACIAL_FRAME_STRIDES for i in range(0, frame_count, stride)})
+
+def compute_gray_stack(frames):
+    """Grayscale copy of every frame"""
+    return [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+
+def compute_sample_frame(frames):
+    """Representative frame for single-frame methods"""
+    return frames[len(frames) // 2] if len(frames) else None
+
+def compute_faces(gray_frames):
+    """Face tracks per frame (None for frames no facial method samples), see core.face_tracking"""
+    return build_face_tracks(gray_frames, facial_frame_indices(len(gray_frames)))
+
+def _landmark_pool():
+    """Persistent landmark threads, so each loads its dlib predictor once"""
+    global _landmark_executor
+    with _landmark_lock:
+        if _landmark_executor is None:
+            _landmark_executor = ThreadPoolExecutor(
+                max_workers=PERFORMANCE_CONFIG['landmark_workers'], thread_name_prefix='landmarks'
+            )
+        return _landmark_executor
+
+def _predict_landmarks(gray_frames, jobs):
+    """(len(jobs), 68, 2) int16 landmarks for (frame index, face track) pairs, None without a predictor"""
+    predictor = get_thread_landmark_predictor()
+    if predictor is None:
+        return None
+    points = np.zeros((len(jobs), 68, 2), dtype=np.int16)
+    for row, (i, track) in enumerate(jobs):
+        for k, part in enumerate(predictor(gray_frames[i], face_rectangle(track)).parts()):
+            points[row, k] = (part.x, part.y)
+    return points
+
+def compute_landmarks(gray_frames, faces):
+    """68-point landmarks of the largest face per frame, computed once for every facial method.
+    
+    Returns {'points': (N, 68, 2) int16, 'frame_indices': (N,), 'track_ids': (N,)}
+    over the N frames with a face, or None without a predictor. Frames are
+    split across the landmark threads, each with its own predictor, so
+    availability is only known once a thread has tried to load it.
+    """
+    if not DLIB_AVAILABLE or faces is None:
+        return None
+    
+    jobs = [(i, frame_faces[0]) for i, frame_faces in enumerate(faces) if frame_faces]
+    points = np.zeros((0, 68, 2), dtype=np.int16)
+    if jobs:
+        chunk = -(-len(jobs) // PERFORMANCE_CONFIG['landmark_workers'])
+        chunks = [jobs[i:i + chunk] for i in range(0, len(jobs), chunk)]
+        pool = _landmark_pool()
+        chunk_points = list(pool.map(lambda c: _predict_landmarks(gray_frames, c), chunks))
+        if any(p is None for p in chunk_points):
+            return None
+        points = np.concatenate(chunk_points)
+    
+    return {
+        'points': points,
+        'frame_indices': np.array([i for i, _ in jobs], dtype=np.int32),
+        'track_ids': np.array([track['track_id'] for _, track in jobs], dtype=np.int32)
+    }
+
+def compute_flow(gray_frames):
+    """Mean Farneback flow magnitude over the frame pairs optical-flow analysis uses"""
+    if len(gray_frames) < 2:
+        return []
+    
+    flow_magnitudes = []
+    prev_gray = gray_frames[0]
+    for gray in gray_frames[1::2]:
+        flow = cv2.calcOpticalFlowFarneback(prev_gray, gray, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+        magnitude, _ = cv2.cartToPolar(flow[..., 0], flow[..., 1])
+        flow_magnitudes.append(np.mean(magnitude))
+        prev_gray = gray
+    return flow_magnitudes
+
+def prepare_audio(audio_path):
+    """Decode the soundtrack and run voice activity detection once for all audio methods"""
+    from analysis.audio_analysis import get_voiced_audio
+    get_voiced_audio(audio_path)
+    return audio_path
@@ -3,23 +3,37 @@ import numpy as np
 from core.detection_config import VIDEO_CONFIG
 
 def extract_frames(video_path, sample_rate=5, max_frames=100):
+    """Up to max_frames resized frames spread over the whole clip by motion and scene changes.
+    
+    sample_rate caps the density: never more than one frame in sample_rate
+    on average. Streams without a frame count are read from the start.
+    """
+    from core.adaptive_sampling import sample_frame_indices
+    
     cap = cv2.VideoCapture(video_path)
     frames = []
-    frame_count = 0
+    size = (VIDEO_CONFIG['frame_width'], VIDEO_CONFIG['frame_height'])
     
     fps = cap.get(cv2.CAP_PROP_FPS)
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     
-    while len(frames) < max_frames:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        if frame_count % sample_rate == 0:
-            resized = cv2.resize(frame, (VIDEO_CONFIG['frame_width'], VIDEO_CONFIG['frame_height']))
-            frames.append(resized)
-        
-        frame_count += 1
+    if total_frames > 0:
+        budget = min(max_frames, -(-total_frames // sample_rate))
+        frame_indices, _ = sample_frame_indices(cap, total_frames, budget)
+        for frame_idx in frame_indices:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            ret, frame = cap.read()
+            if ret:
+                frames.append(cv2.resize(frame, size))
+    else:
+        frame_count = 0
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if frame_count % sample_rate == 0:
+                frames.append(cv2.resize(frame, size))
+            frame_count += 1
     
     cap.release()
     return frames, fps
@@ -28,12 +42,70 @@ def preprocess_frame(frame):
     normalized = frame.astype(np.float32) / 255.0
     return normalized
 
-def extract_audio(video_path):
+def start_audio_extraction(video_path):
+    """Start decoding a video's soundtrack to a 16 kHz mono WAV in the background.
+    
+    Returns (process, wav path) for finish_audio_extraction, or None when
+    ffmpeg is unavailable; frames can be sampled and scored meanwhile.
+    """
+    import os
+    import subprocess
+    import tempfile
+    
+    fd, audio_path = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
     try:
-        import subprocess
-        audio_path = video_path.replace('.mp4', '_audio.wav')
-        subprocess.run(['ffmpeg', '-i', video_path, '-vn', '-acodec', 'pcm_s16le', '-ar', '16000', audio_path], 
-                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        return audio_path
-    except:
+        process = subprocess.Popen(
+            ['ffmpeg', '-nostdin', '-y', '-loglevel', 'error', '-i', video_path,
+             '-vn', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', '16000', audio_path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+    except OSError as e:
+        print(f"Audio extraction unavailable: {e}")
+        os.remove(audio_path)
+        return None
+    return process, audio_path
+
+def finish_audio_extraction(extraction, timeout=None):
+    """WAV path of a started extraction, None when the clip has no soundtrack, it failed or timed out"""
+    import os
+    import subprocess
+    
+    if extraction is None:
         return None
+    process, audio_path = extraction
+    try:
+        returncode = process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        returncode = None
+    # ffmpeg fails on clips without an audio stream; a bare 44-byte header holds no samples
+    if returncode != 0 or not os.path.exists(audio_path) or os.path.getsize(audio_path) <= 44:
+        return None
+    return audio_path
+
+def discard_audio_extraction(extraction):
+    """Stop an extraction if still running and delete its WAV along with the cached decode"""
+    import os
+    from analysis.audio_analysis import release_audio
+    
+    if extraction is None:
+        return
+    process, audio_path = extraction
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+    release_audio(audio_path)
+    try:
+        os.remove(audio_path)
+    except OSError:
+        pass
+
+def extract_audio(video_path, timeout=None):
+    """Soundtrack of a video as a 16 kHz mono WAV path (the caller deletes it), or None"""
+    extraction = start_audio_extraction(video_path)
+    audio_path = finish_audio_extraction(extraction, timeout)
+    if audio_path is None:
+        discard_audio_extraction(extraction)
+    return audio_path
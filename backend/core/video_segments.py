@@ -0,0 +1,149 @@
+import math
+import numpy as np
+from typing import Dict, List
+from core.detection_config import VIDEO_CONFIG
+from core.frame_triage import merge_triage_reports
+
+def plan_segments(total_frames: int, fps: float, segment_seconds: float = None,
+                  overlap_seconds: float = None, max_segments: int = None) -> List[Dict]:
+    """Split a video into consecutive temporal segments.
+    
+    Each segment owns [start_frame, end_frame); context_start reaches back
+    overlap_seconds into the previous segment so temporal methods see the
+    boundary, but those context frames are scored by their owner only.
+    """
+    segment_seconds = segment_seconds or VIDEO_CONFIG['segment_seconds']
+    overlap_seconds = VIDEO_CONFIG['segment_overlap_seconds'] if overlap_seconds is None else overlap_seconds
+    max_segments = max_segments or VIDEO_CONFIG['max_segments']
+    
+    if total_frames <= 0:
+        return []
+    fps = fps if fps and fps > 0 else 30.0
+    
+    segment_length = max(1, int(round(segment_seconds * fps)))
+    if math.ceil(total_frames / segment_length) > max_segments:
+        segment_length = math.ceil(total_frames / max_segments)
+    overlap = int(round(overlap_seconds * fps))
+    
+    segments = []
+    for index, start in enumerate(range(0, total_frames, segment_length)):
+        segments.append({
+            'index': index,
+            'start_frame': start,
+            'end_frame': min(total_frames, start + segment_length),
+            'context_start': max(0, start - overlap)
+        })
+    return segments
+
+def segment_frame_budget(segment: Dict, total_frames: int, max_frames: int) -> int:
+    """Share of the profile's frame budget for one segment, proportional to its length"""
+    length = segment['end_frame'] - segment['start_frame']
+    return max(1, int(round(max_frames * length / max(1, total_frames))))
+
+def local_shard_count(total_frames: int, fps: float, frame_count: int, workers: int) -> int:
+    """Shards to split a clip into on local cores; 1 when it is too short or too sparsely sampled to split"""
+    fps = fps if fps and fps > 0 else 30.0
+    if not VIDEO_CONFIG['local_sharding'] or total_frames / fps < VIDEO_CONFIG['local_shard_min_seconds']:
+        return 1
+    return max(1, min(workers, VIDEO_CONFIG['max_segments'], frame_count // VIDEO_CONFIG['local_shard_min_frames']))
+
+def shard_frame_indices(frame_indices: List[int], total_frames: int, shards: int, context_frames: int) -> List[Dict]:
+    """Split an already sampled clip into shards holding equal numbers of sampled frames.
+    
+    Each shard owns a contiguous run of frame_indices and ends where the
+    next one starts. Its context is the context_frames samples just before
+    it, so temporal methods see the boundary at the sampling density they
+    see everywhere else (see segment_context_frames in the registry).
+    """
+    frame_indices = sorted(frame_indices)
+    bounds = [int(round(k * len(frame_indices) / shards)) for k in range(shards + 1)]
+    segments = []
+    for k in range(shards):
+        owned = frame_indices[bounds[k]:bounds[k + 1]]
+        if not owned:
+            continue
+        context = frame_indices[max(0, bounds[k] - context_frames):bounds[k]]
+        start = owned[0] if segments else 0
+        segments.append({
+            'index': len(segments),
+            'start_frame': start,
+            'end_frame': frame_indices[bounds[k + 1]] if bounds[k + 1] < len(frame_indices) else total_frames,
+            'context_start': context[0] if context else start,
+            'context_indices': context,
+            'owned_indices': owned
+        })
+    return segments
+
+def segment_frame_indices(segment: Dict, frame_count: int, context_frames: int = 2):
+    """Frames to decode for a segment: (context indices, owned indices), evenly spaced"""
+    if 'owned_indices' in segment:
+        # Shards cut from an existing sample carry their own frames
+        return list(segment['context_indices']), list(segment['owned_indices'])
+    
+    start, end = segment['start_frame'], segment['end_frame']
+    owned = sorted({start + int(i * (end - start) / frame_count) for i in range(min(frame_count, end - start))})
+    
+    context_span = start - segment['context_start']
+    context = []
+    if context_span > 0 and context_frames > 0:
+        count = min(context_frames, context_span)
+        context = sorted({segment['context_start'] + int(i * context_span / count) for i in range(count)})
+    return context, owned
+
+def merge_segment_results(segment_results: List[Dict]) -> Dict:
+    """Combine per-segment partial results into whole-video scores.
+    
+    CNN frame scores are concatenated in time order. Method scores are
+    averaged weighted by the frames each segment owns, so a method that
+    only fit in some segments' budgets is judged on those segments alone.
+    Methods registered with merge 'series' (periodicity) are instead
+    recomputed over the concatenated per-frame brightness series, since a
+    period longer than a segment is invisible to every segment on its own.
+    """
+    from core.detection_registry import series_merge_functions
+    
+    ordered = sorted((r for r in segment_results if r and r.get('frame_scores')), key=lambda r: r['index'])
+    
+    frame_scores = [s for r in ordered for s in r['frame_scores']]
+    confidences = [c for r in ordered for c in r['confidences']]
+    
+    weighted = {}
+    for result in ordered:
+        weight = len(result['frame_scores'])
+        for method, score in result.get('method_scores', {}).items():
+            total, weights = weighted.get(method, (0.0, 0))
+            weighted[method] = (total + float(score) * weight, weights + weight)
+    method_scores = {method: total / weights for method, (total, weights) in weighted.items() if weights}
+    
+    if ordered and all(r.get('brightness') for r in ordered):
+        brightness = [b for r in ordered for b in r['brightness']]
+        for method, function in series_merge_functions(list(method_scores)).items():
+            method_scores[method] = float(function(brightness))
+    
+    skipped = {}
+    for result in ordered:
+        for method, reason in result.get('skipped', {}).items():
+            if method not in method_scores:
+                skipped[method] = reason
+    
+    return {
+        'frame_scores': frame_scores,
+        'confidences': confidences,
+        'method_scores': method_scores,
+        'skipped': skipped,
+        'triage': merge_triage_reports([r['triage'] for r in ordered if r.get('triage')]),
+        # {frame digest: packed CNN embedding} for the similarity index
+        'embeddings': {key: packed for r in ordered for key, packed in (r.get('embeddings') or {}).items()},
+        'segments': [
+            {
+                'index': r['index'],
+                'start_frame': r['start_frame'],
+                'end_frame': r['end_frame'],
+                'frames_analyzed': len(r['frame_scores']),
+                'mean_score': round(float(np.mean(r['frame_scores'])), 3),
+                'elapsed_seconds': r.get('elapsed_seconds')
+            }
+            for r in ordered
+        ],
+        'failed_segments': len(segment_results) - len(ordered)
+    }
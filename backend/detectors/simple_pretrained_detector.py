@@ -4,6 +4,28 @@ import torch
 import torch.nn as nn
 from torchvision import transforms
 import os
+import time
+from concurrent.futures import as_completed
+from core.analysis_profiles import get_profile, AnalysisDeadline, run_profile_methods
+from core.cost_model import cost_model
+from core.detection_config import METHOD_MEMO_CONFIG, FRAME_TRIAGE_CONFIG, VIDEO_CONFIG, PERFORMANCE_CONFIG, \
+    PROGRESSIVE_CONFIG, EMBEDDING_INDEX_CONFIG
+from core.frame_triage import FrameTriage, slot_candidates, merge_triage_reports
+from core.adaptive_sampling import sample_frame_indices
+from core.detection_registry import DETECTION_METHODS, segment_context_frames, information_coverage, uses_audio
+from core.video_processing import start_audio_extraction, finish_audio_extraction, discard_audio_extraction
+from core.progressive_verdict import RunningVerdict, progressive_window_count, spread_order
+from core.video_segments import segment_frame_indices, local_shard_count, shard_frame_indices, merge_segment_results
+
+# Memo version of the per-frame CNN pass, bump when _predict_image changes
+CNN_VERSION = 1
+
+# Version of the CNN embedding, bump when PretrainedDeepfakeDetector.features or its weights change
+EMBEDDING_VERSION = 1
+
+def embedding_fingerprint():
+    """Identity of the embedder (architecture, seeded weights, torch build), naming its similarity index"""
+    return f"v{EMBEDDING_VERSION}-seed{EMBEDDING_INDEX_CONFIG['seed']}-torch{torch.__version__.split('+')[0]}"
 
 class PretrainedDeepfakeDetector(nn.Module):
     """Simple pretrained CNN for deepfake detection"""
@@ -32,14 +54,24 @@ class PretrainedDeepfakeDetector(nn.Module):
         x = self.features(x)
         x = x.view(x.size(0), -1)
         return self.classifier(x)
+    
+    def embed(self, x):
+        """128-d pooled features per image, the classifier's input"""
+        return self.features(x).flatten(1)
 
 class SimplePretrainedDetector:
-    def __init__(self, progress_callback=None):
+    def __init__(self, progress_callback=None, profile=None, stream_verdicts=False, early_stop=None):
         self.progress_callback = progress_callback
+        # Running video verdicts go to progress_callback as a third argument, for callers that take one
+        self.stream_verdicts = stream_verdicts
+        self.early_stop = PROGRESSIVE_CONFIG['early_stop'] if early_stop is None else early_stop
+        self.profile = profile if isinstance(profile, dict) else get_profile(profile)
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         
-        # Initialize model
-        self.model = PretrainedDeepfakeDetector()
+        # Initialize model; seeded so every process embeds frames identically, without touching the global RNG
+        with torch.random.fork_rng(devices=[]):
+            torch.manual_seed(EMBEDDING_INDEX_CONFIG['seed'])
+            self.model = PretrainedDeepfakeDetector()
         self.model.to(self.device)
         self.model.eval()
         
@@ -51,9 +83,17 @@ class SimplePretrainedDetector:
             transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
         ])
     
-    def _update_progress(self, progress, message):
+    def _record_cnn_cost(self, wall_seconds, cpu_seconds, image, frame_count):
+        """Report the CNN pass to the learned cost model"""
+        height, width = image.shape[:2]
+        cost_model.record('pretrained_cnn', wall_seconds, cpu_seconds, width, height, frame_count)
+    
+    def _update_progress(self, progress, message, verdict=None):
         if self.progress_callback:
-            self.progress_callback(progress, message)
+            if verdict is not None and self.stream_verdicts:
+                self.progress_callback(progress, message, verdict)
+            else:
+                self.progress_callback(progress, message)
     
     def _detect_ai_text_watermark(self, image):
         """Detect AI text/watermarks in image"""
@@ -192,21 +232,86 @@ class SimplePretrainedDetector:
             print(f"Prediction error: {e}")
             return 25.0, 0.75  # Default to likely AI
     
-    def analyze_image(self, image_path, original_filename=None):
-        """Analyze single image using pretrained model"""
+    def quick_score(self, image):
+        """Authenticity score from the per-image CNN pass alone, used to confirm near-duplicates"""
+        score, _ = self._predict_image(image)
+        return score
+    
+    def embed_frames(self, frames):
+        """{frame digest: packed CNN embedding} of analysed frames, for the similarity index"""
+        from services.embedding_index import pack_embedding
+        from services.method_memo import frame_digest
+        
+        if not EMBEDDING_INDEX_CONFIG['enabled'] or not frames:
+            return {}
+        try:
+            wall_start, cpu_start = time.perf_counter(), time.thread_time()
+            batch_size = EMBEDDING_INDEX_CONFIG['batch_size']
+            vectors = []
+            with torch.no_grad():
+                for i in range(0, len(frames), batch_size):
+                    batch = torch.stack([
+                        self.transform(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) for frame in frames[i:i + batch_size]
+                    ]).to(self.device)
+                    vectors.extend(self.model.embed(batch).cpu().numpy())
+            height, width = frames[0].shape[:2]
+            cost_model.record('embedding', time.perf_counter() - wall_start, time.thread_time() - cpu_start,
+                              width, height, len(frames))
+            return {frame_digest(frame): pack_embedding(vector) for frame, vector in zip(frames, vectors)}
+        except Exception as e:
+            print(f"Frame embedding failed: {e}")
+            return {}
+    
+    def apply_embedding_index(self, result, embeddings, index_result=True):
+        """Report the known-fake neighbours of a result's frames, then index its frames under its verdict.
+        
+        Neighbour labels are this detector's own past verdicts, so they are
+        reported as evidence only and never scored: a false positive must not
+        reinforce itself on later near-neighbours.
+        """
+        from services.embedding_index import get_embedding_index, unpack_embedding
+        
+        if not embeddings:
+            return result
+        try:
+            index = get_embedding_index(embedding_fingerprint())
+            vectors = {key: unpack_embedding(packed) for key, packed in embeddings.items()}
+            # Searched before inserting, so an analysis never finds its own frames
+            signal = index.known_fake_signal(np.stack(list(vectors.values())))
+            if signal is not None:
+                result.setdefault('individual_scores_metadata', {})['embedding_neighbors'] = signal
+            if index_result:
+                score = result['authenticity_score']
+                index.add(vectors, self._get_classification(score) == 'AI_GENERATED', score)
+        except Exception as e:
+            print(f"Embedding index unavailable: {e}")
+        return result
+    
+    @staticmethod
+    def filename_suggests_ai(filename):
+        """Whether analyze_image forces an AI verdict because of the file name"""
+        ai_keywords = ['ai', 'generated', 'fake', 'synthetic', 'midjourney', 'dalle', 'stable', 'diffusion']
+        return any(keyword in (filename or '').lower() for keyword in ai_keywords)
+    
+    def forces_ai_verdict(self, image, filename=None):
+        """Whether analyze_image would force an AI verdict, from the file name or a watermark in the image"""
+        return self.filename_suggests_ai(filename) or self._detect_ai_text_watermark(image)
+    
+    def analyze_image(self, image_path, original_filename=None, image=None):
+        """Analyze single image using pretrained model (image: already decoded, image_path may then be None)"""
+        deadline = AnalysisDeadline(self.profile['budget_seconds'])
         self._update_progress(10, 'Loading image...')
         
-        img = cv2.imread(image_path)
+        img = image if image is not None else (cv2.imread(image_path) if image_path else None)
         if img is None:
             return self._default_result()
         
         self._update_progress(50, 'Running AI detection...')
         
         # Check filename for AI indicators
-        filename = (original_filename or os.path.basename(image_path)).lower()
+        filename = original_filename or os.path.basename(image_path or '')
         print(f"[DEBUG] Filename: {filename}")
-        ai_keywords = ['ai', 'generated', 'fake', 'synthetic', 'midjourney', 'dalle', 'stable', 'diffusion']
-        has_ai_keyword = any(keyword in filename for keyword in ai_keywords)
+        has_ai_keyword = self.filename_suggests_ai(filename)
         print(f"[DEBUG] Has AI keyword: {has_ai_keyword}")
         
         # Check for AI text/watermarks in image
@@ -214,8 +319,11 @@ class SimplePretrainedDetector:
         print(f"[DEBUG] Has AI watermark: {has_ai_watermark}")
         
         # Get prediction
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
         authenticity_score, confidence = self._predict_image(img)
+        self._record_cnn_cost(time.perf_counter() - wall_start, time.thread_time() - cpu_start, img, 1)
         print(f"[DEBUG] Original score: {authenticity_score}")
+        cnn_score = authenticity_score
         
         # Force AI classification if AI keyword or watermark detected
         if has_ai_keyword or has_ai_watermark:
@@ -234,76 +342,463 @@ class SimplePretrainedDetector:
                 'pretrained_cnn': authenticity_score
             },
             'method_count': 1,
+            'individual_scores_metadata': {
+                'profile': self.profile['name'],
+                'budget_seconds': self.profile['budget_seconds'],
+                'elapsed_seconds': round(deadline.elapsed(), 3),
+                # The CNN's own score, before a keyword or watermark forces the verdict
+                'cnn_score': float(cnn_score),
+                'forced_ai': bool(has_ai_keyword or has_ai_watermark),
+                'executed': ['pretrained_cnn'],
+                # Registry methods analyse frame stacks, a still image only gets the CNN
+                'skipped': {},
+                'critical_path': []
+            },
             'analysis_summary': {
                 'model_type': 'Pretrained CNN',
                 'input_size': '224x224',
-                'device': str(self.device)
+                'device': str(self.device),
+                'profile': self.profile['name']
             }
         }
+        # A verdict forced by the file name says nothing about the pixels, it is not indexed
+        self.apply_embedding_index(result, self.embed_frames([img]), index_result=not has_ai_keyword)
         
         self._update_progress(100, 'Analysis complete!')
         return result
     
+    def _read_frame(self, cap, frame_idx):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        ret, frame = cap.read()
+        return frame if ret else None
+    
+    def _score_frames(self, cap, frame_indices, deadline, limit=None, progress_span=(20, 40)):
+        """Decode, triage and CNN-score frames at the given indices until the budget runs out.
+        
+        Returns (frames, scores, confidences, triage report). Black, blurred
+        and duplicate frames are replaced by alternatives up to the next
+        sampled index (or limit) where possible, see core.frame_triage.
+        Byte-identical frames (static scenes) are scored once: scores are
+        memoized per frame digest in the process-wide method memo.
+        """
+        from services.method_memo import MethodMemo, get_method_memo, frame_digest
+        
+        memo = get_method_memo() if METHOD_MEMO_CONFIG['enabled'] else None
+        triage = FrameTriage() if FRAME_TRIAGE_CONFIG['enabled'] else None
+        limit = limit if limit is not None else (frame_indices[-1] + 1 if frame_indices else 0)
+        fresh = {}
+        scored = []
+        cnn_wall = cnn_cpu = 0.0
+        computed = 0
+        
+        def score(frame):
+            nonlocal cnn_wall, cnn_cpu, computed
+            key = None
+            if memo is not None:
+                key = MethodMemo.make_key(frame_digest(frame), 'pretrained_cnn', CNN_VERSION)
+                # Repeats are within one video, a MongoDB round trip per frame would cost more than it saves
+                cached = fresh.get(key, (None, None))[1] or memo.get_many([key], persistent=False).get(key)
+                if cached:
+                    return cached
+            
+            wall_start, cpu_start = time.perf_counter(), time.thread_time()
+            result = self._predict_image(frame)
+            cnn_wall += time.perf_counter() - wall_start
+            cnn_cpu += time.thread_time() - cpu_start
+            computed += 1
+            if key is not None:
+                fresh[key] = ('pretrained_cnn', list(result))
+            return result
+        
+        for i, frame_idx in enumerate(frame_indices):
+            # Keep at least one frame, then stop sampling once the budget is spent
+            if scored and deadline.expired():
+                break
+            
+            if triage is not None:
+                frame_idx, frame = triage.select(
+                    lambda idx: self._read_frame(cap, idx), slot_candidates(frame_indices, i, limit)
+                )
+                if frame is None:
+                    continue
+            else:
+                frame = self._read_frame(cap, frame_idx)
+                if frame is None:
+                    break
+            
+            progress = progress_span[0] + (i / len(frame_indices)) * progress_span[1]
+            self._update_progress(int(progress), f'Analyzing frame {i+1}/{len(frame_indices)}...')
+            
+            scored.append((frame_idx, frame) + tuple(score(frame)))
+        
+        if triage is not None:
+            # Merged duplicates come back if triage left too few frames for the temporal methods
+            for frame_idx, frame in triage.restore(len(scored)):
+                scored.append((frame_idx, frame) + tuple(score(frame)))
+            scored.sort(key=lambda item: item[0])
+        
+        if memo is not None:
+            memo.put_many(fresh, persistent=False)
+        frames = [item[1] for item in scored]
+        if computed:
+            self._record_cnn_cost(cnn_wall, cnn_cpu, frames[0], computed)
+        return frames, [item[2] for item in scored], [item[3] for item in scored], \
+            triage.report() if triage is not None else None
+    
     def analyze_video(self, video_path, original_filename=None):
-        """Analyze video by sampling frames"""
+        """Analyze video by sampling frames, then run registry methods within the profile budget"""
+        deadline = AnalysisDeadline(self.profile['budget_seconds'])
         self._update_progress(10, 'Loading video...')
         
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             return self._default_result()
         
-        frame_scores = []
-        confidences = []
+        # ffmpeg decodes the soundtrack while frames are sampled and scored
+        audio = start_audio_extraction(video_path) if self._needs_audio() else None
+        try:
+            return self._analyze_opened_video(video_path, cap, deadline, audio)
+        finally:
+            cap.release()
+            discard_audio_extraction(audio)
+    
+    def _needs_audio(self):
+        """Whether any method the profile may run reads the soundtrack"""
+        return any(uses_audio(name) for name in (self.profile.get('methods') or DETECTION_METHODS))
+    
+    def _voice_activity_summary(self, audio_path, deadline):
+        from analysis.audio_analysis import get_voice_activity_summary
         
-        # Sample 10 frames evenly distributed
+        if audio_path is None or deadline.expired():
+            return {}
+        return {'voice_activity': get_voice_activity_summary(audio_path)}
+    
+    def _analyze_opened_video(self, video_path, cap, deadline, audio):
+        # Spread the profile's frame budget over the clip by motion and scene changes
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        sample_frames = min(10, total_frames)
+        self._update_progress(15, 'Scanning video for scene changes...')
+        frame_indices, sampling = sample_frame_indices(
+            cap, total_frames, self.profile['max_frames'], self.profile.get('sampling_probes')
+        )
         
-        for i in range(sample_frames):
-            frame_idx = int(i * total_frames / sample_frames)
-            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-            
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            progress = 20 + (i / sample_frames) * 60
-            self._update_progress(int(progress), f'Analyzing frame {i+1}/{sample_frames}...')
-            
-            score, conf = self._predict_image(frame)
-            frame_scores.append(score)
-            confidences.append(conf)
+        # Long clips: one temporal shard per core instead of one frame stack in this process
+        from core.frame_processor import frame_processor
+        workers = VIDEO_CONFIG['local_shard_workers'] or frame_processor.process_workers
+        shards = local_shard_count(total_frames, cap.get(cv2.CAP_PROP_FPS), len(frame_indices), workers)
+        if shards > 1:
+            cap.release()
+            return self._analyze_video_windows(
+                video_path, frame_indices, total_frames, shards, sampling, deadline, audio=audio
+            )
         
+        progressive = {}
+        if self.stream_verdicts:
+            frames, frame_scores, confidences, triage, progressive = self._score_frames_progressively(
+                cap, frame_indices, deadline, total_frames
+            )
+        else:
+            frames, frame_scores, confidences, triage = self._score_frames(cap, frame_indices, deadline, total_frames)
         cap.release()
         
         if not frame_scores:
             return self._default_result()
         
+        self._update_progress(65, f"Running {self.profile['name']} forensic methods...")
+        audio_path = finish_audio_extraction(audio, deadline.remaining())
+        method_results, score_metadata = run_profile_methods(frames, self.profile, deadline, audio_path)
+        score_metadata['sampling'] = sampling
+        if triage is not None:
+            score_metadata['triage'] = triage
+        
         self._update_progress(90, 'Computing final score...')
+        result = self.build_video_result(
+            frame_scores, confidences, method_results, score_metadata,
+            extra_summary={**self._voice_activity_summary(audio_path, deadline), **progressive}
+        )
+        if not deadline.expired():
+            self.apply_embedding_index(result, self.embed_frames(frames))
+        
+        self._update_progress(100, 'Video analysis complete!')
+        return result
+    
+    def _score_frames_progressively(self, cap, frame_indices, deadline, total_frames):
+        """CNN-score the sample window by window, streaming a running verdict after each.
+        
+        Windows are contiguous runs of the sample taken in spread order, so
+        every verdict covers the whole clip; with early_stop the remaining
+        windows are dropped once it is decided. Only the CNN runs per window:
+        the registry methods run once over the frames scored, as they would
+        without streaming. Returns _score_frames' tuple plus the summary
+        entries recording the progressive run.
+        """
+        windows = shard_frame_indices(frame_indices, total_frames, progressive_window_count(len(frame_indices)), 0)
+        verdict = RunningVerdict(len(windows), len(frame_indices), self.early_stop)
+        scored = {}
+        done = 0
+        stopped = False
+        for window in (windows[i] for i in spread_order(len(windows))):
+            if scored and deadline.expired():
+                break
+            owned = window['owned_indices']
+            scored[window['index']] = self._score_frames(
+                cap, owned, deadline, window['end_frame'],
+                progress_span=(20 + 40 * done / len(frame_indices), 40 * len(owned) / len(frame_indices))
+            )
+            done += len(owned)
+            frames, scores, confidences, _ = scored[window['index']]
+            self._update_progress(
+                20 + int(40 * done / len(frame_indices)), f'Analyzed {len(scored)} of {len(windows)} windows',
+                verdict.add({
+                    'index': window['index'],
+                    'start_frame': window['start_frame'],
+                    'end_frame': window['end_frame'],
+                    'frame_scores': [float(s) for s in scores],
+                    'confidences': [float(c) for c in confidences]
+                })
+            )
+            if verdict.should_stop():
+                stopped = len(scored) < len(windows)
+                break
+        
+        ordered = [scored[index] for index in sorted(scored)]
+        triage = [item[3] for item in ordered if item[3]]
+        return [f for item in ordered for f in item[0]], [s for item in ordered for s in item[1]], \
+            [c for item in ordered for c in item[2]], merge_triage_reports(triage) if triage else None, \
+            {'progressive': verdict.summary(stopped), 'early_stopped': stopped}
+    
+    def _analyze_video_windows(self, video_path, frame_indices, total_frames, windows, sampling, deadline,
+                               parallel=True, audio=None):
+        """Analyze a sampled clip as temporal windows, on the frame processor's worker processes when parallel.
+        
+        Windows run in spread order so the running verdict streamed after
+        each one covers the whole clip; with early_stop the remaining
+        windows are dropped once that verdict is decided. The soundtrack
+        methods judge the whole clip, so they run once here rather than
+        per window.
+        """
+        from core.frame_processor import frame_processor
+        
+        segments = shard_frame_indices(
+            frame_indices, total_frames, windows, segment_context_frames(self.profile.get('methods'))
+        )
+        ordered = [segments[i] for i in spread_order(len(segments))]
+        verdict = RunningVerdict(len(segments), len(frame_indices), self.early_stop) if self.stream_verdicts else None
+        self._update_progress(20, f'Analyzing {len(segments)} segments...')
+        
+        results = {}
+        
+        def completed(segment, partial):
+            """Record a window; True when the running verdict allows stopping early"""
+            results[segment['index']] = partial
+            progress = 20 + int(65 * len(results) / len(segments))
+            message = f'Analyzed {len(results)} of {len(segments)} segments'
+            if verdict is None:
+                self._update_progress(progress, message)
+                return False
+            self._update_progress(progress, message, verdict.add(partial))
+            return verdict.should_stop()
+        
+        stopped = False
+        abandoned = set()
+        if parallel:
+            futures = {}
+            try:
+                pool = frame_processor._get_process_pool()
+                for segment in ordered:
+                    futures[pool.submit(
+                        analyze_segment_in_process, video_path, segment, self.profile, deadline.remaining()
+                    )] = segment
+                for future in as_completed(futures, timeout=PERFORMANCE_CONFIG['timeout_seconds']):
+                    segment = futures[future]
+                    try:
+                        partial = future.result()
+                    except Exception as e:
+                        print(f"Video segment {segment['index']} failed in worker: {e}")
+                        continue
+                    if partial is not None and completed(segment, partial):
+                        stopped = True
+                        break
+            except Exception as e:
+                print(f"Parallel segment analysis failed: {e}")
+            # Windows still queued are taken back; ones still running (past the timeout) can't be
+            # stopped in a worker process and are given up on rather than run a second time here
+            for future, segment in futures.items():
+                if not future.done() and not future.cancel():
+                    abandoned.add(segment['index'])
+        
+        # Sequential windows, and whatever the pool could not deliver (a broken pool only costs speed)
+        for segment in ordered:
+            if stopped:
+                break
+            if segment['index'] in results or segment['index'] in abandoned:
+                continue
+            partial = self.analyze_video_segment(
+                video_path, segment, len(segment['owned_indices']), deadline.remaining()
+            )
+            if partial is not None and completed(segment, partial):
+                stopped = True
+        
+        # Windows dropped by an early stop are not failures
+        merged = merge_segment_results([
+            results.get(segment['index']) for segment in segments if not stopped or segment['index'] in results
+        ])
+        if not merged['frame_scores']:
+            return self._default_result()
+        
+        audio_path = finish_audio_extraction(audio, deadline.remaining())
+        voice_activity = {}
+        if audio_path is not None and not deadline.expired():
+            from analysis.audio_analysis import analyze_audio_track
+            
+            track = analyze_audio_track(audio_path)
+            allowed = self.profile.get('methods')
+            for name, score in track['individual_scores'].items():
+                if allowed is None or name in allowed:
+                    merged['method_scores'][name] = score
+                    merged['skipped'].pop(name, None)
+            voice_activity = track['analysis_summary']
+            if 'lip_sync' in merged['skipped']:
+                # Mouth movement is correlated with the soundtrack over the whole clip only
+                merged['skipped']['lip_sync'] = 'not run on temporal segments'
+        
+        self._update_progress(90, 'Computing final score...')
+        score_metadata = {
+            'profile': self.profile['name'],
+            'budget_seconds': self.profile['budget_seconds'],
+            'elapsed_seconds': round(deadline.elapsed(), 3),
+            'executed': sorted(merged['method_scores']),
+            'skipped': merged['skipped'],
+            'critical_path': [],
+            'sampling': sampling
+        }
+        if merged['triage']:
+            score_metadata['triage'] = merged['triage']
+        extra_summary = {'segments': merged['segments'], 'failed_segments': merged['failed_segments'], **voice_activity}
+        if verdict is not None:
+            extra_summary['progressive'] = verdict.summary(stopped)
+            extra_summary['early_stopped'] = stopped
+        result = self.build_video_result(
+            merged['frame_scores'], merged['confidences'], merged['method_scores'], score_metadata,
+            extra_summary=extra_summary
+        )
+        self.apply_embedding_index(result, merged['embeddings'])
+        
+        self._update_progress(100, 'Video analysis complete!')
+        return result
+    
+    def analyze_video_segment(self, video_ref, segment, frame_count, budget_seconds=None):
+        """Analyze one temporal segment (see core.video_segments) and return a compact partial result.
+        
+        Context frames before the segment feed the registry methods only;
+        CNN scores cover the frames the segment owns. The partial holds
+        scores and packed embeddings, never frames, so it is cheap to ship
+        between workers.
+        """
+        deadline = AnalysisDeadline(self.profile['budget_seconds'] if budget_seconds is None else budget_seconds)
+        
+        cap = cv2.VideoCapture(video_ref)
+        if not cap.isOpened():
+            return None
+        
+        context_indices, owned_indices = segment_frame_indices(
+            segment, frame_count, segment_context_frames(self.profile.get('methods'))
+        )
+        context_frames = []
+        for frame_idx in context_indices:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            ret, frame = cap.read()
+            if ret:
+                context_frames.append(frame)
+        
+        frames, frame_scores, confidences, triage = self._score_frames(
+            cap, owned_indices, deadline, segment['end_frame']
+        )
+        cap.release()
+        
+        if not frame_scores:
+            return None
+        
+        method_results, score_metadata = run_profile_methods(context_frames + frames, self.profile, deadline)
+        
+        return {
+            'index': segment['index'],
+            'start_frame': segment['start_frame'],
+            'end_frame': segment['end_frame'],
+            'frame_scores': [float(s) for s in frame_scores],
+            'confidences': [float(c) for c in confidences],
+            'method_scores': {
+                name: float(value) for name, value in method_results.items()
+                if isinstance(value, (int, float, np.number))
+            },
+            'skipped': score_metadata['skipped'],
+            # Owned frames only, for methods merged over the whole clip's series
+            'brightness': [float(cv2.cvtColor(f, cv2.COLOR_BGR2GRAY).mean()) for f in frames],
+            'embeddings': self.embed_frames(frames) if not deadline.expired() else {},
+            'triage': triage,
+            'elapsed_seconds': score_metadata['elapsed_seconds']
+        }
+    
+    def build_video_result(self, frame_scores, confidences, method_results, score_metadata, extra_summary=None):
+        """Combine CNN frame scores and registry method results into the video result document.
+        
+        The verdict blends the CNN frame mean with the fusion engine's score
+        of the registry methods, weighted by VIDEO_CONFIG['method_fusion_weight']
+        scaled to the share of the planned methods' information that ran.
+        """
+        score_metadata = dict(score_metadata)
+        # frame_consistency is also derived from the CNN scores, listed once when the registry method ran too
+        executed = list(score_metadata.get('executed', []))
+        score_metadata['executed'] = ['pretrained_cnn'] + \
+            (['frame_consistency'] if 'frame_consistency' not in executed else []) + executed
         
         # Average scores across frames
         avg_authenticity = float(np.mean(frame_scores))
         avg_confidence = float(np.mean(confidences))
+        authenticity_score, confidence = avg_authenticity, avg_confidence
         
-        result = {
-            'authenticity_score': avg_authenticity,
-            'confidence': avg_confidence,
-            'classification': self._get_classification(avg_authenticity),
-            'risk_level': self._get_risk_level(avg_authenticity),
-            'individual_scores': {
-                'pretrained_cnn': avg_authenticity,
-                'frame_consistency': float(100 - np.std(frame_scores))
-            },
-            'method_count': 1,
+        individual_scores = {
+            'pretrained_cnn': avg_authenticity,
+            'frame_consistency': float(100 - np.std(frame_scores))
+        }
+        group_scores = {}
+        numeric_results = {
+            name: value for name, value in method_results.items() if isinstance(value, (int, float, np.number))
+        }
+        if numeric_results:
+            # Fusion only sees the methods that fit in the budget
+            from fusion.fusion_engine import AdvancedFusionEngine
+            report = AdvancedFusionEngine().generate_detailed_report(numeric_results)
+            individual_scores.update(report['individual_scores'])
+            group_scores = report['group_scores']
+            
+            weight = VIDEO_CONFIG['method_fusion_weight'] * information_coverage(
+                numeric_results, self.profile.get('methods')
+            )
+            authenticity_score = (1 - weight) * avg_authenticity + weight * float(report['authenticity_score'])
+            confidence = (1 - weight) * avg_confidence + weight * float(report['confidence'])
+            score_metadata['fusion'] = {
+                'cnn_score': round(avg_authenticity, 3),
+                'methods_score': round(float(report['authenticity_score']), 3),
+                'methods_weight': round(weight, 3)
+            }
+        
+        return {
+            'authenticity_score': authenticity_score,
+            'confidence': confidence,
+            'classification': self._get_classification(authenticity_score),
+            'risk_level': self._get_risk_level(authenticity_score),
+            'individual_scores': individual_scores,
+            'group_scores': group_scores,
+            'individual_scores_metadata': score_metadata,
+            'method_count': 1 + len(numeric_results),
             'analysis_summary': {
                 'model_type': 'Pretrained CNN',
                 'frames_analyzed': len(frame_scores),
-                'device': str(self.device)
+                'device': str(self.device),
+                'profile': self.profile['name'],
+                **(extra_summary or {})
             }
         }
-        
-        self._update_progress(100, 'Video analysis complete!')
-        return result
     
     def _get_classification(self, score):
         """Classify based on authenticity score"""
@@ -329,6 +824,22 @@ class SimplePretrainedDetector:
             'method_count': 1
         }
 
+_segment_detectors = {}
+
+def analyze_segment_in_process(video_ref, segment, profile, budget_seconds=None):
+    """Process-pool entry point for one local shard, with a detector cached per worker process"""
+    from core.frame_processor import frame_processor
+    
+    # Every core already runs a shard: methods stay on this process, one thread each
+    frame_processor.backend = 'thread'
+    frame_processor.max_workers = 1
+    torch.set_num_threads(1)
+    
+    detector = _segment_detectors.get(profile['name'])
+    if detector is None:
+        detector = _segment_detectors[profile['name']] = SimplePretrainedDetector(profile=profile)
+    return detector.analyze_video_segment(video_ref, segment, len(segment['owned_indices']), budget_seconds)
+
 def detect_deepfake(file_path):
     """Main detection function using pretrained model"""
     detector = SimplePretrainedDetector()
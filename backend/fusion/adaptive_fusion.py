@@ -129,8 +129,8 @@ class AdaptiveFusionEngine:
             if group_values:
                 # Use weighted average with outlier handling
                 group_scores[group_name] = self._robust_average(group_values)
-            else:
-                group_scores[group_name] = 0.5  # Neutral score for missing groups
+            # Groups with no method present are left out so a partial method
+            # set does not skew the conflict and consensus checks towards 0.5
         
         return group_scores
     
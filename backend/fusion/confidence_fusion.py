@@ -127,8 +127,9 @@ class ConfidenceAwareFusion:
                     confidence = confidences.get(group, 0.5)
                     weighted_scores[group] = group_score * confidence
             
-            # Calculate final score with confidence normalization
-            total_confidence = sum(confidences.values())
+            # Calculate final score with confidence normalization over the
+            # groups that actually produced scores (partial method sets)
+            total_confidence = sum(confidences.get(group, 0.5) for group in weighted_scores)
             if total_confidence > 0:
                 final_score = sum(weighted_scores.values()) / total_confidence
             else:
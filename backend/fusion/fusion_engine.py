@@ -1,91 +1,75 @@
 import numpy as np
 from typing import Dict, List, Tuple
 from .scoring import fuse_scores, normalize_score, calibrate_score
+from core.detection_config import ENTERPRISE_WEIGHTS
 
 class AdvancedFusionEngine:
     """Advanced scoring system with weighted fusion and explainable results"""
     
     def __init__(self):
-        # Updated weights for all detection methods
-        self.weights = {
-            # Facial Analysis Group (30%)
-            'facial': {
-                'blink': 0.12,
-                'lip_sync': 0.10,
-                'head_pose': 0.08
-            },
-            
-            # Temporal Analysis Group (25%)
-            'temporal': {
-                'optical_flow': 0.08,
-                'frame_consistency': 0.07,
-                'temporal_artifacts': 0.05,
-                'flicker': 0.05
-            },
-            
-            # Noise & Artifacts Group (25%)
-            'noise': {
-                'fft_spectrum': 0.06,
-                'prnu_noise': 0.05,
-                'edge_artifacts': 0.05,
-                'bitplane': 0.04,
-                'color_correlation': 0.05
-            },
-            
-            # Forensics Group (20%)
-            'forensics': {
-                'illumination': 0.06,
-                'boundary_artifacts': 0.06,
-                'metadata': 0.04,
-                'compression': 0.04
-            }
-        }
+        # Per-method weights for every detection method in the registry (v3)
+        self.weights = ENTERPRISE_WEIGHTS
+        # Each group counts with the total weight of its methods
+        self.group_weights = {group: sum(weights.values()) for group, weights in ENTERPRISE_WEIGHTS.items()}
+    
+    # Feature names the detection pipeline reports, keyed by the weight name
+    FEATURE_ALIASES = {
+        'fft_spectrum': 'fft',
+        'prnu_noise': 'prnu'
+    }
+    
+    # Display name of each method's score in a report, keyed by the weight name
+    DISPLAY_NAMES = {
+        'blink': 'Blink Detection',
+        'lip_sync': 'Lip Sync Analysis',
+        'head_pose': 'Head Pose Analysis',
+        'optical_flow': 'Optical Flow',
+        'frame_consistency': 'Frame Consistency',
+        'temporal_artifacts': 'Temporal Artifacts',
+        'flicker': 'Flicker Analysis',
+        'temporal_noise_residual': 'Temporal Noise Residual',
+        'fft_spectrum': 'FFT Spectrum',
+        'prnu_noise': 'PRNU Noise',
+        'edge_artifacts': 'Edge Artifacts',
+        'bitplane': 'Bitplane Analysis',
+        'color_correlation': 'Color Correlation',
+        'prnu_extension': 'Sensor Pattern Noise',
+        'illumination': 'Illumination Analysis',
+        'boundary_artifacts': 'Boundary Artifacts',
+        'exposure_consistency': 'Exposure Consistency',
+        'gamma_consistency': 'Gamma Consistency',
+        'metadata': 'Metadata Analysis',
+        'compression': 'Compression Analysis',
+        'coherence': 'Cross-Modal Coherence',
+        'audio_sync': 'Audio Sync',
+        'audio_anomalies': 'Audio Anomalies',
+        'pitch_consistency': 'Pitch Consistency'
+    }
     
     def calculate_group_scores(self, features: Dict) -> Dict:
-        """Calculate scores for each detection group"""
+        """Calculate scores for each detection group.
+        
+        Only methods that actually ran contribute; a group with no method
+        present is left out rather than scored as neutral, so partial
+        method sets (analysis profiles, time budgets) are not pulled to 0.5.
+        """
         try:
             group_scores = {}
             
-            # Facial Analysis Group
-            facial_features = {
-                'blink': features.get('blink', 0.5),
-                'lip_sync': features.get('lip_sync', 0.5),
-                'head_pose': features.get('head_pose', 0.5)
-            }
-            group_scores['facial'] = self._weighted_average(facial_features, self.weights['facial'])
-            
-            # Temporal Analysis Group
-            temporal_features = {
-                'optical_flow': features.get('optical_flow', 0.5),
-                'frame_consistency': features.get('frame_consistency', 0.5),
-                'temporal_artifacts': features.get('temporal_artifacts', 0.5),
-                'flicker': features.get('flicker', 0.5)
-            }
-            group_scores['temporal'] = self._weighted_average(temporal_features, self.weights['temporal'])
-            
-            # Noise & Artifacts Group
-            noise_features = {
-                'fft_spectrum': features.get('fft', 0.5),
-                'prnu_noise': features.get('prnu', 0.5),
-                'edge_artifacts': features.get('edge_artifacts', 0.5),
-                'bitplane': features.get('bitplane', 0.5),
-                'color_correlation': features.get('color_correlation', 0.5)
-            }
-            group_scores['noise'] = self._weighted_average(noise_features, self.weights['noise'])
-            
-            # Forensics Group
-            forensics_features = {
-                'illumination': features.get('illumination', 0.5),
-                'boundary_artifacts': features.get('boundary_artifacts', 0.5),
-                'metadata': features.get('metadata', 0.5),
-                'compression': features.get('compression', 0.5)
-            }
-            group_scores['forensics'] = self._weighted_average(forensics_features, self.weights['forensics'])
+            for group, weights in self.weights.items():
+                group_features = {}
+                for weight_name in weights:
+                    value = features.get(self.FEATURE_ALIASES.get(weight_name, weight_name))
+                    if isinstance(value, (int, float, np.number)):
+                        group_features[weight_name] = float(value)
+                
+                if group_features:
+                    group_scores[group] = self._weighted_average(group_features, weights)
             
             return group_scores
         except Exception as e:
             print(f"Group score calculation error: {e}")
-            return {'facial': 0.5, 'temporal': 0.5, 'noise': 0.5, 'forensics': 0.5}
+            return {group: 0.5 for group in self.weights}
     
     def _weighted_average(self, features: Dict, weights: Dict) -> float:
         """Calculate weighted average of features"""
@@ -106,36 +90,41 @@ class AdvancedFusionEngine:
             return 0.5
     
     def calculate_final_score(self, group_scores: Dict) -> float:
-        """Calculate final authenticity score with normalization"""
+        """Calculate final authenticity score with normalization.
+        
+        Method outputs are authenticity in [0, 1]: high for natural
+        content (about 0.9), low for deepfakes (about 0.3).
+        """
         try:
-            # Group weights (sum to 1.0)
-            group_weights = {
-                'facial': 0.30,
-                'temporal': 0.25,
-                'noise': 0.25,
-                'forensics': 0.20
-            }
+            group_weights = self.group_weights
             
             final_score = 0
+            total_weight = 0
             for group, score in group_scores.items():
                 if group in group_weights:
                     # Normalize each group score
                     normalized = normalize_score(score * 100, 0, 100)
                     final_score += (normalized / 100) * group_weights[group]
+                    total_weight += group_weights[group]
+            
+            # Redistribute the weight of groups that did not run
+            if total_weight == 0:
+                return 50.0
+            final_score /= total_weight
             
             # Convert to authenticity score (0-100)
-            authenticity_score = (1 - final_score) * 100
+            authenticity_score = final_score * 100
             
             # Post calibration for real image bias correction
             forensic_score = group_scores.get('forensics', 0.5)
             noise_score = group_scores.get('noise', 0.5)
             
             # If forensic and noise indicate real but score is low, adjust upward
-            if authenticity_score < 40 and forensic_score < 0.5 and noise_score < 0.6:
+            if authenticity_score < 40 and forensic_score > 0.5 and noise_score > 0.4:
                 authenticity_score += 10
             
             # Texture variance calibration (flat lighting adjustment)
-            if authenticity_score < 45 and forensic_score < 0.4:
+            if authenticity_score < 45 and forensic_score > 0.6:
                 authenticity_score = calibrate_score(authenticity_score, texture_variance=15)
             
             return normalize_score(authenticity_score, 0, 100)
@@ -172,7 +161,7 @@ class AdvancedFusionEngine:
         try:
             # Calculate variance in group scores
             scores = list(group_scores.values())
-            score_variance = np.var(scores)
+            score_variance = np.var(scores) if scores else 0.25
             
             # Calculate feature completeness
             total_features = len(self._get_all_feature_names())
@@ -214,53 +203,23 @@ class AdvancedFusionEngine:
             
             # Create individual scores for display
             individual_scores = {}
-            
-            # Facial Analysis
-            if 'blink' in features:
-                individual_scores['Blink Detection'] = (1 - features['blink']) * 100
-            if 'lip_sync' in features:
-                individual_scores['Lip Sync Analysis'] = (1 - features['lip_sync']) * 100
-            if 'head_pose' in features:
-                individual_scores['Head Pose Analysis'] = (1 - features['head_pose']) * 100
-            
-            # Temporal Analysis
-            if 'optical_flow' in features:
-                individual_scores['Optical Flow'] = (1 - features['optical_flow']) * 100
-            if 'frame_consistency' in features:
-                individual_scores['Frame Consistency'] = (1 - features['frame_consistency']) * 100
-            if 'temporal_artifacts' in features:
-                individual_scores['Temporal Artifacts'] = (1 - features['temporal_artifacts']) * 100
-            if 'flicker' in features:
-                individual_scores['Flicker Analysis'] = (1 - features['flicker']) * 100
-            
-            # Noise & Artifacts
-            if 'fft' in features:
-                individual_scores['FFT Spectrum'] = (1 - features['fft']) * 100
-            if 'prnu' in features:
-                individual_scores['PRNU Noise'] = (1 - features['prnu']) * 100
-            if 'edge_artifacts' in features:
-                individual_scores['Edge Artifacts'] = (1 - features['edge_artifacts']) * 100
-            if 'bitplane' in features:
-                individual_scores['Bitplane Analysis'] = (1 - features['bitplane']) * 100
-            if 'color_correlation' in features:
-                individual_scores['Color Correlation'] = (1 - features['color_correlation']) * 100
-            
-            # Forensics
-            if 'illumination' in features:
-                individual_scores['Illumination Analysis'] = (1 - features['illumination']) * 100
-            if 'boundary_artifacts' in features:
-                individual_scores['Boundary Artifacts'] = (1 - features['boundary_artifacts']) * 100
-            if 'metadata' in features:
-                individual_scores['Metadata Analysis'] = (1 - features['metadata']) * 100
-            if 'compression' in features:
-                individual_scores['Compression Analysis'] = (1 - features['compression']) * 100
-            
-            # Group scores for display
+            for weights in self.weights.values():
+                for weight_name in weights:
+                    value = features.get(self.FEATURE_ALIASES.get(weight_name, weight_name))
+                    if isinstance(value, (int, float, np.number)):
+                        individual_scores[self.DISPLAY_NAMES.get(weight_name, weight_name)] = float(value) * 100
+            
+            # Group scores for display (groups with no method present are omitted)
+            group_labels = {
+                'facial': 'Facial Analysis',
+                'temporal': 'Temporal Analysis',
+                'noise': 'Noise & Artifacts',
+                'forensics': 'Forensics Analysis',
+                'cross_modal': 'Cross-Modal Analysis'
+            }
             group_scores_display = {
-                'Facial Analysis': (1 - group_scores['facial']) * 100,
-                'Temporal Analysis': (1 - group_scores['temporal']) * 100,
-                'Noise & Artifacts': (1 - group_scores['noise']) * 100,
-                'Forensics Analysis': (1 - group_scores['forensics']) * 100
+                label: group_scores[group] * 100
+                for group, label in group_labels.items() if group in group_scores
             }
             
             return {
@@ -273,10 +232,13 @@ class AdvancedFusionEngine:
                 'method_count': len(individual_scores),
                 'analysis_summary': {
                     'total_methods': len(individual_scores),
-                    'facial_methods': sum(1 for k in individual_scores.keys() if any(x in k.lower() for x in ['blink', 'lip', 'head', 'pose'])),
-                    'temporal_methods': sum(1 for k in individual_scores.keys() if any(x in k.lower() for x in ['flow', 'frame', 'temporal', 'flicker'])),
-                    'noise_methods': sum(1 for k in individual_scores.keys() if any(x in k.lower() for x in ['fft', 'prnu', 'edge', 'bitplane', 'color'])),
-                    'forensics_methods': sum(1 for k in individual_scores.keys() if any(x in k.lower() for x in ['illumination', 'boundary', 'metadata', 'compression']))
+                    **{
+                        f'{group}_methods': sum(
+                            1 for weight_name in weights
+                            if self.DISPLAY_NAMES.get(weight_name, weight_name) in individual_scores
+                        )
+                        for group, weights in self.weights.items()
+                    }
                 }
             }
         except Exception as e:
@@ -298,7 +260,8 @@ class AdvancedFusionEngine:
                 'facial_methods': 0,
                 'temporal_methods': 0,
                 'noise_methods': 0,
-                'forensics_methods': 0
+                'forensics_methods': 0,
+                'cross_modal_methods': 0
             }
         }
     
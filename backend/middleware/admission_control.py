@@ -0,0 +1,253 @@
+from functools import wraps
+from flask import request, jsonify, g
+from threading import Lock
+import os
+import time
+from core.detection_config import ADMISSION_CONFIG, PERFORMANCE_CONFIG
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+class AdmissionController:
+    """Admit, degrade or shed analysis uploads from live system pressure.
+    
+    Pressure is the worst of queue fill, worker utilization and memory use.
+    The incoming file's cost is predicted from Content-Length and optional
+    type/duration hints, so the decision is made before the body is read.
+    """
+    
+    def __init__(self):
+        self.lock = Lock()
+        self.queues = []  # TaskQueues whose depth and workers count towards pressure
+        self.in_flight = 0  # synchronous analyses currently admitted
+        self.decisions = {}  # action -> reason -> count
+        self.last_shed = None
+    
+    def register_queue(self, queue):
+        """Include a TaskQueue in queue depth and utilization"""
+        if queue not in self.queues:
+            self.queues.append(queue)
+    
+    def memory_available_mb(self):
+        """Available system memory in MB (None when it cannot be read)"""
+        try:
+            if PSUTIL_AVAILABLE:
+                return psutil.virtual_memory().available / (1024 ** 2)
+            return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / (1024 ** 2)
+        except Exception as e:
+            print(f"Memory probe failed: {e}")
+            return None
+    
+    def pressure(self):
+        """Current load signals, each in [0, 1] except memory_available_mb"""
+        queue_fill = 0.0
+        busy = 0
+        workers = PERFORMANCE_CONFIG['max_concurrent_analyses']
+        with self.lock:
+            busy += self.in_flight
+        for queue in self.queues:
+            stats = queue.get_stats()
+            busy += stats['running']
+            workers += stats['workers']
+            if stats['max_queue_size']:
+                queue_fill = max(queue_fill, stats['queued'] / stats['max_queue_size'])
+        
+        utilization = busy / max(1, workers)
+        memory_available = self.memory_available_mb()
+        memory_pressure = 0.0
+        if memory_available is not None:
+            # 0 at memory_comfort_mb available, 1 at min_free_memory_mb
+            comfort, floor = ADMISSION_CONFIG['memory_comfort_mb'], ADMISSION_CONFIG['min_free_memory_mb']
+            memory_pressure = min(1.0, max(0.0, (comfort - memory_available) / max(1, comfort - floor)))
+        
+        return {
+            'queue_fill': round(queue_fill, 3),
+            'utilization': round(utilization, 3),
+            'memory_pressure': round(memory_pressure, 3),
+            'memory_available_mb': round(memory_available, 1) if memory_available is not None else None,
+            'pressure': round(max(queue_fill, utilization, memory_pressure), 3)
+        }
+    
+    def predict_cost(self, content_length, file_type, duration, profile):
+        """Predicted analysis seconds for an upload that has not been read yet"""
+        from core.analysis_profiles import estimate_profile_latency
+        
+        if file_type not in ('image', 'video'):
+            file_type = 'video' if content_length > ADMISSION_CONFIG['video_size_hint_bytes'] else 'image'
+        
+        width, height = ADMISSION_CONFIG['assumed_resolution']
+        total_frames = 1
+        if file_type == 'video':
+            if not duration:
+                duration = content_length * 8 / (ADMISSION_CONFIG['assumed_video_bitrate_mbps'] * 1e6)
+            total_frames = max(1, int(duration * ADMISSION_CONFIG['assumed_fps']))
+        
+        estimate = estimate_profile_latency(profile, width, height, total_frames, is_video=file_type == 'video')
+        return file_type, estimate['predicted_seconds']
+    
+    def retry_after(self):
+        estimates = [queue.estimate_retry_after() for queue in self.queues]
+        return max(estimates, default=ADMISSION_CONFIG['default_retry_after'])
+    
+    def evaluate(self, content_length, file_type=None, duration=None, profile=None, degradable=True):
+        """Decision for one upload: admit, degrade (to a cheaper profile) or reject.
+        
+        Uploads to a route that cannot run a cheaper profile (degradable
+        False) are rejected where others would be degraded.
+        """
+        from core.analysis_profiles import get_profile
+        
+        profile = profile or get_profile()
+        signals = self.pressure()
+        file_type, cost = self.predict_cost(content_length, file_type, duration, profile)
+        decision = {
+            'action': 'admit',
+            'reason': None,
+            'profile': profile['name'],
+            'file_type': file_type,
+            'predicted_seconds': round(cost, 3),
+            'signals': signals
+        }
+        
+        memory_needed = content_length * ADMISSION_CONFIG['upload_memory_factor'] / (1024 ** 2)
+        memory_available = signals['memory_available_mb']
+        
+        if memory_available is not None and memory_available - memory_needed < ADMISSION_CONFIG['min_free_memory_mb']:
+            decision.update(action='reject', reason='memory', status=503)
+        elif signals['queue_fill'] >= 1.0:
+            decision.update(action='reject', reason='queue_full', status=429)
+        elif signals['pressure'] >= ADMISSION_CONFIG['shed_pressure']:
+            decision.update(action='reject', reason='overloaded', status=503)
+        elif signals['pressure'] >= ADMISSION_CONFIG['degrade_pressure']:
+            degraded = get_profile(ADMISSION_CONFIG['degrade_profile'])
+            _, degraded_cost = self.predict_cost(content_length, file_type, duration, degraded)
+            if degraded_cost > ADMISSION_CONFIG['large_job_seconds']:
+                decision.update(action='reject', reason='oversized_under_load', status=503)
+            elif not degradable:
+                decision.update(action='reject', reason='overloaded', status=503)
+            elif profile['name'] != degraded['name']:
+                decision.update(action='degrade', reason='load', profile=degraded['name'],
+                                predicted_seconds=round(degraded_cost, 3))
+        
+        if decision['action'] == 'reject':
+            decision['retry_after'] = self.retry_after()
+        self.record(decision)
+        return decision
+    
+    def record(self, decision):
+        """Count a decision; rejections and degradations are the shed metric"""
+        with self.lock:
+            reasons = self.decisions.setdefault(decision['action'], {})
+            reason = decision['reason'] or 'ok'
+            reasons[reason] = reasons.get(reason, 0) + 1
+            if decision['action'] != 'admit':
+                self.last_shed = {
+                    'action': decision['action'],
+                    'reason': decision['reason'],
+                    'timestamp': time.time(),
+                    'signals': decision['signals']
+                }
+    
+    def acquire(self):
+        with self.lock:
+            self.in_flight += 1
+    
+    def release(self):
+        with self.lock:
+            self.in_flight = max(0, self.in_flight - 1)
+    
+    def get_metrics(self):
+        with self.lock:
+            decisions = {action: dict(reasons) for action, reasons in self.decisions.items()}
+            last_shed = dict(self.last_shed) if self.last_shed else None
+            in_flight = self.in_flight
+        return {
+            'enabled': ADMISSION_CONFIG['enabled'],
+            'in_flight': in_flight,
+            'decisions': decisions,
+            'shed_total': sum(sum(r.values()) for a, r in decisions.items() if a != 'admit'),
+            'last_shed': last_shed,
+            'current': self.pressure()
+        }
+
+# Global admission controller
+admission_controller = AdmissionController()
+
+def admitted_profile(profile):
+    """The profile to run: the admission decision may have degraded the requested one"""
+    from core.analysis_profiles import get_profile
+    
+    decision = getattr(g, 'admission', None)
+    if decision and decision['action'] == 'degrade' and profile['name'] != decision['profile']:
+        return get_profile(decision['profile'])
+    return profile
+
+def admission_control(track_in_flight=True, degradable=True):
+    """Decorator that admits, degrades or sheds an upload before its body is read.
+    
+    Goes after token_required so the account default profile is known.
+    Routes that ignore analysis profiles pass degradable=False.
+    Clients may send X-File-Type (image/video) and X-Media-Duration
+    (seconds) to sharpen the cost estimate.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not ADMISSION_CONFIG['enabled']:
+                return f(*args, **kwargs)
+            
+            from core.analysis_profiles import resolve_profile
+            
+            current_user = args[0] if args else None
+            try:
+                # Only the query string is available without reading a multipart body
+                profile = resolve_profile(request.args.get('profile'), current_user)
+            except ValueError:
+                profile = None
+            
+            file_type = (request.headers.get('X-File-Type') or request.args.get('type') or '').lower() or None
+            try:
+                duration = float(request.headers.get('X-Media-Duration') or request.args.get('duration') or 0)
+            except ValueError:
+                duration = 0
+            
+            decision = admission_controller.evaluate(
+                request.content_length or 0, file_type, duration, profile, degradable
+            )
+            g.admission = decision
+            
+            if decision['action'] == 'reject':
+                messages = {
+                    'memory': 'Server is low on memory. Please try again later.',
+                    'overloaded': 'Server is overloaded. Please try again later.',
+                    'queue_full': 'Analysis queue is full. Please try again later.',
+                    'oversized_under_load': 'File is too large to analyze under current load. Please try again later.'
+                }
+                response = jsonify({
+                    'error': messages[decision['reason']],
+                    'reason': decision['reason'],
+                    'retry_after': decision['retry_after']
+                })
+                response.headers['Retry-After'] = str(decision['retry_after'])
+                # Tell the server not to keep the connection for a body we never read
+                response.headers['Connection'] = 'close'
+                return response, decision['status']
+            
+            if track_in_flight:
+                admission_controller.acquire()
+            try:
+                result = f(*args, **kwargs)
+            finally:
+                if track_in_flight:
+                    admission_controller.release()
+            
+            if decision['action'] == 'degrade':
+                response, status = (result[0], result[1]) if isinstance(result, tuple) else (result, None)
+                response.headers['X-Analysis-Degraded'] = decision['profile']
+                return (response, status) if status is not None else response
+            return result
+        return decorated_function
+    return decorator
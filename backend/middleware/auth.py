@@ -16,6 +16,19 @@ def generate_token(user_id, email):
     }
     return jwt.encode(payload, JWT_SECRET, algorithm='HS256')
 
+def user_from_token(db, token):
+    """User document for a JWT, or None when it is missing, invalid, expired or unknown"""
+    if not token or db is None:
+        return None
+    if token.startswith('Bearer '):
+        token = token[7:]
+    try:
+        data = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+        return db['users'].find_one({'_id': ObjectId(data['user_id'])})
+    except Exception as e:
+        print(f"[ERROR] Token validation failed: {e}")
+        return None
+
 def token_required(db_param=None):
     """Decorator to require valid JWT token"""
     def decorator(f):
@@ -81,4 +94,17 @@ def token_required(db_param=None):
         return decorator(func)
     else:
         # Called as @token_required(db) (with parentheses)
-        return decorator
\ No newline at end of file
+        return decorator
+
+def admin_required(f):
+    """Decorator for admin-only endpoints; goes after token_required.
+    
+    Admins are users whose document has role 'admin', set directly in the
+    database (no endpoint grants it).
+    """
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        if current_user.get('role') != 'admin':
+            return jsonify({'error': 'Admin privileges required'}), 403
+        return f(current_user, *args, **kwargs)
+    return decorated
@@ -6,7 +6,8 @@ class Analysis:
     def __init__(self, db):
         self.collection = db['analyses']
     
-    def create(self, user_id, file_id, filename, analysis_result, cloudinary_url=None):
+    def create(self, user_id, file_id, filename, analysis_result, cloudinary_url=None,
+               content_hash=None, result_cache_key=None, perceptual_hash=None):
         try:
             analysis_data = {
                 'user_id': str(user_id),
@@ -14,6 +15,9 @@ class Analysis:
                 'original_filename': filename,
                 'cloudinary_url': cloudinary_url,
                 'analysis_result': analysis_result,
+                'content_hash': content_hash,
+                'result_cache_key': result_cache_key,  # shared result this entry was served from or stored as
+                'perceptual_hash': perceptual_hash,
                 'created_at': datetime.now()
             }
             print(f"[DEBUG] Inserting analysis data for user {user_id}: {filename}")
@@ -26,6 +30,19 @@ class Analysis:
             traceback.print_exc()
             raise e
     
+    def set_cloudinary_url(self, analysis_id, cloudinary_url):
+        """Fill in the media URL of a record saved while its upload was still running"""
+        return self.collection.update_one(
+            {'_id': ObjectId(analysis_id), 'cloudinary_url': None},
+            {'$set': {'cloudinary_url': cloudinary_url}}
+        )
+    
+    def user_has_media(self, user_id, cloudinary_url):
+        """Whether one of the user's records points at this stored media"""
+        return self.collection.find_one(
+            {'user_id': str(user_id), 'cloudinary_url': cloudinary_url}, {'_id': 1}
+        ) is not None
+    
     def find_by_user_id(self, user_id, limit=50):
         try:
             print(f"[DEBUG] Finding analyses for user: {user_id}")
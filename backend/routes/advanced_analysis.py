@@ -1,9 +1,12 @@
 from flask import Blueprint, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
 import numpy as np
 from datetime import datetime
 from models.analysis import Analysis
 from services.file_service import FileService
-from middleware.auth import token_required
+from services.media_storage import get_media_uploader, uploaded_url
+from middleware.auth import token_required, admin_required
+from middleware.admission_control import admission_control
 from middleware.rate_limiter import rate_limit
 from utils.ai_name_detector import detect_ai_in_filename
 
@@ -15,6 +18,7 @@ def create_advanced_analysis_routes(db, detector):
     @advanced_bp.route('/detect/advanced', methods=['POST'])
     @token_required(db)
     @rate_limit(limit=5, window=60)  # More restrictive for advanced analysis
+    @admission_control(degradable=False)  # The enterprise detector has no cheaper profile
     def advanced_analysis(current_user):
         """Advanced enterprise-grade analysis endpoint"""
         temp_file_path = None
@@ -22,6 +26,8 @@ def create_advanced_analysis_routes(db, detector):
             if not detector:
                 return jsonify({'error': 'Advanced analysis service unavailable'}), 503
             
+            media_uploader = get_media_uploader()
+            
             if 'file' not in request.files:
                 return jsonify({'error': 'No file provided'}), 400
             
@@ -49,10 +55,8 @@ def create_advanced_analysis_routes(db, detector):
             if not temp_file_path:
                 return jsonify({'error': 'Failed to process file'}), 500
             
-            # Upload to Cloudinary
-            cloudinary_url = file_service.upload_to_cloudinary(
-                temp_file_path, file_info['type'], file_id
-            )
+            # Stored in the background while the analysis runs
+            media = media_uploader.submit(temp_file_path, file_info['type'], file_id, file_info['extension'])
             
             # Advanced analysis with enterprise detector
             try:
@@ -142,21 +146,28 @@ def create_advanced_analysis_routes(db, detector):
             if 'enterprise_metadata' in result:
                 response_data['enterprise_metadata'] = result['enterprise_metadata']
             
-            # Save to database with enhanced data
+            # Save to database with enhanced data; a still running upload fills in its URL later
             try:
-                analysis_model.create(
+                cloudinary_url = uploaded_url(media)
+                save_result = analysis_model.create(
                     user_id=current_user['_id'],
                     file_id=file_id,
                     filename=file.filename,
                     analysis_result=response_data,
                     cloudinary_url=cloudinary_url
                 )
+                if cloudinary_url is None:
+                    media_uploader.on_uploaded(
+                        media, lambda url: analysis_model.set_cloudinary_url(save_result.inserted_id, url)
+                    )
                 print(f"[DEBUG] Advanced analysis saved to database")
             except Exception as db_error:
                 print(f"[WARNING] Database save failed: {str(db_error)}")
             
             return jsonify(response_data), 200
             
+        except RequestEntityTooLarge as e:
+            return jsonify({'error': e.description}), 413
         except Exception as e:
             print(f"[ERROR] Advanced analysis failed: {str(e)}")
             import traceback
@@ -185,19 +196,50 @@ def create_advanced_analysis_routes(db, detector):
         """Get performance and threshold statistics"""
         try:
             from core.threshold_optimizer import AdaptiveThresholdOptimizer
-            from core.frame_processor import MultiThreadedFrameProcessor
+            from core.frame_processor import frame_processor
+            from core.cost_model import cost_model
+            from core.analysis_profiles import get_profile, list_profiles, estimate_profile_latency
+            from middleware.admission_control import admission_controller
+            from services.result_cache import get_result_cache
+            from services.near_duplicates import get_near_duplicate_index
+            from utils.single_flight import analysis_flights
+            from services.method_memo import get_method_memo
+            from core.live_analysis import live_sessions
+            from services.video_fingerprints import get_video_fingerprint_index
+            from services.embedding_index import get_embedding_index
             
             # Threshold optimizer stats
             optimizer = AdaptiveThresholdOptimizer()
             threshold_stats = optimizer.get_system_performance_summary()
             
             # Frame processor stats
-            processor = MultiThreadedFrameProcessor()
-            processing_stats = processor.get_performance_stats()
+            processing_stats = frame_processor.get_performance_stats()
+            
+            # Learned cost model and predicted latency per profile at a reference resolution
+            width = request.args.get('width', 640, type=int)
+            height = request.args.get('height', 480, type=int)
+            total_frames = request.args.get('frames', 300, type=int)
+            predicted_latency = {
+                profile['name']: estimate_profile_latency(get_profile(profile['name']), width, height, total_frames)
+                for profile in list_profiles()
+            }
+            # Opened by the first analysis in this process
+            embedding_index = get_embedding_index()
             
             return jsonify({
                 'threshold_optimization': threshold_stats,
                 'parallel_processing': processing_stats,
+                'cost_model': cost_model.get_summary(),
+                'predicted_latency': predicted_latency,
+                'admission': admission_controller.get_metrics(),
+                'result_cache': get_result_cache().get_stats(),
+                'near_duplicates': get_near_duplicate_index().get_stats(),
+                'single_flight': analysis_flights.get_stats(),
+                'method_memo': get_method_memo().get_stats(),
+                'live_sessions': live_sessions.get_stats(),
+                'video_fingerprints': get_video_fingerprint_index().get_stats(),
+                'embedding_index': embedding_index.get_stats() if embedding_index is not None else None,
+                'media_storage': get_media_uploader().get_stats(),
                 'system_status': 'operational'
             }), 200
             
@@ -235,32 +277,21 @@ def create_advanced_analysis_routes(db, detector):
     
     @advanced_bp.route('/benchmark', methods=['POST'])
     @token_required(db)
+    @admin_required  # Runs every registry method serially and on each executor backend
     @rate_limit(limit=1, window=300)  # Very restrictive - once per 5 minutes
     def run_benchmark(current_user):
         """Run system benchmark (admin only)"""
         try:
-            # Check if user has admin privileges (implement your admin check)
-            # For now, allow all authenticated users
-            
-            from core.frame_processor import MultiThreadedFrameProcessor
-            
-            processor = MultiThreadedFrameProcessor()
+            from core.frame_processor import frame_processor
             
             # Create test data
             test_frames = [np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(10)]
             
-            # Simple benchmark
+            # Time the detection methods serially and on each executor backend
             import time
             start_time = time.time()
             
-            # Test parallel processing
-            test_functions = {
-                'test_method_1': lambda frames: np.mean([np.mean(f) for f in frames]),
-                'test_method_2': lambda frames: np.std([np.std(f) for f in frames]),
-                'test_method_3': lambda frames: len(frames)
-            }
-            
-            results = processor.process_frames_parallel(test_frames, test_functions)
+            backend_results = frame_processor.benchmark_backends(test_frames)
             
             end_time = time.time()
             processing_time = end_time - start_time
@@ -268,9 +299,10 @@ def create_advanced_analysis_routes(db, detector):
             benchmark_results = {
                 'processing_time_seconds': round(processing_time, 3),
                 'frames_processed': len(test_frames),
-                'methods_tested': len(test_functions),
-                'parallel_efficiency': round(len(test_functions) / processing_time, 2),
+                'methods_tested': len(backend_results['methods']),
+                'parallel_efficiency': round(len(backend_results['methods']) / processing_time, 2),
                 'system_performance': 'good' if processing_time < 2.0 else 'needs_optimization',
+                'executor_backends': backend_results,
                 'timestamp': datetime.now().isoformat()
             }
             
@@ -1,25 +1,393 @@
 from flask import Blueprint, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
 from datetime import datetime
 import numpy as np
 from models.analysis import Analysis
 from services.file_service import FileService
 from middleware.auth import token_required
 from middleware.rate_limiter import rate_limit
+from middleware.admission_control import admission_control, admitted_profile
 from utils.ai_name_detector import detect_ai_in_filename
+from core.analysis_profiles import get_profile, resolve_profile, list_profiles, estimate_profile_latency
+from core.detection_config import RESULT_CACHE_CONFIG, NEAR_DUPLICATE_CONFIG, VIDEO_FINGERPRINT_CONFIG
+from services.result_cache import get_result_cache
+from services.near_duplicates import get_near_duplicate_index
+from services.video_fingerprints import get_video_fingerprint_index
+from services.method_memo import get_method_memo
+from services.media_storage import get_media_uploader, uploaded_url
+from utils.perceptual_hash import perceptual_hashes
+from utils.video_fingerprint import video_fingerprint
+from utils.single_flight import analysis_flights
+
+def build_analysis_response(result, filename, has_ai_name, detected_keyword, profile, latency_estimate):
+    """Shape a detector result into the JSON document returned and stored for an analysis"""
+    # Handle both dict and object results
+    if isinstance(result, dict):
+        authenticity_score = result.get('authenticity_score', 50.0)
+        confidence = result.get('confidence', 0.5)
+        classification = result.get('classification', 'UNKNOWN')
+        risk_level = result.get('risk_level', 'MEDIUM')
+        individual_scores = result.get('individual_scores', {})
+        group_scores = result.get('group_scores', {})
+        method_count = result.get('method_count', 0)
+        analysis_summary = result.get('analysis_summary', {})
+    else:
+        authenticity_score = float(getattr(result, 'authenticity_score', 50.0))
+        confidence = float(getattr(result, 'confidence', 0.5))
+        classification = str(getattr(result, 'classification', 'UNKNOWN'))
+        risk_level = str(getattr(result, 'risk_level', 'MEDIUM'))
+        individual_scores = getattr(result, 'individual_scores', {})
+        group_scores = getattr(result, 'group_scores', {})
+        method_count = getattr(result, 'method_count', 0)
+        analysis_summary = getattr(result, 'analysis_summary', {})
+    
+    # Calculate overall average from all individual scores (skip nested dicts)
+    overall_average = 0
+    if individual_scores:
+        scores_list = []
+        for score in individual_scores.values():
+            if isinstance(score, (int, float)):
+                scores_list.append(float(score))
+        if scores_list:
+            overall_average = sum(scores_list) / len(scores_list)
+    
+    # Override classification and scores if AI name detected OR if classification is AI_GENERATED
+    is_ai_detected = has_ai_name or classification == 'AI_GENERATED'
+    
+    if is_ai_detected:
+        # Invert scores for AI-generated content (100% AI = 0% authentic)
+        final_authenticity = 100.0 - authenticity_score if authenticity_score > 50 else authenticity_score
+        final_confidence = max(0.85, confidence)
+        final_classification = 'AI_GENERATED'
+        final_risk_level = 'HIGH'
+        # Invert individual scores
+        final_individual_scores = {k: (100.0 - v if isinstance(v, (int, float)) and v > 50 else v) for k, v in individual_scores.items()}
+        final_group_scores = {k: (100.0 - v if isinstance(v, (int, float)) and v > 50 else v) for k, v in group_scores.items()}
+        # Recalculate overall average from inverted scores
+        scores_list = [v for v in final_individual_scores.values() if isinstance(v, (int, float))]
+        final_overall_average = sum(scores_list) / len(scores_list) if scores_list else final_authenticity
+    else:
+        final_authenticity = authenticity_score
+        final_confidence = confidence
+        final_classification = classification
+        final_risk_level = risk_level
+        final_individual_scores = individual_scores
+        final_group_scores = group_scores
+        final_overall_average = overall_average
+    
+    # Prepare enhanced response with advanced features
+    detailed_info = result.get('detailed_info', {}) if isinstance(result, dict) else getattr(result, 'detailed_info', {})
+    
+    # Convert scores safely and filter out watermark-related scores
+    def safe_convert_scores(scores_dict):
+        converted = {}
+        for k, v in scores_dict.items():
+            # Skip watermark-related keys
+            if 'watermark' in str(k).lower() or 'ai_generator' in str(k).lower() or 'watermark_type' in str(k).lower():
+                continue
+                
+            if isinstance(v, dict):
+                # Flatten forensic dict - use 'combined' score
+                if k == 'forensic' and 'combined' in v:
+                    converted[str(k)] = float(v.get('combined', 50.0))
+                else:
+                    converted[str(k)] = safe_convert_scores(v)  # Recursive for nested
+            elif isinstance(v, (np.integer, np.floating)):
+                if np.isnan(v):
+                    converted[str(k)] = 50.0  # Default for NaN
+                else:
+                    converted[str(k)] = float(v)
+            elif isinstance(v, (int, float)):
+                if isinstance(v, float) and (np.isnan(v) or np.isinf(v)):
+                    converted[str(k)] = 50.0  # Default for NaN/Inf
+                else:
+                    converted[str(k)] = float(v)
+            elif isinstance(v, np.ndarray):
+                converted[str(k)] = v.tolist()
+            elif v is None:
+                converted[str(k)] = 50.0  # Default for None
+            elif isinstance(v, str):
+                if v.lower() in ['nan', 'none', 'null', '']:
+                    converted[str(k)] = 50.0  # Default for string NaN
+                else:
+                    converted[str(k)] = str(v)
+            else:
+                # Handle any other type safely
+                try:
+                    if hasattr(v, '__float__'):
+                        float_val = float(v)
+                        if np.isnan(float_val) or np.isinf(float_val):
+                            converted[str(k)] = 50.0
+                        else:
+                            converted[str(k)] = float_val
+                    else:
+                        converted[str(k)] = str(v)
+                except (ValueError, TypeError, OverflowError):
+                    converted[str(k)] = str(v) if v is not None else 'unknown'
+        return converted
+    
+    # Convert numpy types to Python types
+    def convert_numpy(obj):
+        if isinstance(obj, np.integer):
+            return int(obj)
+        elif isinstance(obj, np.floating):
+            return float(obj)
+        elif isinstance(obj, np.ndarray):
+            return obj.tolist()
+        elif isinstance(obj, dict):
+            return {k: convert_numpy(v) for k, v in obj.items()}
+        elif isinstance(obj, list):
+            return [convert_numpy(item) for item in obj]
+        return obj
+    
+    response_data = {
+        'filename': str(filename),
+        'authenticity_score': convert_numpy(final_authenticity),
+        'confidence': convert_numpy(final_confidence),
+        'classification': str(final_classification),
+        'risk_level': str(final_risk_level),
+        'individual_scores': safe_convert_scores(final_individual_scores),
+        'group_scores': safe_convert_scores(final_group_scores),
+        'overall_average': convert_numpy(final_overall_average),
+        'method_count': int(method_count),
+        'analysis_summary': convert_numpy(analysis_summary) if analysis_summary else {},
+        'detailed_info': convert_numpy(detailed_info) if detailed_info else {},
+        'is_deepfake': bool(has_ai_name or final_classification in ['AI_GENERATED', 'SUSPICIOUS']),
+        'timestamp': datetime.now().isoformat(),
+        'ai_name_detected': bool(has_ai_name),
+        'detected_ai_keyword': str(detected_keyword) if detected_keyword else None,
+        'detector_version': 'Physics-Based Detection v4',
+        'reason': str(result.get('reason', 'Physics-based analysis completed')),
+        'variance': convert_numpy(result.get('variance', 0.0)),
+        'analysis_profile': profile['name'],
+        'latency_estimate': latency_estimate,
+        'individual_scores_metadata': convert_numpy(result.get('individual_scores_metadata', {}))
+    }
+    
+    return response_data
+
+def is_cacheable(file_type, filename):
+    """Whether a result depends only on file content (image verdicts can be forced by the file name)"""
+    if not RESULT_CACHE_CONFIG['enabled']:
+        return False
+    from detectors.simple_pretrained_detector import SimplePretrainedDetector
+    return file_type == 'video' or not SimplePretrainedDetector.filename_suggests_ai(filename)
+
+def is_complete_result(result):
+    """Fallback results (unreadable file) and early-stopped video verdicts are not cached"""
+    return isinstance(result, dict) and 'analysis_summary' in result and \
+        not result['analysis_summary'].get('early_stopped')
+
+def cache_info(entry, tier):
+    return {
+        'hit': True,
+        'tier': tier,
+        'match': 'exact',
+        'cached_at': entry['created_at'].isoformat(),
+        'detector_version': entry['detector_version']
+    }
+
+def find_reusable_result(db, temp_file_path, content_hash, file_type, filename, profile, image=None):
+    """A prior result for this content as (cache entry, cache info, perceptual hashes).
+    
+    Exact SHA-256 matches are served directly. Images are then looked up
+    by perceptual hash; a near-duplicate's verdict is reused once a CNN
+    pass on the new image agrees with it, unless the new image's file name
+    or a watermark would force an AI verdict. Videos are looked up by temporal
+    fingerprint the same way (see find_fingerprint_match). Entry and info
+    are None on a miss; the hashes (or the video's probe fingerprint) are
+    returned so the caller can record them. image is the decoded upload when
+    it was kept in memory (temp_file_path is then None).
+    """
+    if not is_cacheable(file_type, filename):
+        return None, None, None
+    
+    result_cache = get_result_cache(db)
+    entry, tier = result_cache.get(content_hash, profile)
+    if entry is not None:
+        return entry, cache_info(entry, tier), None
+    
+    if file_type == 'video':
+        return find_fingerprint_match(db, temp_file_path, content_hash, profile)
+    if file_type != 'image' or not NEAR_DUPLICATE_CONFIG['enabled']:
+        return None, None, None
+    
+    import cv2
+    if image is None and temp_file_path:
+        image = cv2.imread(temp_file_path)
+    if image is None:
+        return None, None, None
+    hashes = perceptual_hashes(image)
+    
+    near_duplicates = get_near_duplicate_index(db)
+    detector = None
+    for match in near_duplicates.find(hashes, exclude=content_hash):
+        entry, tier = result_cache.get(match['content_hash'], profile)
+        if entry is None:
+            continue
+        
+        if detector is None:
+            from detectors.simple_pretrained_detector import SimplePretrainedDetector
+            detector = SimplePretrainedDetector(profile=profile)
+            # A copy that gained a watermark must get its own (forced) verdict
+            if detector.forces_ai_verdict(image, filename):
+                return None, None, hashes
+        
+        confirmed = None
+        if NEAR_DUPLICATE_CONFIG['confirm']:
+            # Compared with the cached CNN score before any forcing (entries without it cannot be confirmed)
+            cached_score = entry['result'].get('individual_scores_metadata', {}).get('cnn_score')
+            score = detector.quick_score(image)
+            confirmed = cached_score is not None and \
+                abs(score - cached_score) <= NEAR_DUPLICATE_CONFIG['confirm_tolerance']
+            near_duplicates.record_confirmation(confirmed)
+            if not confirmed:
+                # The closest match disagrees, run the full pipeline
+                break
+        
+        info = cache_info(entry, tier)
+        info.update(match='near_duplicate', matched_content_hash=match['content_hash'],
+                    phash_distance=match['phash_distance'], similarity=match['similarity'], confirmed=confirmed)
+        return entry, info, hashes
+    
+    return None, None, hashes
+
+def find_fingerprint_match(db, temp_file_path, content_hash, profile):
+    """A prior result for a re-encoded or trimmed copy of an analysed video, as find_reusable_result.
+    
+    The lookup fingerprints the first probe_seconds of the clip only.
+    Only a confirmation pass runs on a match: a few evenly spaced frames
+    of the new clip are scored by the CNN and must agree with the cached
+    verdict, otherwise the full pipeline analyses the clip.
+    """
+    if not VIDEO_FINGERPRINT_CONFIG['enabled']:
+        return None, None, None
+    fingerprint = video_fingerprint(temp_file_path, VIDEO_FINGERPRINT_CONFIG['probe_seconds'])
+    if fingerprint is None:
+        return None, None, None
+    
+    result_cache = get_result_cache(db)
+    fingerprints = get_video_fingerprint_index(db)
+    for match in fingerprints.find(fingerprint, exclude=content_hash):
+        entry, tier = result_cache.get(match['content_hash'], profile)
+        if entry is None:
+            continue
+        
+        confirmed = None
+        if VIDEO_FINGERPRINT_CONFIG['confirm']:
+            cached_score = entry['result'].get('individual_scores', {}).get('pretrained_cnn')
+            score = confirmation_score(temp_file_path, profile)
+            confirmed = cached_score is not None and score is not None and \
+                abs(score - cached_score) <= VIDEO_FINGERPRINT_CONFIG['confirm_tolerance']
+            fingerprints.record_confirmation(confirmed)
+            if not confirmed:
+                # The best match disagrees, run the full pipeline
+                break
+        
+        info = cache_info(entry, tier)
+        info.update(match='video_fingerprint', matched_content_hash=match['content_hash'],
+                    offset_seconds=match['offset_seconds'], overlap_seconds=match['overlap_seconds'],
+                    similarity=match['match_ratio'], audio_ber=match['audio_ber'], confirmed=confirmed)
+        return entry, info, fingerprint
+    
+    return None, None, fingerprint
+
+def confirmation_score(video_path, profile):
+    """Mean CNN score of a few evenly spaced frames, or None when none can be read"""
+    import cv2
+    from detectors.simple_pretrained_detector import SimplePretrainedDetector
+    
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    count = VIDEO_FINGERPRINT_CONFIG['confirm_frames']
+    detector = SimplePretrainedDetector(profile=profile)
+    scores = []
+    for k in range(count):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int((k + 0.5) * total_frames / count))
+        ret, frame = cap.read()
+        if ret:
+            scores.append(detector.quick_score(frame))
+    cap.release()
+    return float(np.mean(scores)) if scores else None
+
+def store_reusable_result(db, content_hash, hashes, file_type, filename, profile, result, media=None,
+                          path=None):
+    """Cache a fresh result for identical and near-duplicate uploads; returns the cache key or None.
+    
+    media is the Future of the upload's storage URL; an entry stored
+    before it finishes gets the URL filled in afterwards. Videos are
+    fingerprinted from path in the background for trimmed and re-encoded
+    copies.
+    """
+    if not is_cacheable(file_type, filename) or not is_complete_result(result):
+        return None
+    cloudinary_url = uploaded_url(media)
+    cache_key = get_result_cache(db).put(content_hash, profile, result, file_type, cloudinary_url)
+    if media is not None and cloudinary_url is None:
+        get_media_uploader().on_uploaded(media, lambda url: get_result_cache(db).set_cloudinary_url(cache_key, url))
+    if file_type == 'video':
+        if path and VIDEO_FINGERPRINT_CONFIG['enabled']:
+            get_video_fingerprint_index(db).index_in_background(path, content_hash)
+    elif hashes:
+        get_near_duplicate_index(db).add(hashes, content_hash)
+    return cache_key
+
+def flight_key(db, content_hash, file_type, filename, profile, early_stop=False):
+    """Key under which identical in-flight analyses are coalesced"""
+    key = get_result_cache(db).make_key(content_hash, profile)
+    # An early-stopped run may end before a full one would, they never share a flight
+    key = f"{key}:early_stop" if early_stop else key
+    # Name-dependent verdicts only coalesce with uploads of the same name
+    return key if is_cacheable(file_type, filename) else f"{key}:{filename}"
 
 def create_analysis_routes(db, detector):
     analysis_bp = Blueprint('analysis', __name__)
     analysis_model = Analysis(db)
     file_service = FileService()
+    # Attach the persistent tier of the method memo used by the detection scheduler
+    get_method_memo(db)
+    def save_history(user_id, file_id, filename, response_data, cloudinary_url, content_hash, cache_key,
+                     hashes=None, media=None):
+        """Record the analysis in the user's history; a failed save is reported, not raised.
+        
+        With media (the Future of a running upload) the record is saved
+        right away and its cloudinary_url filled in when the upload finishes.
+        """
+        if media is not None:
+            cloudinary_url = uploaded_url(media)
+        try:
+            save_result = analysis_model.create(
+                user_id=user_id,
+                file_id=file_id,
+                filename=filename,
+                analysis_result=response_data,
+                cloudinary_url=cloudinary_url,
+                content_hash=content_hash,
+                result_cache_key=cache_key,
+                perceptual_hash=hashes
+            )
+            print(f"[DEBUG] Analysis saved to database with ID: {save_result.inserted_id}")
+            response_data['analysis_id'] = str(save_result.inserted_id)
+            if media is not None and cloudinary_url is None:
+                get_media_uploader().on_uploaded(
+                    media, lambda url: analysis_model.set_cloudinary_url(save_result.inserted_id, url)
+                )
+        except Exception as db_error:
+            print(f"[ERROR] Database save failed: {str(db_error)}")
+            import traceback
+            traceback.print_exc()
+            # Don't fail the request, but log the error
+            response_data['db_save_error'] = str(db_error)
     
     @analysis_bp.route('/analyze', methods=['POST'])
     @token_required(db)
     @rate_limit(limit=10, window=60)
+    @admission_control()
     def analyze_file(current_user):
         print("\n" + "="*60)
         print("[ANALYZE ROUTE] /api/analyze endpoint called!")
         print("="*60 + "\n")
-        temp_file_path = None
+        upload = None
         try:
             if not detector:
                 return jsonify({'error': 'Analysis service unavailable'}), 503
@@ -29,6 +397,15 @@ def create_analysis_routes(db, detector):
             
             file = request.files['file']
             
+            # Analysis profile: per request, else the account default
+            try:
+                profile = resolve_profile(
+                    request.form.get('profile') or request.args.get('profile'), current_user
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            profile = admitted_profile(profile)
+            
             # Validate file
             is_valid, validation_result = file_service.validate_file(file)
             if not is_valid:
@@ -40,39 +417,85 @@ def create_analysis_routes(db, detector):
             # Check for AI keywords in filename
             has_ai_name, detected_keyword = detect_ai_in_filename(file.filename)
             
-            # Save temporary file
-            temp_file_path = file_service.save_temp_file(file, file_info['extension'])
-            if not temp_file_path:
+            # Hashed while the body was parsed; small images stay in memory and are decoded from there
+            upload, content_hash = file_service.open_upload(file, file_info['extension'])
+            if upload is None:
                 return jsonify({'error': 'Failed to process file'}), 500
+            temp_file_path = upload.path
+            image = file_service.decode_image(upload) if file_info['type'] == 'image' else None
             
-            # Upload to Cloudinary
-            cloudinary_url = file_service.upload_to_cloudinary(
-                temp_file_path, file_info['type'], file_id
+            # Same or near-identical content already analysed with this detector version and profile
+            entry, reuse_info, hashes = find_reusable_result(
+                db, temp_file_path, content_hash, file_info['type'], file.filename, profile, image=image
             )
+            if entry is not None:
+                response_data = build_analysis_response(
+                    entry['result'], file.filename, has_ai_name, detected_keyword, profile, None
+                )
+                response_data['cache'] = reuse_info
+                save_history(current_user['_id'], file_id, file.filename, response_data,
+                             entry.get('cloudinary_url'), content_hash, entry['key'], hashes)
+                return jsonify(response_data), 200
             
-            # Analyze file using physics-based detector with progress tracking
-            try:
-                import uuid
-                session_id = str(uuid.uuid4())
-                
-                # Progress callback
-                def progress_callback(progress, message):
-                    from routes.analysis_stream import set_progress
-                    set_progress(session_id, progress, message)
-                    print(f"[PROGRESS] {progress}% - {message}")
+            # Reject jobs the cost model says cannot fit the profile budget
+            width, height, total_frames = file_service.probe_dimensions(temp_file_path, file_info['type'], image)
+            latency_estimate = estimate_profile_latency(
+                profile, width, height, total_frames, is_video=file_info['type'] == 'video'
+            )
+            if not latency_estimate['fits_budget']:
+                return jsonify({
+                    'error': f"File too large for the '{profile['name']}' profile",
+                    'latency_estimate': latency_estimate
+                }), 413
+            
+            # Clients may choose the session id up front to follow /progress while the request runs;
+            # the session belongs to this user, an id someone else holds is replaced by a fresh one
+            from routes.analysis_stream import claim_session
+            session_id = claim_session(request.form.get('session_id') or request.args.get('session_id'),
+                                       current_user['_id'])
+            
+            # Videos may stop as soon as the streamed verdict is confidently on one side
+            early_stop = (request.form.get('early_stop') or request.args.get('early_stop') or '').lower() == 'true'
+            
+            # Progress callback
+            def progress_callback(progress, message, verdict=None):
+                from routes.analysis_stream import set_progress
+                set_progress(session_id, progress, message, verdict)
+                print(f"[PROGRESS] {progress}% - {message}")
+            
+            def run_pipeline(progress):
+                # Stored in the background while the analysis runs
+                media = get_media_uploader().submit(
+                    temp_file_path or upload.getbuffer(), file_info['type'], file_id, file_info['extension']
+                )
                 
                 # Initialize progress
-                progress_callback(10, 'Starting analysis...')
+                progress(10, 'Starting analysis...')
                 
                 # Run analysis using AI detector with text/watermark detection
                 from detectors.simple_pretrained_detector import SimplePretrainedDetector
-                ai_detector = SimplePretrainedDetector(progress_callback=progress_callback)
+                ai_detector = SimplePretrainedDetector(
+                    progress_callback=progress, profile=profile, stream_verdicts=True, early_stop=early_stop
+                )
                 
                 if file_info['type'] == 'video':
                     result = ai_detector.analyze_video(temp_file_path, original_filename=file.filename)
                 else:
-                    result = ai_detector.analyze_image(temp_file_path, original_filename=file.filename)
+                    result = ai_detector.analyze_image(temp_file_path, original_filename=file.filename, image=image)
                 
+                cache_key = store_reusable_result(
+                    db, content_hash, hashes, file_info['type'], file.filename, profile, result, media, temp_file_path
+                )
+                return {'result': result, 'media': media, 'cache_key': cache_key}
+            
+            # Analyze file using physics-based detector with progress tracking; identical
+            # uploads arriving meanwhile attach to this run instead of starting their own
+            try:
+                flight, coalesced = analysis_flights.do(
+                    flight_key(db, content_hash, file_info['type'], file.filename, profile, early_stop),
+                    run_pipeline, progress_callback
+                )
+                result = flight['result']
                 print(f"[DEBUG] Analysis completed for session: {session_id}")
                     
             except Exception as e:
@@ -84,163 +507,14 @@ def create_analysis_routes(db, detector):
             if not result:
                 return jsonify({'error': 'Analysis could not be completed'}), 500
             
-            # Handle both dict and object results
-            if isinstance(result, dict):
-                authenticity_score = result.get('authenticity_score', 50.0)
-                confidence = result.get('confidence', 0.5)
-                classification = result.get('classification', 'UNKNOWN')
-                risk_level = result.get('risk_level', 'MEDIUM')
-                individual_scores = result.get('individual_scores', {})
-                group_scores = result.get('group_scores', {})
-                method_count = result.get('method_count', 0)
-                analysis_summary = result.get('analysis_summary', {})
-            else:
-                authenticity_score = float(getattr(result, 'authenticity_score', 50.0))
-                confidence = float(getattr(result, 'confidence', 0.5))
-                classification = str(getattr(result, 'classification', 'UNKNOWN'))
-                risk_level = str(getattr(result, 'risk_level', 'MEDIUM'))
-                individual_scores = getattr(result, 'individual_scores', {})
-                group_scores = getattr(result, 'group_scores', {})
-                method_count = getattr(result, 'method_count', 0)
-                analysis_summary = getattr(result, 'analysis_summary', {})
-            
-            # Calculate overall average from all individual scores (skip nested dicts)
-            overall_average = 0
-            if individual_scores:
-                scores_list = []
-                for score in individual_scores.values():
-                    if isinstance(score, (int, float)):
-                        scores_list.append(float(score))
-                if scores_list:
-                    overall_average = sum(scores_list) / len(scores_list)
-            
-            # Override classification and scores if AI name detected OR if classification is AI_GENERATED
-            is_ai_detected = has_ai_name or classification == 'AI_GENERATED'
-            
-            if is_ai_detected:
-                # Invert scores for AI-generated content (100% AI = 0% authentic)
-                final_authenticity = 100.0 - authenticity_score if authenticity_score > 50 else authenticity_score
-                final_confidence = max(0.85, confidence)
-                final_classification = 'AI_GENERATED'
-                final_risk_level = 'HIGH'
-                # Invert individual scores
-                final_individual_scores = {k: (100.0 - v if isinstance(v, (int, float)) and v > 50 else v) for k, v in individual_scores.items()}
-                final_group_scores = {k: (100.0 - v if isinstance(v, (int, float)) and v > 50 else v) for k, v in group_scores.items()}
-                # Recalculate overall average from inverted scores
-                scores_list = [v for v in final_individual_scores.values() if isinstance(v, (int, float))]
-                final_overall_average = sum(scores_list) / len(scores_list) if scores_list else final_authenticity
-            else:
-                final_authenticity = authenticity_score
-                final_confidence = confidence
-                final_classification = classification
-                final_risk_level = risk_level
-                final_individual_scores = individual_scores
-                final_group_scores = group_scores
-                final_overall_average = overall_average
-            
-            # Prepare enhanced response with advanced features
-            detailed_info = result.get('detailed_info', {}) if isinstance(result, dict) else getattr(result, 'detailed_info', {})
-            
-            # Convert scores safely and filter out watermark-related scores
-            def safe_convert_scores(scores_dict):
-                converted = {}
-                for k, v in scores_dict.items():
-                    # Skip watermark-related keys
-                    if 'watermark' in str(k).lower() or 'ai_generator' in str(k).lower() or 'watermark_type' in str(k).lower():
-                        continue
-                        
-                    if isinstance(v, dict):
-                        # Flatten forensic dict - use 'combined' score
-                        if k == 'forensic' and 'combined' in v:
-                            converted[str(k)] = float(v.get('combined', 50.0))
-                        else:
-                            converted[str(k)] = safe_convert_scores(v)  # Recursive for nested
-                    elif isinstance(v, (np.integer, np.floating)):
-                        if np.isnan(v):
-                            converted[str(k)] = 50.0  # Default for NaN
-                        else:
-                            converted[str(k)] = float(v)
-                    elif isinstance(v, (int, float)):
-                        if isinstance(v, float) and (np.isnan(v) or np.isinf(v)):
-                            converted[str(k)] = 50.0  # Default for NaN/Inf
-                        else:
-                            converted[str(k)] = float(v)
-                    elif isinstance(v, np.ndarray):
-                        converted[str(k)] = v.tolist()
-                    elif v is None:
-                        converted[str(k)] = 50.0  # Default for None
-                    elif isinstance(v, str):
-                        if v.lower() in ['nan', 'none', 'null', '']:
-                            converted[str(k)] = 50.0  # Default for string NaN
-                        else:
-                            converted[str(k)] = str(v)
-                    else:
-                        # Handle any other type safely
-                        try:
-                            if hasattr(v, '__float__'):
-                                float_val = float(v)
-                                if np.isnan(float_val) or np.isinf(float_val):
-                                    converted[str(k)] = 50.0
-                                else:
-                                    converted[str(k)] = float_val
-                            else:
-                                converted[str(k)] = str(v)
-                        except (ValueError, TypeError, OverflowError):
-                            converted[str(k)] = str(v) if v is not None else 'unknown'
-                return converted
-            
-            # Convert numpy types to Python types
-            def convert_numpy(obj):
-                if isinstance(obj, np.integer):
-                    return int(obj)
-                elif isinstance(obj, np.floating):
-                    return float(obj)
-                elif isinstance(obj, np.ndarray):
-                    return obj.tolist()
-                elif isinstance(obj, dict):
-                    return {k: convert_numpy(v) for k, v in obj.items()}
-                elif isinstance(obj, list):
-                    return [convert_numpy(item) for item in obj]
-                return obj
-            
-            response_data = {
-                'filename': str(file.filename),
-                'authenticity_score': convert_numpy(final_authenticity),
-                'confidence': convert_numpy(final_confidence),
-                'classification': str(final_classification),
-                'risk_level': str(final_risk_level),
-                'individual_scores': safe_convert_scores(final_individual_scores),
-                'group_scores': safe_convert_scores(final_group_scores),
-                'overall_average': convert_numpy(final_overall_average),
-                'method_count': int(method_count),
-                'analysis_summary': convert_numpy(analysis_summary) if analysis_summary else {},
-                'detailed_info': convert_numpy(detailed_info) if detailed_info else {},
-                'is_deepfake': bool(has_ai_name or final_classification in ['AI_GENERATED', 'SUSPICIOUS']),
-                'timestamp': datetime.now().isoformat(),
-                'ai_name_detected': bool(has_ai_name),
-                'detected_ai_keyword': str(detected_keyword) if detected_keyword else None,
-                'detector_version': 'Physics-Based Detection v4',
-                'reason': str(result.get('reason', 'Physics-based analysis completed')),
-                'variance': convert_numpy(result.get('variance', 0.0))
-            }
+            response_data = build_analysis_response(
+                result, file.filename, has_ai_name, detected_keyword, profile, latency_estimate
+            )
+            response_data['cache'] = {'hit': False, 'coalesced': coalesced}
             
             # Save to database
-            try:
-                save_result = analysis_model.create(
-                    user_id=current_user['_id'],
-                    file_id=file_id,
-                    filename=file.filename,
-                    analysis_result=response_data,
-                    cloudinary_url=cloudinary_url
-                )
-                print(f"[DEBUG] Analysis saved to database with ID: {save_result.inserted_id}")
-                response_data['analysis_id'] = str(save_result.inserted_id)
-            except Exception as db_error:
-                print(f"[ERROR] Database save failed: {str(db_error)}")
-                import traceback
-                traceback.print_exc()
-                # Don't fail the request, but log the error
-                response_data['db_save_error'] = str(db_error)
+            save_history(current_user['_id'], file_id, file.filename, response_data,
+                         None, content_hash, flight['cache_key'], hashes, media=flight['media'])
             
             # Set final progress
             progress_callback(100, 'Analysis complete!')
@@ -249,13 +523,44 @@ def create_analysis_routes(db, detector):
             response_data['session_id'] = session_id
             return jsonify(response_data), 200
             
+        except RequestEntityTooLarge as e:
+            return jsonify({'error': e.description}), 413
         except Exception as e:
             print(f"[ERROR] Analysis failed: {str(e)}")
             import traceback
             traceback.print_exc()
             return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
         finally:
-            file_service.cleanup_temp_file(temp_file_path)
+            file_service.cleanup_upload(upload)
+    
+    @analysis_bp.route('/analysis-profiles', methods=['GET'])
+    @token_required(db)
+    def get_analysis_profiles(current_user):
+        return jsonify({
+            'profiles': list_profiles(),
+            'account_default': resolve_profile(None, current_user)['name']
+        })
+    
+    @analysis_bp.route('/analysis-profiles/default', methods=['PUT'])
+    @token_required(db)
+    def set_default_analysis_profile(current_user):
+        try:
+            data = request.get_json() or {}
+            if not data.get('profile'):
+                return jsonify({'error': 'Profile is required'}), 400
+            profile = get_profile(data['profile'])
+            
+            db['users'].update_one(
+                {'_id': current_user['_id']},
+                {'$set': {'analysis_profile': profile['name'], 'updated_at': datetime.now()}}
+            )
+            return jsonify({'message': 'Default analysis profile updated', 'account_default': profile['name']})
+            
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            print(f"Analysis profile update error: {e}")
+            return jsonify({'error': 'Failed to update analysis profile'}), 500
     
     @analysis_bp.route('/history', methods=['GET'])
     @token_required(db)
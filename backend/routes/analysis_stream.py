@@ -1,31 +1,71 @@
 from flask import Blueprint, Response, request, jsonify
-from middleware.auth import token_required
+from middleware.auth import user_from_token
 from services.database import get_db
+from core.detection_config import PROGRESS_STREAM_CONFIG
+from threading import Lock
 import json
 import time
+import uuid
 
 analysis_stream_bp = Blueprint('analysis_stream', __name__)
 
-# Store progress for each analysis session
+# Store progress for each analysis session, with the id of the user it belongs to
 progress_store = {}
+progress_lock = Lock()
 
-def set_progress(session_id, progress, message):
-    """Update progress for a session"""
-    progress_store[session_id] = {
-        'progress': progress,
-        'message': message,
-        'timestamp': time.time()
-    }
+def _evict_expired(now):
+    expired = [sid for sid, entry in progress_store.items()
+               if now - entry['timestamp'] > PROGRESS_STREAM_CONFIG['ttl_seconds']]
+    for sid in expired:
+        del progress_store[sid]
 
-def get_progress(session_id):
-    """Get progress for a session"""
-    return progress_store.get(session_id, {'progress': 0, 'message': 'Starting...', 'timestamp': time.time()})
+def claim_session(session_id, user_id):
+    """Progress session id for a user's analysis.
+    
+    A client-chosen id (to follow /progress while the request runs) is kept
+    when it is new or already the user's; otherwise the server issues one.
+    """
+    user_id = str(user_id)
+    now = time.time()
+    with progress_lock:
+        _evict_expired(now)
+        if not session_id or len(session_id) > PROGRESS_STREAM_CONFIG['max_session_id_length'] or \
+                progress_store.get(session_id, {}).get('user_id', user_id) != user_id:
+            session_id = str(uuid.uuid4())
+        progress_store[session_id] = {'user_id': user_id, 'progress': 0, 'message': 'Starting...', 'timestamp': now}
+    return session_id
+
+def set_progress(session_id, progress, message, verdict=None):
+    """Update progress for a claimed session, with the latest running verdict of a video analysis if given"""
+    with progress_lock:
+        entry = progress_store.get(session_id)
+        if entry is None:
+            return
+        entry.update(progress=progress, message=message, timestamp=time.time())
+        if verdict is not None:
+            entry['verdict'] = verdict
+
+def get_progress(session_id, user_id):
+    """Get progress for one of the user's sessions (other users' sessions read as not started)"""
+    with progress_lock:
+        entry = progress_store.get(session_id)
+        if entry is not None and entry['user_id'] == str(user_id):
+            return {key: value for key, value in entry.items() if key != 'user_id'}
+    return {'progress': 0, 'message': 'Starting...', 'timestamp': time.time()}
 
 @analysis_stream_bp.route('/progress/<session_id>', methods=['GET'])
 def stream_progress(session_id):
-    """Stream progress updates using Server-Sent Events"""
+    """Stream progress updates using Server-Sent Events.
+    
+    EventSource cannot set headers, so the JWT may also come as ?token=<jwt>.
+    """
+    user = user_from_token(get_db(), request.args.get('token') or request.headers.get('Authorization'))
+    if user is None:
+        return jsonify({'error': 'Invalid or missing token'}), 401
+    user_id = str(user['_id'])
+    
     def generate():
-        last_progress = -1
+        last_event = None
         timeout = 300  # 5 minutes timeout
         start_time = time.time()
         
@@ -34,17 +74,20 @@ def stream_progress(session_id):
                 yield f"data: {json.dumps({'progress': 100, 'message': 'Timeout', 'done': True})}\n\n"
                 break
             
-            progress_data = get_progress(session_id)
+            progress_data = get_progress(session_id, user_id)
             current_progress = progress_data['progress']
+            # A new verdict can arrive without the percentage moving
+            snapshot = (current_progress, progress_data.get('verdict', {}).get('windows_done'))
             
-            if current_progress != last_progress:
+            if snapshot != last_event:
                 yield f"data: {json.dumps(progress_data)}\n\n"
-                last_progress = current_progress
+                last_event = snapshot
                 
                 if current_progress >= 100:
                     # Cleanup
-                    if session_id in progress_store:
-                        del progress_store[session_id]
+                    with progress_lock:
+                        if progress_store.get(session_id, {}).get('user_id') == user_id:
+                            del progress_store[session_id]
                     break
             
             time.sleep(0.5)  # Check every 500ms
@@ -0,0 +1,288 @@
+from flask import Blueprint, Response, request, jsonify, url_for
+from werkzeug.exceptions import RequestEntityTooLarge
+import json
+import time
+import uuid
+from models.analysis import Analysis
+from services.file_service import FileService
+from middleware.auth import token_required
+from middleware.rate_limiter import rate_limit
+from middleware.admission_control import admission_control, admitted_profile, admission_controller
+from utils.ai_name_detector import detect_ai_in_filename
+from utils.async_tasks import TaskQueue, QueueFullError
+from utils.single_flight import analysis_flights
+from services.media_storage import get_media_uploader, uploaded_url
+from core.analysis_profiles import resolve_profile, estimate_profile_latency
+from core.detection_config import PERFORMANCE_CONFIG
+
+# Bounded pool that runs analysis jobs off the request threads
+job_queue = TaskQueue(
+    max_workers=PERFORMANCE_CONFIG['max_concurrent_analyses'],
+    max_queue_size=PERFORMANCE_CONFIG['job_queue_size'],
+    result_ttl=PERFORMANCE_CONFIG['job_result_ttl_seconds'],
+    max_results=PERFORMANCE_CONFIG['job_max_retained_results']
+)
+admission_controller.register_queue(job_queue)
+
+def _public_job(job_id, job):
+    """Job record as returned to its owner"""
+    public = {
+        'job_id': job_id,
+        'status': job['status'],
+        'progress': job.get('progress', 0),
+        'message': job.get('message'),
+        'filename': job.get('filename'),
+        'profile': job.get('profile'),
+        'priority_class': job.get('priority_class'),
+        'submitted_at': job.get('submitted_at'),
+        'started_at': job.get('started_at'),
+        'completed_at': job.get('completed_at')
+    }
+    if job.get('verdict') is not None:
+        public['verdict'] = job['verdict']
+    if job['status'] == 'completed':
+        public['result'] = job.get('result')
+    elif job['status'] == 'failed':
+        public['error'] = job.get('error')
+    return public
+
+def create_job_routes(db, detector):
+    jobs_bp = Blueprint('jobs', __name__)
+    analysis_model = Analysis(db)
+    file_service = FileService()
+    
+    def run_analysis_job(job_id, user_id, temp_file_path, content_hash, file_info, filename,
+                         has_ai_name, detected_keyword, profile, latency_estimate, early_stop=False):
+        """Worker body: serve from the result cache or upload, analyse, store; the temp file is always removed"""
+        from routes.analysis import build_analysis_response, find_reusable_result, flight_key, store_reusable_result
+        from detectors.simple_pretrained_detector import SimplePretrainedDetector
+        
+        try:
+            def progress_callback(progress, message, verdict=None):
+                job_queue.update_progress(job_id, progress, message, verdict)
+            
+            file_id = file_service.generate_file_id()
+            entry, reuse_info, hashes = find_reusable_result(
+                db, temp_file_path, content_hash, file_info['type'], filename, profile
+            )
+            
+            if entry is not None:
+                response_data = build_analysis_response(
+                    entry['result'], filename, has_ai_name, detected_keyword, profile, None
+                )
+                response_data['cache'] = reuse_info
+                cloudinary_url, cache_key, media = entry.get('cloudinary_url'), entry['key'], None
+            else:
+                def run_pipeline(progress):
+                    # Stored in the background while the analysis runs
+                    media = get_media_uploader().submit(
+                        temp_file_path, file_info['type'], file_id, file_info['extension']
+                    )
+                    
+                    ai_detector = SimplePretrainedDetector(
+                        progress_callback=progress, profile=profile, stream_verdicts=True, early_stop=early_stop
+                    )
+                    if file_info['type'] == 'video':
+                        result = ai_detector.analyze_video(temp_file_path, original_filename=filename)
+                    else:
+                        result = ai_detector.analyze_image(temp_file_path, original_filename=filename)
+                    
+                    if not result:
+                        raise RuntimeError('Analysis could not be completed')
+                    
+                    cache_key = store_reusable_result(
+                        db, content_hash, hashes, file_info['type'], filename, profile, result, media, temp_file_path
+                    )
+                    return {'result': result, 'media': media, 'cache_key': cache_key}
+                
+                # Identical uploads already being analysed (by a job or /analyze) are joined, not repeated
+                flight, coalesced = analysis_flights.do(
+                    flight_key(db, content_hash, file_info['type'], filename, profile, early_stop),
+                    run_pipeline, progress_callback
+                )
+                response_data = build_analysis_response(
+                    flight['result'], filename, has_ai_name, detected_keyword, profile, latency_estimate
+                )
+                response_data['cache'] = {'hit': False, 'coalesced': coalesced}
+                media, cache_key = flight['media'], flight['cache_key']
+                cloudinary_url = uploaded_url(media)
+            
+            response_data['job_id'] = job_id
+            
+            try:
+                save_result = analysis_model.create(
+                    user_id=user_id,
+                    file_id=file_id,
+                    filename=filename,
+                    analysis_result=response_data,
+                    cloudinary_url=cloudinary_url,
+                    content_hash=content_hash,
+                    result_cache_key=cache_key,
+                    perceptual_hash=hashes
+                )
+                response_data['analysis_id'] = str(save_result.inserted_id)
+                if media is not None and cloudinary_url is None:
+                    get_media_uploader().on_uploaded(
+                        media, lambda url: analysis_model.set_cloudinary_url(save_result.inserted_id, url)
+                    )
+            except Exception as db_error:
+                print(f"[ERROR] Job {job_id} database save failed: {db_error}")
+                response_data['db_save_error'] = str(db_error)
+            
+            return response_data
+        finally:
+            file_service.cleanup_temp_file(temp_file_path)
+    
+    def find_job(job_id, current_user):
+        """The caller's job, or None (other users' jobs are reported as missing)"""
+        job = job_queue.get_result(job_id)
+        if job['status'] == 'not_found' or job.get('user_id') != str(current_user['_id']):
+            return None
+        return job
+    
+    @jobs_bp.route('/jobs', methods=['POST'])
+    @token_required(db)
+    @rate_limit(limit=10, window=60)
+    @admission_control(track_in_flight=False)
+    def submit_job(current_user):
+        temp_file_path = None
+        try:
+            if not detector:
+                return jsonify({'error': 'Analysis service unavailable'}), 503
+            
+            if 'file' not in request.files:
+                return jsonify({'error': 'No file provided'}), 400
+            
+            file = request.files['file']
+            
+            try:
+                profile = resolve_profile(
+                    request.form.get('profile') or request.args.get('profile'), current_user
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            profile = admitted_profile(profile)
+            
+            is_valid, validation_result = file_service.validate_file(file)
+            if not is_valid:
+                return jsonify({'error': validation_result}), 400
+            file_info = validation_result
+            
+            has_ai_name, detected_keyword = detect_ai_in_filename(file.filename)
+            
+            temp_file_path, content_hash = file_service.save_temp_file_hashed(file, file_info['extension'])
+            if not temp_file_path:
+                return jsonify({'error': 'Failed to process file'}), 500
+            
+            width, height, total_frames = file_service.probe_dimensions(temp_file_path, file_info['type'])
+            latency_estimate = estimate_profile_latency(
+                profile, width, height, total_frames, is_video=file_info['type'] == 'video'
+            )
+            if not latency_estimate['fits_budget']:
+                file_service.cleanup_temp_file(temp_file_path)
+                return jsonify({
+                    'error': f"File too large for the '{profile['name']}' profile",
+                    'latency_estimate': latency_estimate
+                }), 413
+            
+            # Callers may demote their own jobs to the batch class, never promote them
+            requested_priority = request.form.get('priority') or request.args.get('priority')
+            early_stop = (request.form.get('early_stop') or request.args.get('early_stop') or '').lower() == 'true'
+            priority_class = job_queue.scheduler.classify(
+                file_info['type'], 'batch' if requested_priority == 'batch' else None
+            )
+            
+            job_id = str(uuid.uuid4())
+            try:
+                job_queue.submit(
+                    job_id, run_analysis_job,
+                    job_id, current_user['_id'], temp_file_path, content_hash, file_info, file.filename,
+                    has_ai_name, detected_keyword, profile, latency_estimate, early_stop,
+                    metadata={
+                        'user_id': str(current_user['_id']),
+                        'filename': file.filename,
+                        'profile': profile['name']
+                    },
+                    owner=str(current_user['_id']),
+                    priority_class=priority_class,
+                    cost=latency_estimate['predicted_seconds']
+                )
+            except QueueFullError as e:
+                file_service.cleanup_temp_file(temp_file_path)
+                response = jsonify({
+                    'error': 'Analysis queue is full. Please try again later.',
+                    'retry_after': e.retry_after
+                })
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response, 429
+            
+            status_url = url_for('jobs.get_job', job_id=job_id)
+            response = jsonify({
+                'job_id': job_id,
+                'status': 'pending',
+                'profile': profile['name'],
+                'priority_class': priority_class,
+                'latency_estimate': latency_estimate,
+                'status_url': status_url,
+                'stream_url': url_for('jobs.stream_job', job_id=job_id)
+            })
+            response.headers['Location'] = status_url
+            return response, 202
+        
+        except RequestEntityTooLarge as e:
+            return jsonify({'error': e.description}), 413
+        except Exception as e:
+            print(f"[ERROR] Job submission failed: {e}")
+            file_service.cleanup_temp_file(temp_file_path)
+            return jsonify({'error': f'Job submission failed: {str(e)}'}), 500
+    
+    @jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+    @token_required(db)
+    def get_job(current_user, job_id):
+        job = find_job(job_id, current_user)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(_public_job(job_id, job)), 200
+    
+    @jobs_bp.route('/jobs/<job_id>/stream', methods=['GET'])
+    @token_required(db)
+    def stream_job(current_user, job_id):
+        """Stream job progress and the final result using Server-Sent Events"""
+        if find_job(job_id, current_user) is None:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        def generate():
+            last_event = None
+            start_time = time.time()
+            
+            while True:
+                if time.time() - start_time > PERFORMANCE_CONFIG['timeout_seconds']:
+                    yield f"data: {json.dumps({'job_id': job_id, 'status': 'timeout', 'done': True})}\n\n"
+                    break
+                
+                job = job_queue.get_result(job_id)
+                if job['status'] == 'not_found':
+                    yield f"data: {json.dumps({'job_id': job_id, 'status': 'expired', 'done': True})}\n\n"
+                    break
+                
+                event = _public_job(job_id, job)
+                event['done'] = job['status'] in ('completed', 'failed')
+                snapshot = (event['status'], event['progress'], event['message'],
+                            event.get('verdict', {}).get('windows_done'))
+                if snapshot != last_event:
+                    yield f"data: {json.dumps(event, default=str)}\n\n"
+                    last_event = snapshot
+                
+                if event['done']:
+                    break
+                
+                time.sleep(0.5)  # Check every 500ms
+        
+        return Response(generate(), mimetype='text/event-stream')
+    
+    @jobs_bp.route('/jobs/stats', methods=['GET'])
+    @token_required(db)
+    def get_job_stats(current_user):
+        return jsonify(job_queue.get_stats()), 200
+    
+    return jobs_bp
@@ -0,0 +1,80 @@
+from flask import Blueprint, request
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
+import json
+import threading
+from middleware.auth import user_from_token
+from core.live_analysis import live_sessions
+from core.detection_config import LIVE_CONFIG
+
+def create_live_routes(app, db, detector):
+    """WebSocket ingest for live streams.
+    
+    Connect to /api/live?token=<jwt> (browsers cannot set headers on a
+    WebSocket) and send JPEG frames or short (f)MP4 segments as binary
+    messages; the first segment must carry the init segment (ftyp + moov).
+    Window scores are pushed back as JSON every push_interval_seconds.
+    Text messages are control messages: {"type": "stop"} ends the session.
+    """
+    live_bp = Blueprint('live', __name__)
+    app.config.setdefault('SOCK_SERVER_OPTIONS', {
+        'max_message_size': LIVE_CONFIG['max_message_bytes'],
+        'ping_interval': 25
+    })
+    sock = Sock(app)
+    
+    @sock.route('/live', bp=live_bp)
+    def live_stream(ws):
+        # The session's pusher thread sends too
+        send_lock = threading.Lock()
+        
+        def send(text):
+            with send_lock:
+                ws.send(text)
+        
+        def send_error(error):
+            send(json.dumps({'type': 'error', 'error': error}))
+        
+        if user_from_token(db, request.args.get('token')) is None:
+            send_error('Invalid or missing token')
+            return
+        if not detector:
+            send_error('Analysis service unavailable')
+            return
+        
+        session = live_sessions.open(detector, send)
+        if session is None:
+            send_error('Too many live sessions, try again later')
+            return
+        
+        send(json.dumps({
+            'type': 'ready',
+            'session_id': session.session_id,
+            'window_frames': LIVE_CONFIG['window_frames'],
+            'push_interval_seconds': LIVE_CONFIG['push_interval_seconds']
+        }))
+        try:
+            while not session.closed:
+                message = ws.receive(timeout=LIVE_CONFIG['idle_timeout_seconds'])
+                if message is None:
+                    send_error('Idle timeout')
+                    break
+                if isinstance(message, str):
+                    try:
+                        control = json.loads(message)
+                    except ValueError:
+                        send_error('Control messages must be JSON')
+                        continue
+                    if control.get('type') == 'stop':
+                        final = session.snapshot()
+                        if final is not None:
+                            send(json.dumps(dict(final, type='final')))
+                        break
+                    continue
+                session.submit(message)
+        except ConnectionClosed:
+            pass
+        finally:
+            live_sessions.close(session)
+    
+    return live_bp
@@ -0,0 +1,347 @@
+import base64
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+from core.detection_config import EMBEDDING_INDEX_CONFIG
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process owns the index
+    fcntl = None
+
+def pack_embedding(vector):
+    """One embedding as base64 float16, small enough for JSON task results"""
+    return base64.b64encode(np.asarray(vector, dtype='<f2').tobytes()).decode('ascii')
+
+def unpack_embedding(packed):
+    return np.frombuffer(base64.b64decode(packed), dtype='<f2').astype(np.float32)
+
+def record_dtype(dim):
+    """One indexed embedding: frame digest, verdict label, authenticity score, insert time and raw vector"""
+    return np.dtype([('key', 'V16'), ('fake', 'u1'), ('score', '<f4'), ('added', '<f8'), ('vector', '<f2', (dim,))])
+
+def unit_vectors(vectors, mean):
+    """Centred, L2-normalised float32 vectors; the CNN's pooled ReLU features are all positive,
+    so uncentred cosines sit near 1 for any two images"""
+    centred = np.asarray(vectors, dtype=np.float32) - mean
+    return centred / np.maximum(np.linalg.norm(centred, axis=1, keepdims=True), 1e-6)
+
+def spherical_kmeans(units, lists, iterations, seed=0):
+    """Coarse IVF centroids (unit vectors) of a sample of unit vectors"""
+    rng = np.random.default_rng(seed)
+    centroids = units[rng.choice(len(units), lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(units @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, units)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Empty lists keep their previous centroid
+        centroids = np.where(norms > 1e-6, sums / np.maximum(norms, 1e-6), centroids)
+    return centroids
+
+def assign_lists(units, centroids, chunk=65536):
+    return np.concatenate([
+        np.argmax(units[i:i + chunk] @ centroids.T, axis=1) for i in range(0, len(units), chunk)
+    ]) if len(units) else np.zeros(0, dtype=np.int64)
+
+class EmbeddingIndex:
+    """Approximate nearest-neighbour index of CNN embeddings of analysed images and frames.
+    
+    A generation is an IVF base on disk: records sorted by coarse list with
+    their centred unit vectors in float16, memory-mapped, so a query only
+    reads the nprobe lists closest to it. Inserts are appended to the
+    generation's delta log and searched exhaustively until a compaction
+    (in the background, once the delta is large or old enough) folds them
+    into the next generation with retrained lists. Writers in other
+    processes (analysis workers) are serialised by a file lock; every call
+    picks up their appends and newer generations.
+    """
+    
+    def __init__(self, fingerprint, directory=None, dim=128):
+        self.fingerprint = fingerprint
+        # Vectors from different CNN weights are not comparable, each embedder gets its own index
+        self.directory = os.path.join(directory or EMBEDDING_INDEX_CONFIG['directory'], fingerprint)
+        self.dim = dim
+        self.dtype = record_dtype(dim)
+        self.lock = threading.RLock()
+        self.generation = None
+        self.base = self.units = self.centroids = self.offsets = None
+        self.base_mean = None
+        self.delta = np.zeros(0, dtype=self.dtype)
+        self.delta_bytes = 0
+        self.delta_units = None
+        self.keys = set()
+        self.compacting = False
+        self.stats = {'queries': 0, 'inserts': 0, 'compactions': 0, 'query_ms': 0.0}
+        os.makedirs(self.directory, exist_ok=True)
+        with self._file_lock():
+            if self._current_name() is None:
+                self._publish(self._write_generation(np.zeros(0, dtype=self.dtype)))
+    
+    @contextmanager
+    def _file_lock(self, name='.lock', blocking=True):
+        """Exclusive lock shared with other processes; yields False when non-blocking and held elsewhere"""
+        if fcntl is None:
+            yield True
+            return
+        with open(os.path.join(self.directory, name), 'a') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    
+    def _path(self, *parts):
+        return os.path.join(self.directory, *parts)
+    
+    def _current_name(self):
+        try:
+            with open(self._path('CURRENT')) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+    
+    def _publish(self, name):
+        with open(self._path('CURRENT.tmp'), 'w') as f:
+            f.write(name)
+        os.replace(self._path('CURRENT.tmp'), self._path('CURRENT'))
+    
+    def _write_generation(self, records, units=None, centroids=None, offsets=None, mean=None):
+        """Write a generation directory (not yet published) and return its name"""
+        name = f"gen-{int(time.time() * 1000)}-{os.getpid()}"
+        os.makedirs(self._path(name))
+        if len(records):
+            np.save(self._path(name, 'records.npy'), records)
+            np.save(self._path(name, 'units.npy'), units.astype(np.float16))
+            np.save(self._path(name, 'centroids.npy'), centroids.astype(np.float32))
+            np.save(self._path(name, 'offsets.npy'), offsets.astype(np.int64))
+            np.save(self._path(name, 'mean.npy'), mean.astype(np.float32))
+        with open(self._path(name, 'meta.json'), 'w') as f:
+            json.dump({'count': int(len(records)), 'dim': self.dim, 'created_at': time.time()}, f)
+        open(self._path(name, 'delta.bin'), 'ab').close()
+        return name
+    
+    def _load_generation(self, name):
+        with open(self._path(name, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['count']:
+            self.base = np.load(self._path(name, 'records.npy'), mmap_mode='r')
+            self.units = np.load(self._path(name, 'units.npy'), mmap_mode='r')
+            self.centroids = np.load(self._path(name, 'centroids.npy'))
+            self.offsets = np.load(self._path(name, 'offsets.npy'))
+            self.base_mean = np.load(self._path(name, 'mean.npy'))
+            self.keys = set(np.asarray(self.base['key']).tolist())
+        else:
+            self.base = self.units = self.centroids = self.offsets = self.base_mean = None
+            self.keys = set()
+        self.generation = name
+        self.delta = np.zeros(0, dtype=self.dtype)
+        self.delta_bytes = 0
+        self.delta_units = None
+    
+    def _sync(self):
+        """Load the published generation if it changed, then any delta records appended since the last call"""
+        name = self._current_name()
+        if name != self.generation:
+            self._load_generation(name)
+        
+        try:
+            size = os.path.getsize(self._path(name, 'delta.bin'))
+        except OSError:
+            size = 0
+        # A record still being written by another process is read next time
+        complete = size - size % self.dtype.itemsize
+        if complete > self.delta_bytes:
+            with open(self._path(name, 'delta.bin'), 'rb') as f:
+                f.seek(self.delta_bytes)
+                fresh = np.frombuffer(f.read(complete - self.delta_bytes), dtype=self.dtype)
+            self.delta = np.concatenate([self.delta, fresh])
+            self.delta_bytes = complete
+            self.delta_units = None
+            self.keys.update(fresh['key'].tolist())
+    
+    def _mean(self):
+        if self.base_mean is not None:
+            return self.base_mean
+        if len(self.delta):
+            return self.delta['vector'].astype(np.float32).mean(axis=0)
+        return np.zeros(self.dim, dtype=np.float32)
+    
+    def neighbours(self, vectors, k=None):
+        """Top-k indexed neighbours of each vector as lists of (similarity, key, fake, score)"""
+        k = k or EMBEDDING_INDEX_CONFIG['k']
+        with self.lock:
+            self._sync()
+            mean = self._mean()
+            if self.delta_units is None:
+                self.delta_units = unit_vectors(self.delta['vector'], mean)
+            base, units, centroids, offsets = self.base, self.units, self.centroids, self.offsets
+            delta, delta_units = self.delta, self.delta_units
+        
+        results = []
+        for query in unit_vectors(np.atleast_2d(vectors), mean):
+            candidates = []
+            if base is not None:
+                probe = np.argsort(centroids @ query)[-EMBEDDING_INDEX_CONFIG['nprobe']:]
+                rows = np.concatenate([np.arange(offsets[c], offsets[c + 1]) for c in probe])
+                if len(rows):
+                    similarities = np.asarray(units[rows], dtype=np.float32) @ query
+                    top = np.argsort(similarities)[-k:]
+                    candidates += [(float(similarities[i]), base[rows[i]]) for i in top]
+            if len(delta):
+                similarities = delta_units @ query
+                top = np.argsort(similarities)[-k:]
+                candidates += [(float(similarities[i]), delta[i]) for i in top]
+            candidates.sort(key=lambda c: c[0], reverse=True)
+            results.append([
+                (similarity, bytes(record['key']).hex(), bool(record['fake']), float(record['score']))
+                for similarity, record in candidates[:k]
+            ])
+        return results
+    
+    def known_fake_signal(self, vectors):
+        """Evidence from indexed neighbours with an AI verdict, or None without enough similar neighbours.
+        
+        authentic_share is the similarity-weighted share of close neighbours
+        that were judged authentic, times 100. Labels are past detector
+        verdicts, not ground truth.
+        """
+        started = time.perf_counter()
+        close = [
+            n for row in self.neighbours(vectors)
+            for n in row if n[0] >= EMBEDDING_INDEX_CONFIG['min_similarity']
+        ]
+        with self.lock:
+            self.stats['queries'] += 1
+            self.stats['query_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        if len(close) < EMBEDDING_INDEX_CONFIG['min_neighbors']:
+            return None
+        
+        fakes = [n for n in close if n[2]]
+        nearest_fake = max(fakes, key=lambda n: n[0]) if fakes else None
+        weight = sum(n[0] for n in close)
+        return {
+            'authentic_share': round(100 * sum(n[0] for n in close if not n[2]) / weight, 2),
+            'labels': 'detector_verdicts',
+            'neighbors': len(close),
+            'fake_neighbors': len(fakes),
+            'nearest_fake_similarity': round(nearest_fake[0], 4) if nearest_fake else None,
+            'nearest_fake_key': nearest_fake[1] if nearest_fake else None
+        }
+    
+    def add(self, embeddings, fake, score):
+        """Append {frame key: vector} under the verdict of the analysis they came from; known keys are skipped"""
+        records = np.zeros(len(embeddings), dtype=self.dtype)
+        records['key'] = [np.void(bytes.fromhex(key)) for key in embeddings]
+        records['vector'] = [np.asarray(v, dtype=np.float32) for v in embeddings.values()]
+        records['fake'] = int(bool(fake))
+        records['score'] = score
+        records['added'] = time.time()
+        
+        with self._file_lock(), self.lock:
+            self._sync()
+            records = records[[key not in self.keys for key in records['key'].tolist()]]
+            if len(records):
+                with open(self._path(self.generation, 'delta.bin'), 'ab') as f:
+                    f.write(records.tobytes())
+                self._sync()
+                self.stats['inserts'] += len(records)
+            due = self._compaction_due()
+        if due:
+            self.compact_async()
+        return len(records)
+    
+    def _compaction_due(self):
+        if not len(self.delta) or self.compacting:
+            return False
+        return len(self.delta) >= EMBEDDING_INDEX_CONFIG['compact_rows'] or \
+            time.time() - float(self.delta['added'].min()) >= EMBEDDING_INDEX_CONFIG['compact_interval_seconds']
+    
+    def compact(self):
+        """Fold the delta log into a new generation with retrained lists; False when another compaction runs"""
+        with self._file_lock('.compact.lock', blocking=False) as acquired:
+            if not acquired:
+                return False
+            with self.lock:
+                self._sync()
+                generation, base, delta = self.generation, self.base, self.delta
+            
+            # Heavy work on a snapshot, appends continue meanwhile
+            records = np.concatenate([np.asarray(base) if base is not None else delta[:0], delta])
+            records = records[np.argsort(records['added'], kind='stable')][-EMBEDDING_INDEX_CONFIG['max_rows']:]
+            mean = records['vector'].astype(np.float32).mean(axis=0)
+            units = unit_vectors(records['vector'], mean)
+            lists = int(min(EMBEDDING_INDEX_CONFIG['max_lists'], max(1, np.sqrt(len(records)))))
+            sample = units[np.random.default_rng(0).choice(
+                len(units), min(len(units), EMBEDDING_INDEX_CONFIG['kmeans_sample']), replace=False
+            )]
+            centroids = spherical_kmeans(sample, lists, EMBEDDING_INDEX_CONFIG['kmeans_iterations'])
+            assign = assign_lists(units, centroids)
+            order = np.argsort(assign, kind='stable')
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=lists))])
+            name = self._write_generation(records[order], units[order], centroids, offsets, mean)
+            
+            with self._file_lock():
+                if self._current_name() != generation:
+                    shutil.rmtree(self._path(name), ignore_errors=True)
+                    return False
+                with self.lock:
+                    self._sync()
+                    # Records appended while the generation was built move to its delta log
+                    late = self.delta[len(delta):]
+                with open(self._path(name, 'delta.bin'), 'ab') as f:
+                    f.write(late.tobytes())
+                self._publish(name)
+                with self.lock:
+                    self._sync()
+                    self.stats['compactions'] += 1
+            
+            # Readers in other processes may still map old generations, what cannot be removed goes next time
+            for entry in os.listdir(self.directory):
+                if entry.startswith('gen-') and entry != name:
+                    shutil.rmtree(self._path(entry), ignore_errors=True)
+        return True
+    
+    def compact_async(self):
+        with self.lock:
+            if self.compacting:
+                return
+            self.compacting = True
+        
+        def run():
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Embedding index compaction failed: {e}")
+            finally:
+                with self.lock:
+                    self.compacting = False
+        
+        threading.Thread(target=run, name='embedding-compaction', daemon=True).start()
+    
+    def get_stats(self):
+        with self.lock:
+            self._sync()
+            stats = dict(self.stats)
+            stats['base_records'] = 0 if self.base is None else len(self.base)
+            stats['delta_records'] = len(self.delta)
+            stats['lists'] = 0 if self.centroids is None else len(self.centroids)
+            stats['generation'] = self.generation
+        return stats
+
+_embedding_index = None
+
+def get_embedding_index(fingerprint=None):
+    """Process-wide embedding index for the embedder with this fingerprint (None: the one already open, if any)"""
+    global _embedding_index
+    if fingerprint is not None and (_embedding_index is None or _embedding_index.fingerprint != fingerprint):
+        _embedding_index = EmbeddingIndex(fingerprint)
+    return _embedding_index
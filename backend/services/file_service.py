@@ -1,20 +1,15 @@
 import os
 import uuid
+import hashlib
 import tempfile
-import cloudinary
-import cloudinary.uploader
 from werkzeug.utils import secure_filename
+from core.detection_config import UPLOAD_CONFIG
+from utils.upload_stream import MEDIA_EXTENSIONS, UploadStream, size_label
 
 class FileService:
     def __init__(self):
-        self.allowed_extensions = {
-            'image': {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'},
-            'video': {'.mp4', '.avi', '.mov', '.webm', '.mkv'}
-        }
-        self.max_sizes = {
-            'image': 100 * 1024 * 1024,  # 100MB
-            'video': 500 * 1024 * 1024   # 500MB
-        }
+        self.allowed_extensions = MEDIA_EXTENSIONS
+        self.max_sizes = UPLOAD_CONFIG['max_bytes']
     
     def validate_file(self, file):
         if not file or file.filename == '':
@@ -30,19 +25,25 @@ class FileService:
         if not (is_image or is_video):
             return False, 'Unsupported file format'
         
-        # Check size
-        file.seek(0, 2)
-        file_size = file.tell()
-        file.seek(0)
+        # Check size; streamed uploads were measured and sniffed while the body was parsed
+        upload = file.stream if isinstance(file.stream, UploadStream) else None
+        if upload is not None:
+            file_size = upload.size
+        else:
+            file.seek(0, 2)
+            file_size = file.tell()
+            file.seek(0)
         
         file_type = 'video' if is_video else 'image'
         if file_size > self.max_sizes[file_type]:
-            size_limit = '500MB' if is_video else '100MB'
-            return False, f'File too large. Maximum size: {size_limit}'
+            return False, f'File too large. Maximum size: {size_label(self.max_sizes[file_type])}'
         
         if file_size == 0:
             return False, 'File is empty'
         
+        if upload is not None and upload.sniffed_kind not in (None, file_type):
+            return False, 'File content does not match its extension'
+        
         return True, {
             'type': file_type,
             'size': file_size,
@@ -51,6 +52,8 @@ class FileService:
         }
     
     def save_temp_file(self, file, file_ext):
+        if isinstance(file.stream, UploadStream):
+            return self.save_temp_file_hashed(file, file_ext)[0]
         try:
             temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=file_ext)
             temp_path = temp_file.name
@@ -60,21 +63,90 @@ class FileService:
             print(f"Error saving temp file: {e}")
             return None
     
-    def upload_to_cloudinary(self, file_path, file_type, file_id):
+    def save_temp_file_hashed(self, file, file_ext, chunk_size=1024 * 1024):
+        """Save an upload chunk by chunk, hashing it on the way; returns (path, sha256 hex)"""
+        if isinstance(file.stream, UploadStream):
+            # Already hashed while streamed in; a spilled upload's temp file is handed over as is
+            try:
+                return file.stream.keep(), file.stream.content_hash
+            except Exception as e:
+                print(f"Error saving temp file: {e}")
+                return None, None
+        
+        temp_path = None
+        try:
+            hasher = hashlib.sha256()
+            with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
+                temp_path = temp_file.name
+                file.stream.seek(0)
+                while True:
+                    chunk = file.stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    temp_file.write(chunk)
+            return temp_path, hasher.hexdigest()
+        except Exception as e:
+            print(f"Error saving temp file: {e}")
+            self.cleanup_temp_file(temp_path)
+            return None, None
+    
+    def open_upload(self, file, file_ext, chunk_size=1024 * 1024):
+        """The upload as an UploadStream with its sha256 hex, as (upload, hash); (None, None) on failure.
+        
+        Uploads parsed by UploadRequest are returned as they are. Other
+        streams are copied into one, so callers get the same interface.
+        """
+        if isinstance(file.stream, UploadStream):
+            return file.stream, file.stream.content_hash
+        upload = None
         try:
-            resource_type = "video" if file_type == 'video' else "image"
-            upload_result = cloudinary.uploader.upload(
-                file_path,
-                public_id=f"deepfake_{file_id}",
-                resource_type=resource_type,
-                folder="deepfake_detector",
-                use_filename=True,
-                unique_filename=False
-            )
-            return upload_result['secure_url']
+            kind = 'video' if file_ext in self.allowed_extensions['video'] else 'image'
+            upload = UploadStream(None, UPLOAD_CONFIG['memory_image_bytes'] if kind == 'image' else 0, file_ext)
+            file.stream.seek(0)
+            for chunk in iter(lambda: file.stream.read(chunk_size), b''):
+                upload.write(chunk)
+            upload.seek(0)
+            return upload, upload.content_hash
         except Exception as e:
-            print(f"Cloudinary upload failed: {e}")
+            print(f"Error reading upload: {e}")
+            if upload is not None:
+                upload.close()
+            return None, None
+    
+    def decode_image(self, upload):
+        """BGR image decoded straight from an in-memory upload, None when on disk or undecodable"""
+        if not upload.in_memory:
             return None
+        import cv2
+        import numpy as np
+        return cv2.imdecode(np.frombuffer(upload.getbuffer(), dtype=np.uint8), cv2.IMREAD_COLOR)
+    
+    def cleanup_upload(self, upload):
+        if upload is not None:
+            upload.close()
+    
+    def probe_dimensions(self, file_path, file_type, image=None):
+        """Width, height and frame count from the file header, without decoding pixels"""
+        if image is not None:
+            return image.shape[1], image.shape[0], 1
+        try:
+            if file_type == 'video':
+                import cv2
+                cap = cv2.VideoCapture(file_path)
+                try:
+                    return (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                            int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+                finally:
+                    cap.release()
+            
+            from PIL import Image
+            with Image.open(file_path) as img:
+                return img.width, img.height, 1
+        except Exception as e:
+            print(f"Dimension probe failed: {e}")
+            return 0, 0, 0
     
     def cleanup_temp_file(self, file_path):
         try:
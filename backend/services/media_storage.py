@@ -0,0 +1,283 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from core.detection_config import MEDIA_STORAGE_CONFIG
+
+class MediaStorage:
+    """Backend that stores an uploaded file under a key and returns its URL.
+    
+    put() raises on failure; retries and error reporting are left to the
+    MediaUploader that calls it.
+    """
+    
+    name = None
+    
+    def put(self, source, key, file_type):
+        """Store source (a file path or bytes) under key; returns the public URL"""
+        raise NotImplementedError
+
+class CloudinaryStorage(MediaStorage):
+    """Cloudinary, configured through cloudinary.config() at app start"""
+    
+    name = 'cloudinary'
+    
+    def __init__(self, folder='deepfake_detector'):
+        self.folder = folder
+    
+    def put(self, source, key, file_type):
+        import cloudinary.uploader
+        
+        upload_result = cloudinary.uploader.upload(
+            io.BytesIO(source) if isinstance(source, bytes) else source,
+            public_id=os.path.splitext(key)[0],
+            resource_type="video" if file_type == 'video' else "image",
+            folder=self.folder,
+            use_filename=True,
+            unique_filename=False
+        )
+        return upload_result['secure_url']
+
+class LocalStorage(MediaStorage):
+    """Files under a local directory, served by the app at base_url (see /api/media in app_new.py)"""
+    
+    name = 'local'
+    
+    def __init__(self, directory=None, base_url=None):
+        self.directory = os.path.abspath(directory or MEDIA_STORAGE_CONFIG['local_directory'])
+        self.base_url = (base_url or MEDIA_STORAGE_CONFIG['local_base_url']).rstrip('/')
+        os.makedirs(self.directory, exist_ok=True)
+    
+    def put(self, source, key, file_type):
+        path = os.path.join(self.directory, key)
+        # Written under a temporary name, so the URL never serves a partial file
+        partial = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            if isinstance(source, bytes):
+                with open(partial, 'wb') as f:
+                    f.write(source)
+            else:
+                shutil.copyfile(source, partial)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        return f"{self.base_url}/{key}"
+
+class S3Storage(MediaStorage):
+    """S3 or an S3-compatible store (MinIO, R2, ...) through boto3.
+    
+    Credentials come from the usual AWS environment variables; S3_ENDPOINT_URL
+    points at a non-AWS store and S3_PUBLIC_URL overrides the returned URL base.
+    """
+    
+    name = 's3'
+    
+    def __init__(self, bucket=None, prefix=None, endpoint_url=None, public_url=None):
+        import boto3
+        
+        self.bucket = bucket or os.getenv('S3_BUCKET', MEDIA_STORAGE_CONFIG['s3_bucket'])
+        self.prefix = MEDIA_STORAGE_CONFIG['s3_prefix'] if prefix is None else prefix
+        self.endpoint_url = endpoint_url or os.getenv('S3_ENDPOINT_URL')
+        self.client = boto3.client('s3', endpoint_url=self.endpoint_url)
+        public_url = public_url or os.getenv('S3_PUBLIC_URL')
+        if public_url:
+            self.public_url = public_url.rstrip('/')
+        elif self.endpoint_url:
+            self.public_url = f"{self.endpoint_url.rstrip('/')}/{self.bucket}"
+        else:
+            self.public_url = f"https://{self.bucket}.s3.amazonaws.com"
+    
+    def put(self, source, key, file_type):
+        key = f"{self.prefix}{key}"
+        if isinstance(source, bytes):
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=source)
+        else:
+            self.client.upload_file(source, self.bucket, key)
+        return f"{self.public_url}/{key}"
+
+STORAGE_BACKENDS = {
+    'cloudinary': CloudinaryStorage,
+    'local': LocalStorage,
+    's3': S3Storage
+}
+
+def uploaded_url(media):
+    """URL of a finished upload, None while it is running or when it failed"""
+    return media.result() if media is not None and media.done() else None
+
+class MediaUploader:
+    """Bounded background pool that moves uploaded media into storage.
+    
+    submit() takes its own reference to the file (a hard link, or a copy
+    across file systems), so the caller may delete its temp file as soon as
+    the analysis is done, and returns a Future of the URL (None on failure).
+    Analysis runs meanwhile; records are patched through on_uploaded() when
+    the URL arrives. At most max_workers uploads run at once and at most
+    max_pending wait in the pool. Beyond that submit() waits briefly for
+    a slot, then parks the staged file in a backlog that workers take up
+    as they finish, so a burst delays uploads but never drops them.
+    """
+    
+    def __init__(self, storage, max_workers=None, max_pending=None, retries=None, retry_backoff=None):
+        self.storage = storage
+        self.max_workers = max_workers or MEDIA_STORAGE_CONFIG['max_workers']
+        self.max_pending = max_pending or MEDIA_STORAGE_CONFIG['max_pending']
+        self.retries = MEDIA_STORAGE_CONFIG['retries'] if retries is None else retries
+        self.retry_backoff = MEDIA_STORAGE_CONFIG['retry_backoff_seconds'] if retry_backoff is None else retry_backoff
+        self.submit_timeout = MEDIA_STORAGE_CONFIG['submit_timeout_seconds']
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='media-upload')
+        self.slots = BoundedSemaphore(self.max_workers + self.max_pending)
+        self.lock = Lock()
+        self.backlog = deque()  # (staged file, file type, key, Future) waiting for a slot
+        self.durations = deque(maxlen=50)  # Recent successful upload times
+        self.stats = {'submitted': 0, 'uploaded': 0, 'failed': 0, 'deferred': 0, 'retries': 0, 'in_flight': 0}
+    
+    def submit(self, source, file_type, file_id, extension=''):
+        """Start uploading a file path or bytes-like object; returns a Future of the URL"""
+        media = Future()
+        try:
+            staged = self._stage(source, extension)
+        except Exception as e:
+            print(f"Media upload staging failed for {file_id}: {e}")
+            media.set_result(None)
+            return media
+        
+        job = (staged, file_type, f"deepfake_{file_id}{extension}", media)
+        with self.lock:
+            self.stats['submitted'] += 1
+            self.stats['in_flight'] += 1
+        if self.slots.acquire(timeout=self.submit_timeout):
+            self.executor.submit(self._run, job)
+            return media
+        
+        print(f"Media upload deferred for {file_id}: upload queue is full")
+        if isinstance(staged, bytes):
+            # The backlog holds files, not upload bodies in memory
+            try:
+                job = (self._stage_bytes(staged, extension),) + job[1:]
+            except OSError as e:
+                print(f"Media upload staging failed for {file_id}: {e}")
+        with self.lock:
+            self.backlog.append(job)
+            self.stats['deferred'] += 1
+        self._drain()
+        return media
+    
+    def _drain(self):
+        """Start backlog uploads while pool slots are free"""
+        while True:
+            with self.lock:
+                if not self.backlog:
+                    return
+            if not self.slots.acquire(blocking=False):
+                return
+            with self.lock:
+                job = self.backlog.popleft() if self.backlog else None
+            if job is None:
+                self.slots.release()
+                return
+            self.executor.submit(self._run, job)
+    
+    def _run(self, job):
+        staged, file_type, key, media = job
+        try:
+            media.set_result(self._upload(staged, file_type, key))
+        except Exception as e:
+            print(f"Media upload error for {key}: {e}")
+            media.set_result(None)
+        finally:
+            self.slots.release()
+            self._drain()
+    
+    def _stage_bytes(self, data, extension):
+        fd, staged = tempfile.mkstemp(prefix='media_', suffix=extension)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return staged
+    
+    def _stage(self, source, extension):
+        if not isinstance(source, str):
+            return bytes(source)
+        staged = os.path.join(tempfile.gettempdir(), f"media_{uuid.uuid4().hex}{extension}")
+        try:
+            os.link(source, staged)
+        except OSError:
+            shutil.copyfile(source, staged)
+        return staged
+    
+    def _upload(self, staged, file_type, key):
+        started = time.time()
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    url = self.storage.put(staged, key, file_type)
+                    with self.lock:
+                        self.stats['uploaded'] += 1
+                        self.durations.append(time.time() - started)
+                    return url
+                except Exception as e:
+                    if attempt == self.retries:
+                        print(f"Media upload to {self.storage.name} failed for {key}: {e}")
+                        with self.lock:
+                            self.stats['failed'] += 1
+                        return None
+                    with self.lock:
+                        self.stats['retries'] += 1
+                    time.sleep(self.retry_backoff * 2 ** attempt)
+        finally:
+            if isinstance(staged, str):
+                try:
+                    os.remove(staged)
+                except OSError as e:
+                    print(f"Media staging cleanup error: {e}")
+            with self.lock:
+                self.stats['in_flight'] -= 1
+    
+    def on_uploaded(self, media, callback):
+        """Call callback(url) once the upload succeeds, right away if it already has"""
+        def done(future):
+            url = future.result()
+            if url:
+                try:
+                    callback(url)
+                except Exception as e:
+                    print(f"Media URL update failed: {e}")
+        media.add_done_callback(done)
+    
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['backlog'] = len(self.backlog)
+            durations = list(self.durations)
+        stats['backend'] = self.storage.name
+        stats['max_workers'] = self.max_workers
+        stats['max_pending'] = self.max_pending
+        stats['avg_upload_seconds'] = round(sum(durations) / len(durations), 3) if durations else None
+        return stats
+
+_media_uploader = None
+_media_uploader_lock = Lock()
+
+def get_media_uploader():
+    """Process-wide uploader for the backend named by MEDIA_STORAGE_BACKEND or MEDIA_STORAGE_CONFIG.
+    
+    A backend that cannot be set up raises: media is never silently sent
+    somewhere other than the configured store.
+    """
+    global _media_uploader
+    with _media_uploader_lock:
+        if _media_uploader is None:
+            backend = os.getenv('MEDIA_STORAGE_BACKEND', MEDIA_STORAGE_CONFIG['backend'])
+            try:
+                storage = STORAGE_BACKENDS[backend]()
+            except Exception as e:
+                print(f"[ERROR] Media storage backend '{backend}' unavailable: {e}")
+                raise RuntimeError(f"Media storage backend '{backend}' unavailable: {e}") from e
+            _media_uploader = MediaUploader(storage)
+        return _media_uploader
@@ -0,0 +1,139 @@
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+from core.detection_config import METHOD_MEMO_CONFIG
+from services.result_cache import _to_plain
+
+def frame_digest(frame):
+    """Digest of one decoded frame (shape and dtype included)"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{frame.shape}:{frame.dtype}".encode())
+    h.update(frame.tobytes())
+    return h.hexdigest()
+
+def combine_digests(digests):
+    """Order-sensitive digest of a sequence of digests"""
+    h = hashlib.blake2b(digest_size=16)
+    for digest in digests:
+        h.update(str(digest).encode())
+    return h.hexdigest()
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Digest of a file's bytes, or None when it cannot be read"""
+    h = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+    except OSError as e:
+        print(f"Method memo could not hash {path}: {e}")
+        return None
+    return h.hexdigest()
+
+class MethodMemo:
+    """Memo of raw per-method outputs, shared by every analysis.
+    
+    Keys are (input digest, method name, method fingerprint): the
+    fingerprint covers the registry version of the method and of the
+    intermediates it reads, so bumping one method's version only
+    recomputes that method while the others are served from here.
+    An in-process LRU sits in front of a MongoDB collection with a TTL.
+    """
+    
+    def __init__(self, db=None, memory_entries=None, ttl_seconds=None):
+        self.collection = db['method_memo'] if db is not None else None
+        self.memory_entries = memory_entries or METHOD_MEMO_CONFIG['memory_entries']
+        self.ttl = timedelta(seconds=ttl_seconds or METHOD_MEMO_CONFIG['ttl_seconds'])
+        self.memory = OrderedDict()
+        self.lock = Lock()
+        self.stats = {'memory_hits': 0, 'mongo_hits': 0, 'misses': 0, 'stores': 0}
+    
+    @staticmethod
+    def make_key(input_digest, method, fingerprint):
+        return f"{input_digest}:{method}:{fingerprint}"
+    
+    def get_many(self, keys, persistent=True):
+        """Memoized values for the keys that have one, as {key: value}"""
+        found = {}
+        missing = []
+        with self.lock:
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key]
+                else:
+                    missing.append(key)
+            self.stats['memory_hits'] += len(found)
+        
+        if missing and persistent and self.collection is not None:
+            try:
+                cursor = self.collection.find(
+                    {'key': {'$in': missing}, 'expires_at': {'$gt': datetime.now()}},
+                    {'_id': 0, 'key': 1, 'value': 1}
+                )
+                stored = {doc['key']: doc['value'] for doc in cursor}
+                self._remember(stored)
+                found.update(stored)
+                with self.lock:
+                    self.stats['mongo_hits'] += len(stored)
+            except Exception as e:
+                print(f"Method memo lookup failed: {e}")
+        
+        with self.lock:
+            self.stats['misses'] += len(keys) - len(found)
+        return found
+    
+    def put_many(self, entries, persistent=True):
+        """Store {key: (method, value)} for later analyses"""
+        if not entries:
+            return
+        values = {key: _to_plain(value) for key, (_, value) in entries.items()}
+        self._remember(values)
+        
+        if persistent and self.collection is not None:
+            try:
+                from pymongo import UpdateOne
+                now = datetime.now()
+                self.collection.bulk_write([
+                    UpdateOne({'key': key}, {'$set': {
+                        'key': key,
+                        'method': method,
+                        'value': values[key],
+                        'created_at': now,
+                        'expires_at': now + self.ttl
+                    }}, upsert=True)
+                    for key, (method, _) in entries.items()
+                ], ordered=False)
+            except Exception as e:
+                print(f"Method memo store failed: {e}")
+        
+        with self.lock:
+            self.stats['stores'] += len(entries)
+    
+    def _remember(self, values):
+        with self.lock:
+            for key, value in values.items():
+                self.memory[key] = value
+                self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+    
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self.memory)
+        lookups = stats['memory_hits'] + stats['mongo_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['mongo_hits']) / lookups, 3) if lookups else 0.0
+        return stats
+
+_method_memo = None
+
+def get_method_memo(db=None):
+    """Process-wide method memo (the MongoDB tier is attached on first call with a db)"""
+    global _method_memo
+    if _method_memo is None:
+        _method_memo = MethodMemo(db)
+    elif _method_memo.collection is None and db is not None:
+        _method_memo.collection = db['method_memo']
+    return _method_memo
@@ -0,0 +1,175 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from itertools import combinations
+from threading import Lock
+from core.detection_config import NEAR_DUPLICATE_CONFIG, RESULT_CACHE_CONFIG
+from utils.perceptual_hash import HASH_BITS, hamming
+
+class MultiIndexHash:
+    """Multi-index hashing over 64-bit perceptual hashes.
+    
+    The hash is split into `chunks` substrings, each with its own table.
+    Two hashes within Hamming distance r must agree to within r // chunks
+    bits on at least one substring (pigeonhole), so a search only probes
+    the substring neighbourhoods and verifies the few candidates it finds.
+    """
+    
+    def __init__(self, chunks=4, max_entries=None):
+        self.chunks = chunks
+        self.chunk_bits = HASH_BITS // chunks
+        self.max_entries = max_entries
+        self.tables = [{} for _ in range(chunks)]  # chunk value -> set of entry ids
+        self.entries = OrderedDict()  # entry id -> (phash, payload)
+    
+    def split(self, value):
+        mask = (1 << self.chunk_bits) - 1
+        return [(value >> (i * self.chunk_bits)) & mask for i in range(self.chunks)]
+    
+    def neighbours(self, chunk_value, radius):
+        """Every chunk value within `radius` bits of chunk_value"""
+        values = [chunk_value]
+        for distance in range(1, radius + 1):
+            for positions in combinations(range(self.chunk_bits), distance):
+                flipped = chunk_value
+                for position in positions:
+                    flipped ^= 1 << position
+                values.append(flipped)
+        return values
+    
+    def probe_keys(self, value, max_distance):
+        """(chunk index, chunk value) pairs a search for `value` has to probe"""
+        radius = max_distance // self.chunks
+        return [(i, v) for i, chunk in enumerate(self.split(value)) for v in self.neighbours(chunk, radius)]
+    
+    def add(self, entry_id, value, payload):
+        if entry_id in self.entries:
+            return
+        self.entries[entry_id] = (value, payload)
+        for i, chunk in enumerate(self.split(value)):
+            self.tables[i].setdefault(chunk, set()).add(entry_id)
+        if self.max_entries and len(self.entries) > self.max_entries:
+            self.remove(next(iter(self.entries)))
+    
+    def remove(self, entry_id):
+        value, _ = self.entries.pop(entry_id)
+        for i, chunk in enumerate(self.split(value)):
+            bucket = self.tables[i].get(chunk)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self.tables[i][chunk]
+    
+    def search(self, value, max_distance):
+        """[(distance, entry id, payload)] within max_distance, nearest first"""
+        candidates = set()
+        for i, chunk in self.probe_keys(value, max_distance):
+            candidates.update(self.tables[i].get(chunk, ()))
+        matches = []
+        for entry_id in candidates:
+            stored, payload = self.entries[entry_id]
+            distance = hamming(value, stored)
+            if distance <= max_distance:
+                matches.append((distance, entry_id, payload))
+        return sorted(matches, key=lambda match: match[0])
+
+class NearDuplicateIndex:
+    """Perceptual-hash index of analysed images, used to reuse verdicts for re-encoded copies.
+    
+    Recent entries live in an in-process MultiIndexHash; every entry is
+    also written to MongoDB with its substring keys in a multikey index,
+    which answers the same probes for the full history.
+    """
+    
+    def __init__(self, db=None):
+        self.collection = db['perceptual_hashes'] if db is not None else None
+        self.index = MultiIndexHash(NEAR_DUPLICATE_CONFIG['chunks'], NEAR_DUPLICATE_CONFIG['memory_entries'])
+        self.lock = Lock()
+        self.stats = {'lookups': 0, 'matches': 0, 'confirmed': 0, 'rejected': 0}
+    
+    def _chunk_keys(self, pairs):
+        # Chunk position and value in one integer for the multikey index
+        return [(i << self.index.chunk_bits) | value for i, value in pairs]
+    
+    def add(self, hashes, content_hash):
+        """Index an analysed image by its perceptual hashes"""
+        phash_value = int(hashes['phash'], 16)
+        payload = {'content_hash': content_hash, 'dhash': hashes['dhash']}
+        with self.lock:
+            self.index.add(content_hash, phash_value, payload)
+        
+        if self.collection is not None:
+            try:
+                now = datetime.now()
+                self.collection.update_one({'content_hash': content_hash}, {'$set': {
+                    'content_hash': content_hash,
+                    'phash': hashes['phash'],
+                    'dhash': hashes['dhash'],
+                    'chunks': self._chunk_keys(enumerate(self.index.split(phash_value))),
+                    'created_at': now,
+                    'expires_at': now + timedelta(seconds=RESULT_CACHE_CONFIG['ttl_seconds'])
+                }}, upsert=True)
+            except Exception as e:
+                print(f"Perceptual hash store failed: {e}")
+    
+    def find(self, hashes, exclude=None):
+        """Indexed images whose pHash and dHash are both within the configured distances"""
+        max_phash = NEAR_DUPLICATE_CONFIG['max_phash_distance']
+        max_dhash = NEAR_DUPLICATE_CONFIG['max_dhash_distance']
+        phash_value = int(hashes['phash'], 16)
+        dhash_value = int(hashes['dhash'], 16)
+        
+        with self.lock:
+            self.stats['lookups'] += 1
+            found = {entry_id: (distance, payload) for distance, entry_id, payload in self.index.search(phash_value, max_phash)}
+        
+        if self.collection is not None:
+            try:
+                probes = self._chunk_keys(self.index.probe_keys(phash_value, max_phash))
+                cursor = self.collection.find(
+                    {'chunks': {'$in': probes}, 'expires_at': {'$gt': datetime.now()}},
+                    {'_id': 0, 'content_hash': 1, 'phash': 1, 'dhash': 1}
+                ).limit(NEAR_DUPLICATE_CONFIG['max_candidates'])
+                for doc in cursor:
+                    distance = hamming(phash_value, int(doc['phash'], 16))
+                    if doc['content_hash'] not in found and distance <= max_phash:
+                        found[doc['content_hash']] = (distance, {'content_hash': doc['content_hash'], 'dhash': doc['dhash']})
+            except Exception as e:
+                print(f"Perceptual hash lookup failed: {e}")
+        
+        matches = []
+        for content_hash, (distance, payload) in found.items():
+            dhash_distance = hamming(dhash_value, int(payload['dhash'], 16))
+            if content_hash != exclude and dhash_distance <= max_dhash:
+                matches.append({
+                    'content_hash': content_hash,
+                    'phash_distance': distance,
+                    'dhash_distance': dhash_distance,
+                    'similarity': round(1 - distance / HASH_BITS, 3)
+                })
+        matches.sort(key=lambda m: (m['phash_distance'], m['dhash_distance']))
+        
+        if matches:
+            with self.lock:
+                self.stats['matches'] += 1
+        return matches
+    
+    def record_confirmation(self, confirmed):
+        with self.lock:
+            self.stats['confirmed' if confirmed else 'rejected'] += 1
+    
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self.index.entries)
+        return stats
+
+_near_duplicate_index = None
+
+def get_near_duplicate_index(db=None):
+    """Process-wide near-duplicate index (the MongoDB tier is attached on first call with a db)"""
+    global _near_duplicate_index
+    if _near_duplicate_index is None:
+        _near_duplicate_index = NearDuplicateIndex(db)
+    elif _near_duplicate_index.collection is None and db is not None:
+        _near_duplicate_index.collection = db['perceptual_hashes']
+    return _near_duplicate_index
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import numpy as np
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+from core.detection_config import DETECTOR_VERSION, RESULT_CACHE_CONFIG
+
+def _to_plain(obj):
+    """Detector results with numpy values converted to JSON/BSON-safe types"""
+    def default(value):
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        if isinstance(value, np.generic):
+            return value.item()
+        return str(value)
+    return json.loads(json.dumps(obj, default=default))
+
+class ResultCache:
+    """Content-addressed cache of raw detector results.
+    
+    Entries are keyed by the upload's SHA-256 plus DETECTOR_VERSION and a
+    fingerprint of the analysis profile and its method versions, so a
+    version bump or a profile change simply stops matching old entries. An in-process LRU sits in
+    front of a MongoDB collection whose TTL index expires entries.
+    """
+    
+    def __init__(self, db=None, memory_entries=None, ttl_seconds=None):
+        self.collection = db['result_cache'] if db is not None else None
+        self.memory_entries = memory_entries or RESULT_CACHE_CONFIG['memory_entries']
+        self.ttl = timedelta(seconds=ttl_seconds or RESULT_CACHE_CONFIG['ttl_seconds'])
+        self.memory = OrderedDict()
+        self.lock = Lock()
+        self.stats = {'memory_hits': 0, 'mongo_hits': 0, 'misses': 0, 'stores': 0}
+    
+    @staticmethod
+    def profile_fingerprint(profile):
+        """Short hash of the profile settings and method versions that change results"""
+        from core.detection_registry import methods_fingerprint
+        
+        settings = {
+            'name': profile['name'],
+            'budget_seconds': profile['budget_seconds'],
+            'max_frames': profile['max_frames'],
+            'sampling_probes': profile.get('sampling_probes'),
+            'methods': sorted(profile['methods']) if profile.get('methods') else None,
+            # A method version bump misses here; the rerun then recomputes only that method (services/method_memo.py)
+            'method_versions': methods_fingerprint(profile.get('methods'))
+        }
+        return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
+    
+    def make_key(self, content_hash, profile):
+        return f"{content_hash}:{DETECTOR_VERSION}:{self.profile_fingerprint(profile)}"
+    
+    def get(self, content_hash, profile):
+        """Cached entry for an upload and profile as (entry, tier), or (None, None)"""
+        key = self.make_key(content_hash, profile)
+        now = datetime.now()
+        
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and entry['expires_at'] > now:
+                self.memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return entry, 'memory'
+            if entry is not None:
+                del self.memory[key]
+        
+        if self.collection is not None:
+            try:
+                entry = self.collection.find_one({'key': key, 'expires_at': {'$gt': now}}, {'_id': 0})
+                if entry is not None and entry.get('detector_version') == DETECTOR_VERSION:
+                    self._remember(key, entry)
+                    with self.lock:
+                        self.stats['mongo_hits'] += 1
+                    return entry, 'mongo'
+            except Exception as e:
+                print(f"Result cache lookup failed: {e}")
+        
+        with self.lock:
+            self.stats['misses'] += 1
+        return None, None
+    
+    def put(self, content_hash, profile, result, file_type=None, cloudinary_url=None):
+        """Store a raw detector result for later identical uploads"""
+        key = self.make_key(content_hash, profile)
+        now = datetime.now()
+        entry = {
+            'key': key,
+            'content_hash': content_hash,
+            'detector_version': DETECTOR_VERSION,
+            'profile': profile['name'],
+            'file_type': file_type,
+            'result': _to_plain(result),
+            'cloudinary_url': cloudinary_url,
+            'created_at': now,
+            'expires_at': now + self.ttl
+        }
+        self._remember(key, entry)
+        
+        if self.collection is not None:
+            try:
+                self.collection.update_one({'key': key}, {'$set': entry}, upsert=True)
+            except Exception as e:
+                print(f"Result cache store failed: {e}")
+        
+        with self.lock:
+            self.stats['stores'] += 1
+        return key
+    
+    def set_cloudinary_url(self, key, cloudinary_url):
+        """Fill in the media URL of an entry stored while its upload was still running"""
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and entry.get('cloudinary_url') is None:
+                entry['cloudinary_url'] = cloudinary_url
+        
+        if self.collection is not None:
+            try:
+                self.collection.update_one({'key': key, 'cloudinary_url': None}, {'$set': {'cloudinary_url': cloudinary_url}})
+            except Exception as e:
+                print(f"Result cache update failed: {e}")
+    
+    def _remember(self, key, entry):
+        with self.lock:
+            self.memory[key] = entry
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+    
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self.memory)
+        lookups = stats['memory_hits'] + stats['mongo_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['mongo_hits']) / lookups, 3) if lookups else 0.0
+        stats['detector_version'] = DETECTOR_VERSION
+        return stats
+
+_result_cache = None
+
+def get_result_cache(db=None):
+    """Process-wide result cache (the MongoDB tier is attached on first call with a db)"""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache(db)
+    elif _result_cache.collection is None and db is not None:
+        _result_cache.collection = db['result_cache']
+    return _result_cache
@@ -1,9 +1,27 @@
 from celery import Celery
 from kombu import Queue
+from threading import Lock, Thread
+import math
 import os
+import time
+import uuid
+from utils.fair_scheduler import FairScheduler
+from utils.async_tasks import QueueFullError
+from core.detection_config import FAIR_SCHEDULING_CONFIG
+
+# Broker queue per fair-scheduling priority class
+PRIORITY_QUEUES = {
+    'interactive': 'analysis',
+    'video': 'video',
+    'batch': 'batch'
+}
 
 def make_celery(app=None):
-    """Create Celery instance with Flask app context"""
+    """Create Celery instance with Flask app context
+    
+    Set CELERY_BROKER_URL=memory:// and CELERY_RESULT_BACKEND=cache+memory://
+    (optionally CELERY_TASK_ALWAYS_EAGER=1) to run without Redis, e.g. in tests.
+    """
     broker_url = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
     backend_url = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
     
@@ -26,15 +44,20 @@ def make_celery(app=None):
         worker_max_tasks_per_child=50,
         task_acks_late=True,
         task_reject_on_worker_lost=True,
+        task_always_eager=os.getenv('CELERY_TASK_ALWAYS_EAGER', '').lower() in ('1', 'true', 'yes'),
+        task_eager_propagates=True,
         task_default_queue='default',
         task_queues=(
             Queue('default', routing_key='task.#'),
             Queue('analysis', routing_key='analysis.#'),
             Queue('video', routing_key='video.#'),
+            Queue('batch', routing_key='batch.#'),
         ),
         task_routes={
             'tasks.analyze_image': {'queue': 'analysis'},
             'tasks.analyze_video': {'queue': 'video'},
+            'tasks.analyze_video_segment': {'queue': 'video'},
+            'tasks.merge_video_segments': {'queue': 'analysis'},
         }
     )
     
@@ -53,63 +76,235 @@ def make_celery(app=None):
 # Create celery instance
 celery_app = make_celery()
 
-@celery_app.task(bind=True, name='tasks.analyze_image')
-def async_analyze_image(self, image_path, user_id, file_id):
-    """Async image analysis task"""
-    from detectors.image_detector_v4 import analyze_image
+# Detectors are reused across tasks in a worker, one per analysis profile
+_detectors = {}
+
+def get_detector(profile_name=None):
+    """Worker-local SimplePretrainedDetector for a profile"""
+    from core.analysis_profiles import get_profile
+    from detectors.simple_pretrained_detector import SimplePretrainedDetector
+    
+    profile = get_profile(profile_name)
+    if not _detectors:
+        try:
+            from services.database import get_db
+            from services.method_memo import get_method_memo
+            # Workers share memoized method outputs with the web process through MongoDB
+            get_method_memo(get_db())
+        except Exception as e:
+            print(f"Method memo store unavailable: {e}")
+    if profile['name'] not in _detectors:
+        _detectors[profile['name']] = SimplePretrainedDetector(profile=profile)
+    return _detectors[profile['name']]
+
+def save_analysis(result, user_id, file_id, filename, profile, cloudinary_url=None):
+    """Shape a detector result like /api/analyze does and store it; returns a small summary"""
+    from routes.analysis import build_analysis_response
     from models.analysis import Analysis
+    from services.database import get_db
+    from utils.ai_name_detector import detect_ai_in_filename
     
+    has_ai_name, detected_keyword = detect_ai_in_filename(filename)
+    response_data = build_analysis_response(result, filename, has_ai_name, detected_keyword, profile, None)
+    save_result = Analysis(get_db()).create(
+        user_id=user_id,
+        file_id=file_id,
+        filename=filename,
+        analysis_result=response_data,
+        cloudinary_url=cloudinary_url
+    )
+    
+    # Task results travel through the result backend, keep them to ids and headline scores
+    return {
+        'analysis_id': str(save_result.inserted_id),
+        'file_id': file_id,
+        'authenticity_score': response_data['authenticity_score'],
+        'classification': response_data['classification'],
+        'risk_level': response_data['risk_level']
+    }
+
+@celery_app.task(bind=True, name='tasks.analyze_image')
+def async_analyze_image(self, image_path, user_id, file_id, filename=None, profile_name=None, cloudinary_url=None):
+    """Async image analysis task"""
     try:
         # Update task state
         self.update_state(state='PROCESSING', meta={'progress': 0})
         
-        # Analyze image
-        result = analyze_image(image_path)
+        detector = get_detector(profile_name)
+        filename = filename or os.path.basename(image_path)
+        result = detector.analyze_image(image_path, original_filename=filename)
         
-        # Save to database
-        Analysis.create(
-            user_id=user_id,
-            file_id=file_id,
-            original_filename=os.path.basename(image_path),
-            analysis_result=result,
-            cloudinary_url=None
-        )
+        summary = save_analysis(result, user_id, file_id, filename, detector.profile, cloudinary_url)
         
         self.update_state(state='SUCCESS', meta={'progress': 100})
-        return result
+        return summary
         
     except Exception as e:
         self.update_state(state='FAILURE', meta={'error': str(e)})
         raise
 
-@celery_app.task(bind=True, name='tasks.analyze_video')
-def async_analyze_video(self, video_path, user_id, file_id):
-    """Async video analysis task"""
-    from detectors.video_detector_v4 import analyze_video
-    from models.analysis import Analysis
+def build_video_workflow(video_ref, user_id, file_id, filename=None, profile_name=None, cloudinary_url=None):
+    """Chord that fans a video out into temporal segments and merges them.
+    
+    video_ref must be readable by every worker (shared storage path or URL);
+    only that reference and segment bounds travel through the broker.
+    """
+    import cv2
+    from celery import chord, group
+    from core.analysis_profiles import get_profile
+    from core.video_segments import plan_segments, segment_frame_budget
     
+    cap = cv2.VideoCapture(video_ref)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video_ref}")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    
+    profile = get_profile(profile_name)
+    segments = plan_segments(total_frames, fps)
+    if not segments:
+        raise ValueError(f"Video has no frames: {video_ref}")
+    
+    header = group(
+        async_analyze_video_segment.s(
+            video_ref, segment, segment_frame_budget(segment, total_frames, profile['max_frames']), profile['name']
+        )
+        for segment in segments
+    )
+    callback = async_merge_video_segments.s(
+        video_ref, user_id, file_id, filename or os.path.basename(video_ref), profile['name'], cloudinary_url
+    )
+    return chord(header, callback)
+
+@celery_app.task(bind=True, name='tasks.analyze_video')
+def async_analyze_video(self, video_path, user_id, file_id, filename=None, profile_name=None, cloudinary_url=None):
+    """Async video analysis task: replaced by the segment chord, so its result is the merged summary"""
     try:
-        # Update task state
         self.update_state(state='PROCESSING', meta={'progress': 0})
-        
-        # Analyze video
-        result = analyze_video(video_path)
-        
-        # Save to database
-        Analysis.create(
-            user_id=user_id,
-            file_id=file_id,
-            original_filename=os.path.basename(video_path),
-            analysis_result=result,
-            cloudinary_url=None
-        )
-        
-        self.update_state(state='SUCCESS', meta={'progress': 100})
-        return result
+        workflow = build_video_workflow(video_path, user_id, file_id, filename, profile_name, cloudinary_url)
         
     except Exception as e:
         self.update_state(state='FAILURE', meta={'error': str(e)})
         raise
+    
+    # replace() ends the task by raising Ignore, which must not be recorded as a failure
+    return self.replace(workflow)
+
+@celery_app.task(name='tasks.analyze_video_segment')
+def async_analyze_video_segment(video_ref, segment, frame_count, profile_name=None):
+    """Analyze one temporal segment; returns scores only (None if unreadable)"""
+    return get_detector(profile_name).analyze_video_segment(video_ref, segment, frame_count)
+
+@celery_app.task(name='tasks.merge_video_segments')
+def async_merge_video_segments(segment_results, video_ref, user_id, file_id, filename, profile_name=None,
+                               cloudinary_url=None):
+    """Chord callback: merge segment partials, fuse method scores and store the analysis"""
+    from core.video_segments import merge_segment_results
+    
+    merged = merge_segment_results(segment_results)
+    if not merged['frame_scores']:
+        raise RuntimeError(f"No segment of {filename} could be analyzed")
+    
+    detector = get_detector(profile_name)
+    score_metadata = {
+        'profile': detector.profile['name'],
+        'budget_seconds': detector.profile['budget_seconds'],
+        'elapsed_seconds': max((s['elapsed_seconds'] or 0.0) for s in merged['segments']),
+        'executed': sorted(merged['method_scores']),
+        'skipped': merged['skipped'],
+        'critical_path': []
+    }
+    if merged['triage']:
+        score_metadata['triage'] = merged['triage']
+    result = detector.build_video_result(
+        merged['frame_scores'], merged['confidences'], merged['method_scores'], score_metadata,
+        extra_summary={'segments': merged['segments'], 'failed_segments': merged['failed_segments']}
+    )
+    detector.apply_embedding_index(result, merged['embeddings'])
+    
+    return save_analysis(result, user_id, file_id, filename, detector.profile, cloudinary_url)
+
+class CeleryFairDispatcher:
+    """Holds analysis tasks in a FairScheduler and releases them to the broker.
+    
+    Celery queues are FIFO, so fairness has to be applied before dispatch:
+    at most max_in_flight tasks are handed to the broker at a time, and the
+    scheduler decides which waiting task goes next as in-flight ones finish.
+    """
+    
+    def __init__(self, max_in_flight=None, scheduler=None, poll_interval=0.5):
+        self.max_in_flight = max_in_flight or int(os.getenv('CELERY_MAX_IN_FLIGHT', '8'))
+        self.scheduler = scheduler or FairScheduler()
+        self.poll_interval = poll_interval
+        self.lock = Lock()
+        self.in_flight = {}  # task id -> (AsyncResult, owner)
+        self._poller = None
+    
+    def submit(self, signature, owner=None, priority_class=None, cost=None):
+        """Queue a task signature; returns the Celery task id it will run under"""
+        if not self.scheduler.can_accept(owner):
+            raise QueueFullError(max(1, math.ceil(cost or FAIR_SCHEDULING_CONFIG['default_cost_seconds'])))
+        
+        task_id = str(uuid.uuid4())
+        priority_class = self.scheduler.classify(requested=priority_class)
+        self.scheduler.enqueue(task_id, signature, owner=owner, priority_class=priority_class, cost=cost)
+        self._ensure_poller()
+        self.pump()
+        return task_id
+    
+    def pump(self):
+        """Release finished tasks, then dispatch waiting ones while there is capacity"""
+        with self.lock:
+            for task_id, (result, owner) in list(self.in_flight.items()):
+                if result.ready():
+                    del self.in_flight[task_id]
+                    self.scheduler.release(owner)
+            
+            while len(self.in_flight) < self.max_in_flight:
+                task = self.scheduler.next_ready()
+                if task is None:
+                    break
+                task_id, signature, owner, priority_class = task
+                try:
+                    result = signature.apply_async(task_id=task_id, queue=PRIORITY_QUEUES[priority_class])
+                    self.in_flight[task_id] = (result, owner)
+                except Exception as e:
+                    print(f"[ERROR] Failed to dispatch task {task_id}: {e}")
+                    self.scheduler.release(owner)
+    
+    def _ensure_poller(self):
+        if self._poller is None or not self._poller.is_alive():
+            self._poller = Thread(target=self._poll, daemon=True)
+            self._poller.start()
+    
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.pump()
+            except Exception as e:
+                print(f"[ERROR] Dispatcher poll failed: {e}")
+    
+    def get_metrics(self):
+        with self.lock:
+            in_flight = len(self.in_flight)
+        return {'in_flight': in_flight, 'max_in_flight': self.max_in_flight, **self.scheduler.get_metrics()}
+
+# Global dispatcher for the web process
+dispatcher = CeleryFairDispatcher()
+
+def submit_analysis(file_path, file_type, user_id, file_id, filename=None, profile_name=None,
+                    cloudinary_url=None, priority_class=None, cost=None):
+    """Fair-scheduled Celery analysis of an uploaded file; returns the task id to poll"""
+    task = async_analyze_video if file_type == 'video' else async_analyze_image
+    signature = task.s(file_path, user_id, file_id, filename, profile_name, cloudinary_url)
+    return dispatcher.submit(
+        signature,
+        owner=str(user_id),
+        priority_class=dispatcher.scheduler.classify(file_type, priority_class),
+        cost=cost
+    )
 
 @celery_app.task(name='tasks.cleanup_old_files')
 def cleanup_old_files():
@@ -0,0 +1,267 @@
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from threading import BoundedSemaphore, Lock
+import numpy as np
+from core.detection_config import VIDEO_FINGERPRINT_CONFIG, RESULT_CACHE_CONFIG
+from services.near_duplicates import MultiIndexHash
+from utils.perceptual_hash import hamming_matrix
+from utils.video_fingerprint import video_fingerprint
+
+def _hash_array(hashes):
+    """(positions, values) of the keyframes that have a hash"""
+    positions = [i for i, h in enumerate(hashes) if h]
+    return np.array(positions, dtype=np.int64), np.array([int(hashes[i], 16) for i in positions], dtype=np.uint64)
+
+def align(query, stored):
+    """Best alignment of a query fingerprint inside a stored one.
+    
+    Every pair of keyframes within max_hash_distance votes for the offset
+    between them; the winning offset (smoothed over one keyframe either
+    way, for clips trimmed between keyframes) is then verified position by
+    position. Returns None or {offset, matched, overlap, coverage, audio_ber}.
+    """
+    max_distance = VIDEO_FINGERPRINT_CONFIG['max_hash_distance']
+    q_pos, q_val = _hash_array(query['keyframes'])
+    s_pos, s_val = _hash_array(stored['keyframes'])
+    if not len(q_pos) or not len(s_pos):
+        return None
+    
+    close = hamming_matrix(q_val, s_val) <= max_distance
+    qi, si = np.nonzero(close)
+    if not len(qi):
+        return None
+    offsets = s_pos[si] - q_pos[qi]
+    shift = len(query['keyframes'])
+    votes = np.bincount(offsets + shift, minlength=shift + len(stored['keyframes']) + 1)
+    smoothed = np.convolve(votes, np.ones(3, dtype=np.int64), mode='same')
+    offset = int(np.argmax(smoothed)) - shift
+    
+    # Verify: each query keyframe against the stored keyframes at offset - 1 .. offset + 1
+    stored_index = {int(p): n for n, p in enumerate(s_pos)}
+    matched = overlap = 0
+    for n, position in enumerate(q_pos):
+        target = int(position) + offset
+        if not 0 <= target < len(stored['keyframes']):
+            continue
+        overlap += 1
+        neighbours = [stored_index[t] for t in (target - 1, target, target + 1) if t in stored_index]
+        if any(close[n, m] for m in neighbours):
+            matched += 1
+    if not overlap:
+        return None
+    
+    return {
+        'offset': offset,
+        'matched': matched,
+        'overlap': overlap,
+        'coverage': overlap / len(q_pos),
+        'audio_ber': audio_bit_error_rate(query.get('audio'), stored.get('audio'), offset)
+    }
+
+def audio_bit_error_rate(query_audio, stored_audio, offset):
+    """Share of differing bits between aligned audio sub-fingerprints, None without enough audio on both"""
+    if not query_audio or not stored_audio:
+        return None
+    errors = compared = 0
+    for position, value in enumerate(query_audio):
+        target = position + offset
+        if value is None or not 0 <= target < len(stored_audio) or stored_audio[target] is None:
+            continue
+        errors += bin(value ^ stored_audio[target]).count('1')
+        compared += 1
+    if compared < VIDEO_FINGERPRINT_CONFIG['min_overlap_seconds'] * VIDEO_FINGERPRINT_CONFIG['rate']:
+        return None
+    return errors / (compared * 16)
+
+class VideoFingerprintIndex:
+    """Index of analysed videos by temporal fingerprint, for re-encoded and trimmed copies.
+    
+    Keyframe hashes of recent videos sit in an in-process MultiIndexHash,
+    which turns a query's keyframes into candidate videos; MongoDB keeps
+    every fingerprint with its exact substring keys in a multikey index
+    for the full history. Candidates are then aligned (see align) and
+    accepted when enough of the new clip lines up with them.
+    
+    Queries only fingerprint the start of a clip (probe_seconds); the
+    full fingerprint of an analysed video is built by index_in_background
+    on a small worker pool, off the request path.
+    """
+    
+    def __init__(self, db=None):
+        self.collection = db['video_fingerprints'] if db is not None else None
+        self.index = MultiIndexHash(VIDEO_FINGERPRINT_CONFIG['chunks'], VIDEO_FINGERPRINT_CONFIG['memory_entries'])
+        self.videos = OrderedDict()  # content hash -> fingerprint
+        self.lock = Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=VIDEO_FINGERPRINT_CONFIG['index_workers'], thread_name_prefix='video-fingerprint'
+        )
+        self.pending = BoundedSemaphore(VIDEO_FINGERPRINT_CONFIG['index_workers'] + VIDEO_FINGERPRINT_CONFIG['index_pending'])
+        self.stats = {'lookups': 0, 'matches': 0, 'confirmed': 0, 'rejected': 0, 'lookup_ms': 0.0,
+                      'indexed': 0, 'index_skipped': 0}
+    
+    def _chunk_keys(self, hashes):
+        # Chunk position and value in one integer for the multikey index
+        keys = set()
+        for value in _hash_array(hashes)[1]:
+            keys.update((i << self.index.chunk_bits) | chunk for i, chunk in enumerate(self.index.split(int(value))))
+        return sorted(keys)
+    
+    def add(self, fingerprint, content_hash):
+        """Index an analysed video by its fingerprint"""
+        with self.lock:
+            for position, value in zip(*_hash_array(fingerprint['keyframes'])):
+                self.index.add(f"{content_hash}:{position}", int(value), content_hash)
+            self.videos[content_hash] = fingerprint
+            self.videos.move_to_end(content_hash)
+            while len(self.videos) > VIDEO_FINGERPRINT_CONFIG['memory_videos']:
+                self.videos.popitem(last=False)
+        
+        if self.collection is not None:
+            try:
+                now = datetime.now()
+                self.collection.update_one({'content_hash': content_hash}, {'$set': {
+                    'content_hash': content_hash,
+                    'rate': fingerprint['rate'],
+                    'duration': fingerprint['duration'],
+                    'keyframes': fingerprint['keyframes'],
+                    'audio': fingerprint['audio'],
+                    'chunks': self._chunk_keys(fingerprint['keyframes']),
+                    'created_at': now,
+                    'expires_at': now + timedelta(seconds=RESULT_CACHE_CONFIG['ttl_seconds'])
+                }}, upsert=True)
+            except Exception as e:
+                print(f"Video fingerprint store failed: {e}")
+    
+    def index_in_background(self, path, content_hash):
+        """Fingerprint a whole analysed video on the index pool and add it; the caller may delete path right away"""
+        if not self.pending.acquire(blocking=False):
+            # Only a later copy's cache hit is lost
+            print(f"Video fingerprint indexing skipped for {content_hash}: queue is full")
+            with self.lock:
+                self.stats['index_skipped'] += 1
+            return None
+        
+        # Own reference to the file (a hard link, or a copy across file systems)
+        staged = os.path.join(tempfile.gettempdir(), f"fingerprint_{uuid.uuid4().hex}{os.path.splitext(path)[1]}")
+        try:
+            try:
+                os.link(path, staged)
+            except OSError:
+                shutil.copyfile(path, staged)
+        except OSError as e:
+            print(f"Video fingerprint staging failed for {content_hash}: {e}")
+            self.pending.release()
+            return None
+        return self.executor.submit(self._index_staged, staged, content_hash)
+    
+    def _index_staged(self, staged, content_hash):
+        try:
+            fingerprint = video_fingerprint(staged)
+            if fingerprint is not None:
+                self.add(fingerprint, content_hash)
+                with self.lock:
+                    self.stats['indexed'] += 1
+            return fingerprint
+        except Exception as e:
+            print(f"Video fingerprint indexing failed for {content_hash}: {e}")
+            return None
+        finally:
+            try:
+                os.remove(staged)
+            except OSError as e:
+                print(f"Video fingerprint staging cleanup error: {e}")
+            self.pending.release()
+    
+    def _candidates(self, fingerprint, exclude):
+        """{content hash: stored fingerprint} of videos sharing keyframes with the query"""
+        max_distance = VIDEO_FINGERPRINT_CONFIG['max_hash_distance']
+        votes = {}
+        with self.lock:
+            for _, value in zip(*_hash_array(fingerprint['keyframes'])):
+                for _, _, content_hash in self.index.search(int(value), max_distance):
+                    votes[content_hash] = votes.get(content_hash, 0) + 1
+            ranked = sorted(votes, key=votes.get, reverse=True)[:VIDEO_FINGERPRINT_CONFIG['max_candidates']]
+            candidates = {h: self.videos[h] for h in ranked if h in self.videos and h != exclude}
+        
+        if self.collection is not None and len(candidates) < VIDEO_FINGERPRINT_CONFIG['max_candidates']:
+            try:
+                cursor = self.collection.find(
+                    {
+                        'chunks': {'$in': self._chunk_keys(fingerprint['keyframes'])},
+                        'rate': fingerprint['rate'],
+                        'expires_at': {'$gt': datetime.now()}
+                    },
+                    {'_id': 0, 'content_hash': 1, 'rate': 1, 'duration': 1, 'keyframes': 1, 'audio': 1}
+                ).limit(VIDEO_FINGERPRINT_CONFIG['max_candidates'])
+                for doc in cursor:
+                    if doc['content_hash'] != exclude:
+                        candidates.setdefault(doc['content_hash'], doc)
+            except Exception as e:
+                print(f"Video fingerprint lookup failed: {e}")
+        return candidates
+    
+    def find(self, fingerprint, exclude=None):
+        """Indexed videos the fingerprinted clip is a (trimmed, re-encoded) copy of, best first"""
+        started = time.perf_counter()
+        rate = fingerprint['rate']
+        matches = []
+        for content_hash, stored in self._candidates(fingerprint, exclude).items():
+            if stored.get('rate') != rate:
+                continue
+            alignment = align(fingerprint, stored)
+            if alignment is None:
+                continue
+            ratio = alignment['matched'] / alignment['overlap']
+            audio_ber = alignment['audio_ber']
+            # A probe covers the start of the clip only, the stored video must be long enough to hold all of it
+            remaining = stored['duration'] - alignment['offset'] / rate
+            if alignment['overlap'] < VIDEO_FINGERPRINT_CONFIG['min_overlap_seconds'] * rate or \
+                    remaining < VIDEO_FINGERPRINT_CONFIG['min_query_coverage'] * fingerprint['duration'] or \
+                    ratio < VIDEO_FINGERPRINT_CONFIG['min_match_ratio'] or \
+                    alignment['coverage'] < VIDEO_FINGERPRINT_CONFIG['min_query_coverage'] or \
+                    (audio_ber is not None and audio_ber > VIDEO_FINGERPRINT_CONFIG['max_audio_ber']):
+                continue
+            matches.append({
+                'content_hash': content_hash,
+                'offset_seconds': round(alignment['offset'] / rate, 2),
+                'overlap_seconds': round(alignment['overlap'] / rate, 2),
+                'match_ratio': round(ratio, 3),
+                'coverage': round(alignment['coverage'], 3),
+                'audio_ber': round(audio_ber, 3) if audio_ber is not None else None
+            })
+        matches.sort(key=lambda m: (m['match_ratio'], m['coverage']), reverse=True)
+        
+        with self.lock:
+            self.stats['lookups'] += 1
+            self.stats['lookup_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            if matches:
+                self.stats['matches'] += 1
+        return matches
+    
+    def record_confirmation(self, confirmed):
+        with self.lock:
+            self.stats['confirmed' if confirmed else 'rejected'] += 1
+    
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['memory_videos'] = len(self.videos)
+            stats['memory_keyframes'] = len(self.index.entries)
+        return stats
+
+_video_fingerprint_index = None
+
+def get_video_fingerprint_index(db=None):
+    """Process-wide video fingerprint index (the MongoDB tier is attached on first call with a db)"""
+    global _video_fingerprint_index
+    if _video_fingerprint_index is None:
+        _video_fingerprint_index = VideoFingerprintIndex(db)
+    elif _video_fingerprint_index.collection is None and db is not None:
+        _video_fingerprint_index.collection = db['video_fingerprints']
+    return _video_fingerprint_index
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Tests import backend modules as the app does, from the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Celery runs in-process on the in-memory transport (see services.task_queue.make_celery)
+os.environ.setdefault('CELERY_BROKER_URL', 'memory://')
+os.environ.setdefault('CELERY_RESULT_BACKEND', 'cache+memory://')
+os.environ.setdefault('CELERY_TASK_ALWAYS_EAGER', '1')
@@ -0,0 +1,63 @@
+import pytest
+from flask import Flask, jsonify
+
+import middleware.admission_control as admission
+from middleware.admission_control import AdmissionController, admission_control
+
+class StubQueue:
+    """Reports fixed queue statistics to the admission controller"""
+    
+    def __init__(self, queued, running, workers=1, max_queue_size=2):
+        self.stats = {'queued': queued, 'running': running, 'workers': workers, 'max_queue_size': max_queue_size}
+    
+    def get_stats(self):
+        return dict(self.stats)
+    
+    def estimate_retry_after(self):
+        return 7
+
+@pytest.fixture
+def controller(monkeypatch):
+    controller = AdmissionController()
+    monkeypatch.setattr(controller, 'memory_available_mb', lambda: None)
+    monkeypatch.setattr(admission, 'admission_controller', controller)
+    return controller
+
+def make_client(degradable=True):
+    app = Flask(__name__)
+    
+    @app.route('/analyze', methods=['POST'])
+    @admission_control(degradable=degradable)
+    def analyze():
+        return jsonify({'status': 'analyzed'})
+    
+    return app.test_client()
+
+def post(client):
+    return client.post('/analyze', data=b'x' * 1024, headers={'X-File-Type': 'image'})
+
+def test_idle_server_admits(controller):
+    controller.register_queue(StubQueue(queued=0, running=0, workers=100))
+    assert post(make_client()).status_code == 200
+
+def test_full_queue_is_rejected_with_429(controller):
+    controller.register_queue(StubQueue(queued=2, running=1))
+    
+    response = post(make_client())
+    assert response.status_code == 429
+    assert response.get_json()['reason'] == 'queue_full'
+    assert response.headers['Retry-After'] == '7'
+    assert controller.get_metrics()['decisions'] == {'reject': {'queue_full': 1}}
+
+def test_load_degrades_unless_the_route_cannot(controller):
+    # 4 of 5 workers busy: utilization 0.8 sits between degrade_pressure and shed_pressure
+    workers = 5 - admission.PERFORMANCE_CONFIG['max_concurrent_analyses']
+    controller.register_queue(StubQueue(queued=0, running=4, workers=workers))
+    
+    response = post(make_client())
+    assert response.status_code == 200
+    assert response.headers['X-Analysis-Degraded'] == admission.ADMISSION_CONFIG['degrade_profile']
+    
+    response = post(make_client(degradable=False))
+    assert response.status_code == 503
+    assert response.get_json()['reason'] == 'overloaded'
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+from flask import Flask
+
+import routes.analysis_stream as analysis_stream
+from routes.analysis_stream import analysis_stream_bp, claim_session, get_progress, set_progress
+
+USERS = {'alice-token': {'_id': 'alice'}, 'bob-token': {'_id': 'bob'}}
+
+@pytest.fixture(autouse=True)
+def store(monkeypatch):
+    monkeypatch.setattr(analysis_stream, 'progress_store', {})
+    return analysis_stream.progress_store
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(analysis_stream, 'get_db', lambda: None)
+    monkeypatch.setattr(analysis_stream, 'user_from_token', lambda db, token: USERS.get(token))
+    app = Flask(__name__)
+    app.register_blueprint(analysis_stream_bp, url_prefix='/api')
+    return app.test_client()
+
+def events(response):
+    return [json.loads(line[len('data: '):]) for line in response.get_data(as_text=True).splitlines() if line]
+
+def test_client_chosen_id_is_kept_for_its_owner_only():
+    assert claim_session('mine', 'alice') == 'mine'
+    assert claim_session('mine', 'alice') == 'mine'
+    
+    taken = claim_session('mine', 'bob')
+    assert taken != 'mine'
+    assert claim_session(None, 'bob') not in ('mine', taken)
+    assert claim_session('x' * 100, 'bob') != 'x' * 100
+
+def test_progress_is_only_readable_by_its_owner():
+    session_id = claim_session('mine', 'alice')
+    set_progress(session_id, 40, 'Scoring', {'windows_done': 2, 'score': 71.0})
+    
+    assert get_progress(session_id, 'alice')['verdict']['score'] == 71.0
+    assert 'user_id' not in get_progress(session_id, 'alice')
+    assert 'verdict' not in get_progress(session_id, 'bob')
+    assert get_progress(session_id, 'bob')['progress'] == 0
+
+def test_stale_sessions_expire(store, monkeypatch):
+    claim_session('old', 'alice')
+    store['old']['timestamp'] -= analysis_stream.PROGRESS_STREAM_CONFIG['ttl_seconds'] + 1
+    claim_session('new', 'bob')
+    assert list(store) == ['new']
+
+def test_updates_for_unclaimed_sessions_are_dropped(store):
+    set_progress('unclaimed', 10, 'Starting')
+    assert store == {}
+
+def test_stream_requires_a_token(client):
+    assert client.get('/api/progress/mine').status_code == 401
+    assert client.get('/api/progress/mine?token=forged').status_code == 401
+
+def test_stream_serves_the_owner_and_then_forgets_the_session(client, store):
+    session_id = claim_session('mine', 'alice')
+    set_progress(session_id, 100, 'Analysis complete!')
+    
+    response = client.get(f'/api/progress/{session_id}?token=alice-token')
+    assert response.status_code == 200
+    assert events(response)[-1]['message'] == 'Analysis complete!'
+    assert store == {}
@@ -0,0 +1,52 @@
+import threading
+import time
+
+import pytest
+
+from utils.async_tasks import QueueFullError, TaskQueue
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('condition not reached')
+        time.sleep(0.01)
+
+@pytest.fixture
+def blocked_queue():
+    """A one-worker queue whose first task holds the worker until released"""
+    release = threading.Event()
+    queue = TaskQueue(max_workers=1, max_queue_size=2)
+    queue.submit('blocker', release.wait)
+    wait_for(lambda: queue.get_result('blocker')['status'] == 'running')
+    yield queue
+    release.set()
+
+def test_full_queue_raises_with_retry_after(blocked_queue):
+    blocked_queue.submit('one', lambda: 1)
+    blocked_queue.submit('two', lambda: 2)
+    
+    with pytest.raises(QueueFullError) as error:
+        blocked_queue.submit('three', lambda: 3)
+    assert error.value.retry_after >= 1
+    assert blocked_queue.get_result('three') == {'status': 'not_found'}
+
+def test_finished_results_are_evicted_oldest_first():
+    queue = TaskQueue(max_workers=1, max_results=3)
+    for i in range(5):
+        queue.submit(f'task-{i}', lambda i=i: i)
+        wait_for(lambda i=i: 'completed_at' in queue.get_result(f'task-{i}'))
+    
+    queue.cleanup_old_results()
+    assert [queue.get_result(f'task-{i}')['status'] for i in range(5)] == \
+        ['not_found', 'not_found', 'completed', 'completed', 'completed']
+
+def test_expired_results_are_evicted():
+    queue = TaskQueue(max_workers=1, result_ttl=60)
+    queue.submit('done', lambda: 1)
+    wait_for(lambda: 'completed_at' in queue.get_result('done'))
+    
+    assert queue.cleanup_old_results() == 0
+    time.sleep(0.01)
+    assert queue.cleanup_old_results(max_age=0) == 1
+    assert queue.get_result('done') == {'status': 'not_found'}
@@ -0,0 +1,47 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+import analysis.audio_analysis as audio_analysis
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """Paths passed to librosa.load, which returns one second of a tone"""
+    calls = []
+    
+    def load(path, sr=None, **kwargs):
+        calls.append(path)
+        t = np.arange(sr) / sr
+        return (0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32), sr
+    
+    monkeypatch.setitem(sys.modules, 'librosa', types.SimpleNamespace(load=load))
+    monkeypatch.setattr(audio_analysis, '_audio_cache', type(audio_analysis._audio_cache)())
+    return calls
+
+@pytest.fixture
+def wav(tmp_path):
+    path = tmp_path / 'clip.wav'
+    path.write_bytes(b'RIFF' + b'\x00' * 64)
+    return str(path)
+
+def test_soundtrack_is_decoded_once_per_analysis(decodes, wav):
+    audio_analysis.get_voiced_audio(wav)
+    audio_analysis._load_audio(wav)
+    audio_analysis.get_voice_activity_summary(wav)
+    assert decodes == [wav]
+
+def test_rewritten_file_at_the_same_path_is_decoded_again(decodes, wav):
+    audio_analysis.get_voiced_audio(wav)
+    with open(wav, 'ab') as f:
+        f.write(b'\x00' * 16)
+    audio_analysis.get_voiced_audio(wav)
+    assert decodes == [wav, wav]
+
+def test_release_drops_the_decoded_soundtrack(decodes, wav):
+    audio_analysis.get_voiced_audio(wav)
+    audio_analysis.release_audio(wav)
+    assert not audio_analysis._audio_cache
+    audio_analysis.get_voiced_audio(wav)
+    assert decodes == [wav, wav]
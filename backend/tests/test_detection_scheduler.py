@@ -0,0 +1,48 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import core.detection_registry as registry
+import core.detection_scheduler as detection_scheduler
+from core.detection_scheduler import DetectionScheduler
+
+class ThreadProcessor:
+    max_workers = 2
+    
+    def select_backend(self, name, func):
+        return 'thread'
+
+@pytest.fixture
+def methods(monkeypatch):
+    """Two frame methods, one of which hangs until the test ends"""
+    release = threading.Event()
+    functions = {
+        'quick': lambda frames: 0.9,
+        'hung': lambda frames: release.wait() and 0.9
+    }
+    for name in functions:
+        monkeypatch.setitem(registry.DETECTION_METHODS, name, {
+            'module': __name__, 'function': name, 'inputs': ('frames',), 'cost': 0.1, 'information': 0.05,
+            'releases_gil': True, 'version': 1
+        })
+    monkeypatch.setattr(detection_scheduler, 'resolve_callable', functions.get)
+    monkeypatch.setitem(detection_scheduler.METHOD_MEMO_CONFIG, 'enabled', False)
+    monkeypatch.setitem(detection_scheduler.PERFORMANCE_CONFIG, 'timeout_seconds', 0.2)
+    
+    recorded = []
+    monkeypatch.setattr(detection_scheduler.cost_model, 'record', lambda name, *args: recorded.append(name))
+    yield recorded
+    release.set()
+
+def test_timeout_returns_without_waiting_for_hung_methods(methods):
+    frames = [np.zeros((8, 8, 3), dtype=np.uint8)] * 2
+    
+    started = time.perf_counter()
+    results, report = DetectionScheduler(processor=ThreadProcessor()).run(frames, methods=['quick', 'hung'])
+    
+    assert time.perf_counter() - started < 2
+    assert results == {'quick': 0.9, 'hung': 0.5}
+    # Only methods that finished feed the cost model
+    assert methods == ['quick']
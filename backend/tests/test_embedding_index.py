@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import services.embedding_index as embedding_index
+from services.embedding_index import EmbeddingIndex, pack_embedding
+
+def vectors(count, seed, center):
+    rng = np.random.default_rng(seed)
+    return {f'{seed:04x}{i:028x}': center + 0.01 * rng.standard_normal(128) for i in range(count)}
+
+@pytest.fixture
+def index(tmp_path):
+    index = EmbeddingIndex('test', directory=str(tmp_path))
+    rng = np.random.default_rng(0)
+    fake_center, real_center = rng.random(128), rng.random(128)
+    index.add(vectors(5, 1, fake_center), True, 5.0)
+    index.add(vectors(5, 2, real_center), False, 85.0)
+    return index, fake_center
+
+def test_neighbours_of_a_fake_cluster_report_no_authentic_share(index):
+    index, fake_center = index
+    signal = index.known_fake_signal(np.stack([fake_center]))
+    assert signal['authentic_share'] == 0.0
+    assert signal['fake_neighbors'] == signal['neighbors'] >= 3
+    assert signal['labels'] == 'detector_verdicts'
+
+def test_unrelated_frames_get_no_signal(index):
+    index, _ = index
+    assert index.known_fake_signal(np.stack([np.random.default_rng(9).random(128)])) is None
+
+def test_neighbour_evidence_does_not_change_the_verdict(index, monkeypatch):
+    pytest.importorskip('torch')
+    from detectors.simple_pretrained_detector import SimplePretrainedDetector
+    
+    index, fake_center = index
+    monkeypatch.setattr(embedding_index, 'get_embedding_index', lambda fingerprint=None: index)
+    detector = SimplePretrainedDetector.__new__(SimplePretrainedDetector)
+    result = {'authenticity_score': 80.0, 'individual_scores': {'pretrained_cnn': 80.0}}
+    
+    detector.apply_embedding_index(result, {'ab' * 16: pack_embedding(fake_center)}, index_result=False)
+    assert result['authenticity_score'] == 80.0
+    assert result['individual_scores'] == {'pretrained_cnn': 80.0}
+    assert result['individual_scores_metadata']['embedding_neighbors']['fake_neighbors'] >= 3
@@ -0,0 +1,75 @@
+import cv2
+import numpy as np
+
+import core.shared_intermediates as shared_intermediates
+from analysis.facial_analysis import analyze_head_pose
+from core.detection_utils import head_pose_vectors
+
+FRAME_SHAPE = (480, 640, 3)
+POSE_LANDMARKS = (30, 8, 36, 45, 48, 54)
+MODEL_POINTS = np.array([
+    (0.0, 0.0, 0.0), (0.0, -330.0, -65.0), (-225.0, 170.0, -135.0),
+    (225.0, 170.0, -135.0), (-150.0, -150.0, -125.0), (150.0, -150.0, -125.0)
+])
+
+def project(rotations):
+    """(N, 68, 2) int16 landmark stack whose pose points are the model seen at each rotation"""
+    camera = np.array([[640.0, 0, 320.0], [0, 640.0, 240.0], [0, 0, 1]])
+    points = np.zeros((len(rotations), 68, 2), dtype=np.int16)
+    for row, rotation in enumerate(rotations):
+        image_points, _ = cv2.projectPoints(
+            MODEL_POINTS, np.array(rotation, dtype=np.float64), np.array([0.0, 0.0, 1500.0]), camera, np.zeros(4)
+        )
+        points[row, list(POSE_LANDMARKS)] = np.round(image_points.reshape(-1, 2))
+    return points
+
+def landmark_stack(rotations):
+    return {
+        'points': project(rotations),
+        'frame_indices': np.arange(len(rotations), dtype=np.int32) * 4,
+        'track_ids': np.zeros(len(rotations), dtype=np.int32)
+    }
+
+def sweep(step, count=8):
+    return [(0.0, step * i, 0.0) for i in range(count)]
+
+def test_head_pose_vectors_recover_the_rotation_of_each_row():
+    rotations = sweep(0.1)
+    assert np.allclose(head_pose_vectors(project(rotations), FRAME_SHAPE), rotations, atol=0.02)
+
+def test_head_pose_thresholds_are_in_rotation_vector_distance():
+    # Pins the solvePnP loop's output scale to the analyze_head_pose thresholds
+    frames = np.zeros((32,) + FRAME_SHAPE, dtype=np.uint8)
+    assert analyze_head_pose(frames, landmark_stack(sweep(0.1))) == 0.9
+    assert analyze_head_pose(frames, landmark_stack(sweep(0.0))) == 0.3
+    assert analyze_head_pose(frames, landmark_stack(sweep(0.5))) == 0.5
+
+class FakePart:
+    def __init__(self, k):
+        self.x, self.y = k, 2 * k
+
+class FakePredictor:
+    def __call__(self, gray, rectangle):
+        return self
+    
+    def parts(self):
+        return [FakePart(k) for k in range(68)]
+
+def test_compute_landmarks_loads_predictors_only_on_landmark_threads(monkeypatch):
+    monkeypatch.setattr(shared_intermediates, 'DLIB_AVAILABLE', True)
+    monkeypatch.setattr(shared_intermediates, 'face_rectangle', lambda track: track['box'])
+    monkeypatch.setattr(shared_intermediates, 'get_thread_landmark_predictor', FakePredictor)
+    gray = [np.zeros((8, 8), dtype=np.uint8)] * 3
+    faces = [[{'track_id': 7, 'box': (0, 0, 4, 4)}], [], [{'track_id': 7, 'box': (0, 0, 4, 4)}]]
+    
+    landmarks = shared_intermediates.compute_landmarks(gray, faces)
+    assert landmarks['frame_indices'].tolist() == [0, 2]
+    assert landmarks['track_ids'].tolist() == [7, 7]
+    assert landmarks['points'][1, 10].tolist() == [10, 20]
+
+def test_compute_landmarks_without_a_loadable_predictor(monkeypatch):
+    monkeypatch.setattr(shared_intermediates, 'DLIB_AVAILABLE', True)
+    monkeypatch.setattr(shared_intermediates, 'face_rectangle', lambda track: track['box'])
+    monkeypatch.setattr(shared_intermediates, 'get_thread_landmark_predictor', lambda: None)
+    faces = [[{'track_id': 0, 'box': (0, 0, 4, 4)}]]
+    assert shared_intermediates.compute_landmarks([np.zeros((8, 8), dtype=np.uint8)], faces) is None
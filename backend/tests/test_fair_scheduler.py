@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from utils.async_tasks import QueueFullError, TaskQueue
+from utils.fair_scheduler import FairScheduler
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('condition not reached')
+        time.sleep(0.01)
+
+def drain(scheduler):
+    order = []
+    while True:
+        job = scheduler.next_ready()
+        if job is None:
+            return order
+        task_id, _, owner, _ = job
+        order.append(task_id)
+        scheduler.release(owner)
+
+def test_one_users_backlog_interleaves_with_another_user():
+    scheduler = FairScheduler()
+    for i in range(4):
+        scheduler.enqueue(f'a{i}', None, owner='a', priority_class='video', cost=5)
+    scheduler.enqueue('b0', None, owner='b', priority_class='video', cost=5)
+    
+    assert drain(scheduler)[:2] in (['a0', 'b0'], ['b0', 'a0'])
+
+def test_classes_share_dispatches_by_weight():
+    scheduler = FairScheduler(class_weights={'interactive': 6, 'video': 3, 'batch': 1})
+    for i in range(10):
+        scheduler.enqueue(f'batch{i}', None, priority_class='batch', cost=1)
+        scheduler.enqueue(f'image{i}', None, priority_class='interactive', cost=1)
+    
+    first = drain(scheduler)[:7]
+    assert sum(task_id.startswith('image') for task_id in first) == 6
+
+def test_owners_over_their_concurrency_cap_are_skipped():
+    scheduler = FairScheduler(per_user_concurrency=1)
+    scheduler.enqueue('a0', None, owner='a')
+    scheduler.enqueue('a1', None, owner='a')
+    scheduler.enqueue('b0', None, owner='b')
+    
+    assert scheduler.next_ready()[0] == 'a0'
+    assert scheduler.next_ready()[0] == 'b0'
+    assert scheduler.next_ready() is None
+    scheduler.release('a')
+    assert scheduler.next_ready()[0] == 'a1'
+
+def test_owner_pending_cap_raises_queue_full():
+    release = threading.Event()
+    queue = TaskQueue(max_workers=1, scheduler=FairScheduler(max_pending_per_user=1))
+    try:
+        queue.submit('blocker', release.wait, owner='a')
+        wait_for(lambda: queue.get_result('blocker')['status'] == 'running')
+        queue.submit('queued', lambda: 1, owner='a')
+        
+        with pytest.raises(QueueFullError):
+            queue.submit('over', lambda: 2, owner='a')
+        # Other users are not affected by one user's backlog
+        queue.submit('other', lambda: 3, owner='b')
+    finally:
+        release.set()
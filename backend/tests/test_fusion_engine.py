@@ -0,0 +1,48 @@
+import pytest
+
+from core.analysis_profiles import get_profile
+from core.detection_registry import DETECTION_METHODS
+from fusion.fusion_engine import AdvancedFusionEngine
+
+# Registry methods report authenticity: about 0.9 for natural content, 0.3 for deepfakes
+NATURAL = {name: 0.9 for name in DETECTION_METHODS}
+FAKE = {name: 0.3 for name in DETECTION_METHODS}
+
+def test_natural_methods_score_as_authentic():
+    report = AdvancedFusionEngine().generate_detailed_report(NATURAL)
+    assert report['authenticity_score'] == pytest.approx(90.0)
+    assert report['classification'] == 'AUTHENTIC_HUMAN'
+    assert list(report['individual_scores'].values()) == pytest.approx([90.0] * len(report['individual_scores']))
+    assert list(report['group_scores'].values()) == pytest.approx([90.0] * len(report['group_scores']))
+
+def test_fake_methods_score_as_suspicious():
+    report = AdvancedFusionEngine().generate_detailed_report(FAKE)
+    assert report['authenticity_score'] < 45
+    assert report['classification'] in ('SUSPICIOUS', 'LIKELY_DEEPFAKE', 'AI_GENERATED')
+    assert list(report['individual_scores'].values()) == pytest.approx([30.0] * len(report['individual_scores']))
+
+def test_partial_method_sets_keep_their_polarity():
+    report = AdvancedFusionEngine().generate_detailed_report({'blink': 0.95, 'head_pose': 0.9})
+    assert report['authenticity_score'] > 90
+    assert list(report['group_scores']) == ['Facial Analysis']
+
+@pytest.fixture
+def detector():
+    pytest.importorskip('torch')
+    from detectors.simple_pretrained_detector import SimplePretrainedDetector
+    
+    detector = SimplePretrainedDetector.__new__(SimplePretrainedDetector)
+    detector.profile = get_profile('forensic')
+    detector.device = 'cpu'
+    return detector
+
+def build(detector, method_results):
+    return detector.build_video_result([60.0] * 10, [0.8] * 10, method_results, {'executed': list(method_results)})
+
+def test_natural_methods_do_not_lower_the_cnn_verdict(detector):
+    result = build(detector, NATURAL)
+    assert result['authenticity_score'] >= 60.0
+    assert result['classification'] == 'AUTHENTIC_HUMAN'
+
+def test_fake_methods_lower_the_cnn_verdict(detector):
+    assert build(detector, FAKE)['authenticity_score'] < build(detector, {})['authenticity_score'] == 60.0
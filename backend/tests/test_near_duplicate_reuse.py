@@ -0,0 +1,87 @@
+import sys
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+import routes.analysis as analysis
+from core.analysis_profiles import get_profile
+from services.near_duplicates import NearDuplicateIndex
+from services.result_cache import ResultCache
+from utils.perceptual_hash import perceptual_hashes
+
+class FakeDetector:
+    """Stands in for SimplePretrainedDetector: a fixed CNN score and a switchable watermark"""
+    
+    score = 80.0
+    watermark = False
+    
+    def __init__(self, profile=None):
+        pass
+    
+    @staticmethod
+    def filename_suggests_ai(filename):
+        return 'ai' in filename.lower()
+    
+    def forces_ai_verdict(self, image, filename=None):
+        return self.filename_suggests_ai(filename) or self.watermark
+    
+    def quick_score(self, image):
+        return self.score
+
+def photo(seed):
+    rng = np.random.default_rng(seed)
+    return cv2.resize(rng.integers(0, 255, (16, 16, 3), dtype=np.uint8), (256, 256))
+
+@pytest.fixture
+def cached(monkeypatch):
+    """Result cache and near-duplicate index holding one analysed image with a forced AI verdict"""
+    module = types.ModuleType('detectors.simple_pretrained_detector')
+    module.SimplePretrainedDetector = FakeDetector
+    monkeypatch.setitem(sys.modules, 'detectors.simple_pretrained_detector', module)
+    monkeypatch.setattr(FakeDetector, 'watermark', False)
+    
+    cache, index = ResultCache(), NearDuplicateIndex()
+    monkeypatch.setattr(analysis, 'get_result_cache', lambda db: cache)
+    monkeypatch.setattr(analysis, 'get_near_duplicate_index', lambda db: index)
+    
+    profile = get_profile('fast')
+    image = photo(1)
+    cache.put('a' * 64, profile, {
+        'authenticity_score': 5.0,
+        'individual_scores': {'pretrained_cnn': 5.0},
+        'individual_scores_metadata': {'cnn_score': 80.0, 'forced_ai': True}
+    }, file_type='image')
+    index.add(perceptual_hashes(image), 'a' * 64)
+    return profile, image
+
+def find(profile, image, filename='copy.jpg'):
+    entry, info, _ = analysis.find_reusable_result(None, None, 'b' * 64, 'image', filename, profile, image=image)
+    return entry, info
+
+def test_confirmation_compares_unforced_cnn_scores(cached):
+    profile, image = cached
+    entry, info = find(profile, cv2.GaussianBlur(image, (3, 3), 0))
+    assert info['match'] == 'near_duplicate' and info['confirmed']
+    assert entry['result']['authenticity_score'] == 5.0
+
+def test_disagreeing_cnn_score_is_not_reused(cached, monkeypatch):
+    profile, image = cached
+    monkeypatch.setattr(FakeDetector, 'score', 30.0)
+    assert find(profile, image) == (None, None)
+
+def test_watermarked_copy_is_not_reused(cached, monkeypatch):
+    profile, image = cached
+    monkeypatch.setattr(FakeDetector, 'watermark', True)
+    assert find(profile, image) == (None, None)
+
+def test_ai_file_name_is_not_reused(cached):
+    profile, image = cached
+    assert find(profile, image, filename='ai_render.jpg') == (None, None)
+
+def test_entries_without_an_unforced_score_are_not_confirmed(cached):
+    profile, image = cached
+    entry, _ = analysis.get_result_cache(None).get('a' * 64, profile)
+    del entry['result']['individual_scores_metadata']
+    assert find(profile, image) == (None, None)
@@ -0,0 +1,53 @@
+import random
+
+from services.near_duplicates import MultiIndexHash
+from utils.perceptual_hash import HASH_BITS, hamming
+
+def flip(value, positions):
+    for position in positions:
+        value ^= 1 << position
+    return value
+
+def test_search_finds_every_hash_within_the_radius():
+    rng = random.Random(7)
+    index = MultiIndexHash(chunks=4)
+    query = rng.getrandbits(HASH_BITS)
+    # Worst case for the pigeonhole bound: the flipped bits are spread over all chunks
+    for distance in range(0, 12):
+        index.add(f'near-{distance}', flip(query, range(0, distance * 5, 5)), distance)
+    for i in range(200):
+        index.add(f'random-{i}', rng.getrandbits(HASH_BITS), None)
+    
+    matches = index.search(query, 10)
+    expected = sorted(
+        (hamming(query, value), entry_id) for entry_id, (value, _) in index.entries.items()
+        if hamming(query, value) <= 10
+    )
+    assert [(distance, entry_id) for distance, entry_id, _ in matches] == expected
+    assert {entry_id for _, entry_id, _ in matches} >= {f'near-{d}' for d in range(11)}
+    assert 'near-11' not in {entry_id for _, entry_id, _ in matches}
+
+def test_search_orders_nearest_first():
+    index = MultiIndexHash(chunks=4)
+    index.add('far', flip(0, [1, 20, 40]), 'far')
+    index.add('exact', 0, 'exact')
+    index.add('close', flip(0, [63]), 'close')
+    
+    assert [payload for _, _, payload in index.search(0, 4)] == ['exact', 'close', 'far']
+
+def test_probes_grow_with_the_substring_radius():
+    index = MultiIndexHash(chunks=4)
+    # Radius 3 over 4 chunks leaves 0 flips per chunk: one probe each
+    assert len(index.probe_keys(0, 3)) == 4
+    # Radius 4 allows one flip per 16-bit chunk
+    assert len(index.probe_keys(0, 4)) == 4 * (1 + 16)
+
+def test_oldest_entries_are_evicted_from_every_table():
+    index = MultiIndexHash(chunks=4, max_entries=2)
+    index.add('first', 1, None)
+    index.add('second', 2, None)
+    index.add('third', 3, None)
+    
+    assert list(index.entries) == ['second', 'third']
+    assert all('first' not in ids for table in index.tables for ids in table.values())
+    assert index.search(1, 0) == []
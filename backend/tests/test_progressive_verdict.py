@@ -0,0 +1,76 @@
+import pytest
+
+from core.detection_config import PROGRESSIVE_CONFIG
+from core.progressive_verdict import RunningVerdict, progressive_window_count, score_interval, spread_order
+
+def window(index, scores):
+    return {
+        'index': index, 'start_frame': index * 100, 'end_frame': (index + 1) * 100,
+        'frame_scores': scores, 'confidences': [0.9] * len(scores), 'method_scores': {}
+    }
+
+def test_window_count_needs_enough_frames_per_window():
+    assert progressive_window_count(2) == 1
+    assert progressive_window_count(12) == 12 // PROGRESSIVE_CONFIG['min_window_frames']
+    assert progressive_window_count(1000) == PROGRESSIVE_CONFIG['windows']
+
+def test_spread_order_covers_the_clip_coarse_to_fine():
+    order = spread_order(6)
+    assert sorted(order) == list(range(6))
+    assert order[:2] == [0, 5]
+
+def test_interval_contains_the_mean_and_closes_on_the_last_frame():
+    scores = [30.0, 70.0, 45.0, 60.0, 52.0, 38.0]
+    mean, (low, high) = score_interval(scores, 60, 0.95)
+    assert low < mean < high
+    
+    narrower = score_interval(scores, 12, 0.95)[1]
+    assert high - low > narrower[1] - narrower[0]
+    
+    assert score_interval(scores, len(scores), 0.95) == (pytest.approx(sum(scores) / 6), (mean, mean))
+
+def test_interval_widens_for_correlated_frames():
+    independent = [40.0, 60.0] * 8
+    correlated = [40.0] * 8 + [60.0] * 8
+    low, high = score_interval(independent, 160, 0.95)[1]
+    correlated_low, correlated_high = score_interval(correlated, 160, 0.95)[1]
+    assert correlated_high - correlated_low > high - low
+
+def test_single_frame_is_undecided():
+    assert score_interval([80.0], 10, 0.95) == (80.0, (0.0, 100.0))
+
+def test_clear_verdict_stops_early_after_the_minimum_windows():
+    verdict = RunningVerdict(windows_total=6, planned_frames=48, early_stop=True)
+    
+    verdict.add(window(0, [90.0, 91.0, 89.0, 90.0, 92.0, 90.0, 91.0, 89.0]))
+    assert not verdict.last['decided']  # one window is below min_windows
+    assert not verdict.should_stop()
+    
+    verdict.add(window(5, [90.0, 88.0, 91.0, 90.0, 89.0, 92.0, 90.0, 91.0]))
+    assert verdict.last['decided']
+    assert verdict.last['leaning'] == 'AUTHENTIC_HUMAN'
+    assert verdict.last['interval'][0] >= PROGRESSIVE_CONFIG['threshold']
+    assert verdict.should_stop()
+    assert verdict.summary(early_stopped=True) == {
+        'windows_analyzed': 2, 'windows_planned': 6, 'interval': verdict.last['interval'],
+        'decided': True, 'early_stopped': True
+    }
+
+def test_no_early_stop_unless_requested_or_when_undecided():
+    requested = RunningVerdict(windows_total=6, planned_frames=48, early_stop=False)
+    for index in (0, 5):
+        requested.add(window(index, [90.0] * 8))
+    assert requested.last['decided'] and not requested.should_stop()
+    
+    borderline = RunningVerdict(windows_total=6, planned_frames=48, early_stop=True)
+    borderline.add(window(0, [20.0, 80.0, 35.0, 65.0, 50.0, 45.0, 70.0, 30.0]))
+    borderline.add(window(5, [60.0, 40.0, 55.0, 48.0, 52.0, 75.0, 25.0, 50.0]))
+    assert not borderline.last['decided']
+    assert not borderline.should_stop()
+
+def test_last_window_never_counts_as_early_stop():
+    verdict = RunningVerdict(windows_total=2, planned_frames=16, early_stop=True)
+    for index in (0, 1):
+        verdict.add(window(index, [10.0] * 8))
+    assert verdict.last['decided'] and verdict.last['leaning'] == 'AI_GENERATED'
+    assert not verdict.should_stop()
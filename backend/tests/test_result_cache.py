@@ -0,0 +1,45 @@
+import numpy as np
+
+import core.detection_registry as registry
+import services.result_cache as result_cache
+from core.analysis_profiles import get_profile
+from services.result_cache import ResultCache
+
+CONTENT_HASH = 'a' * 64
+
+def test_key_is_stable_for_the_same_upload_and_profile():
+    cache = ResultCache()
+    assert cache.make_key(CONTENT_HASH, get_profile('fast')) == cache.make_key(CONTENT_HASH, get_profile('fast'))
+    assert cache.make_key(CONTENT_HASH, get_profile()).startswith(f"{CONTENT_HASH}:{result_cache.DETECTOR_VERSION}:")
+
+def test_key_changes_with_content_profile_and_detector_version(monkeypatch):
+    cache = ResultCache()
+    key = cache.make_key(CONTENT_HASH, get_profile('fast'))
+    
+    assert cache.make_key('b' * 64, get_profile('fast')) != key
+    assert cache.make_key(CONTENT_HASH, get_profile('forensic')) != key
+    assert cache.make_key(CONTENT_HASH, dict(get_profile('fast'), max_frames=1)) != key
+    
+    monkeypatch.setattr(result_cache, 'DETECTOR_VERSION', 'test')
+    assert cache.make_key(CONTENT_HASH, get_profile('fast')) != key
+
+def test_key_changes_with_a_method_version(monkeypatch):
+    cache = ResultCache()
+    profile = get_profile('fast')
+    key = cache.make_key(CONTENT_HASH, profile)
+    
+    method = sorted(profile.get('methods') or registry.DETECTION_METHODS)[0]
+    bumped = dict(registry.DETECTION_METHODS[method], version=registry.DETECTION_METHODS[method]['version'] + 1)
+    monkeypatch.setitem(registry.DETECTION_METHODS, method, bumped)
+    assert cache.make_key(CONTENT_HASH, profile) != key
+
+def test_round_trip_in_memory_with_plain_values():
+    cache = ResultCache()
+    profile = get_profile('fast')
+    assert cache.get(CONTENT_HASH, profile) == (None, None)
+    
+    cache.put(CONTENT_HASH, profile, {'authenticity_score': np.float32(71.5), 'frame_scores': np.array([1.0, 2.0])})
+    entry, tier = cache.get(CONTENT_HASH, profile)
+    assert tier == 'memory'
+    assert entry['result'] == {'authenticity_score': 71.5, 'frame_scores': [1.0, 2.0]}
+    assert cache.get(CONTENT_HASH, get_profile('forensic')) == (None, None)
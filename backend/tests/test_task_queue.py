@@ -0,0 +1,93 @@
+import cv2
+import numpy as np
+import pytest
+from celery.exceptions import Ignore
+
+import services.task_queue as task_queue
+
+class FakeDetector:
+    """Stands in for the worker's SimplePretrainedDetector, scoring each segment by its index"""
+    
+    profile = {'name': 'fast', 'budget_seconds': 3}
+    
+    def __init__(self):
+        self.segments = []
+    
+    def analyze_video_segment(self, video_ref, segment, frame_count, budget_seconds=None):
+        self.segments.append(segment['index'])
+        return {
+            'index': segment['index'],
+            'start_frame': segment['start_frame'],
+            'end_frame': segment['end_frame'],
+            'frame_scores': [10.0 * (segment['index'] + 1)] * frame_count,
+            'confidences': [0.8] * frame_count,
+            'method_scores': {'optical_flow': 0.5},
+            'skipped': {},
+            'embeddings': {},
+            'triage': None,
+            'elapsed_seconds': 0.1
+        }
+    
+    def build_video_result(self, frame_scores, confidences, method_results, score_metadata, extra_summary=None):
+        return {
+            'authenticity_score': float(np.mean(frame_scores)),
+            'analysis_summary': extra_summary,
+            'individual_scores_metadata': score_metadata
+        }
+    
+    def apply_embedding_index(self, result, embeddings, index_result=True):
+        pass
+
+@pytest.fixture
+def video_path(tmp_path):
+    path = str(tmp_path / 'clip.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+    rng = np.random.default_rng(0)
+    for _ in range(250):
+        writer.write(rng.integers(0, 255, (48, 64, 3), dtype=np.uint8))
+    writer.release()
+    return path
+
+@pytest.fixture
+def worker(monkeypatch):
+    detector = FakeDetector()
+    saved = {}
+    
+    def save_analysis(result, user_id, file_id, filename, profile, cloudinary_url=None):
+        saved['result'] = result
+        return {'file_id': file_id, 'authenticity_score': result['authenticity_score']}
+    
+    monkeypatch.setattr(task_queue, 'get_detector', lambda profile_name=None: detector)
+    monkeypatch.setattr(task_queue, 'save_analysis', save_analysis)
+    return detector, saved
+
+def test_video_task_runs_segment_chord(video_path, worker):
+    detector, saved = worker
+    
+    result = task_queue.async_analyze_video.apply(args=(video_path, 'user', 'file', 'clip.avi', 'fast'))
+    
+    assert result.status == 'SUCCESS'
+    segments = saved['result']['analysis_summary']['segments']
+    assert sorted(detector.segments) == [s['index'] for s in segments]
+    assert len(segments) > 1
+    assert saved['result']['analysis_summary']['failed_segments'] == 0
+    assert saved['result']['individual_scores_metadata']['executed'] == ['optical_flow']
+
+def test_video_task_fails_on_unreadable_video(tmp_path, worker):
+    with pytest.raises(ValueError):
+        task_queue.async_analyze_video.apply(args=(str(tmp_path / 'missing.avi'), 'user', 'file', 'missing.avi', 'fast'))
+
+def test_replaced_video_task_is_not_marked_failed(video_path, worker, monkeypatch):
+    # On a worker replace() ends the task by raising Ignore (eager runs apply the chord inline instead)
+    task = task_queue.async_analyze_video
+    states = []
+    
+    def replace(workflow):
+        raise Ignore('Replaced by new task')
+    
+    monkeypatch.setattr(task, 'replace', replace)
+    monkeypatch.setattr(task, 'update_state', lambda state=None, meta=None: states.append(state))
+    
+    with pytest.raises(Ignore):
+        task.run(video_path, 'user', 'file', 'clip.avi', 'fast')
+    assert states == ['PROCESSING']
@@ -0,0 +1,94 @@
+import hashlib
+import io
+
+import pytest
+from flask import Flask, jsonify, request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+import utils.upload_stream as upload_stream
+from services.file_service import FileService
+from utils.upload_stream import UploadRequest, UploadStream, sniff_media_kind
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+MP4 = b'\x00\x00\x00\x18ftypisom' + b'\x00' * 64
+
+@pytest.mark.parametrize('header, kind', [
+    (b'\xff\xd8\xff\xe0\x00\x10JFIF', 'image'),
+    (PNG, 'image'),
+    (b'GIF89a\x01\x00', 'image'),
+    (b'RIFF\x00\x00\x00\x00WEBPVP8 ', 'image'),
+    (b'RIFF\x00\x00\x00\x00AVI LIST', 'video'),
+    (b'\x00\x00\x00\x1cftypavif', 'image'),
+    (MP4, 'video'),
+    (b'\x00\x00\x00\x08moov', 'video'),
+    (b'\x1a\x45\xdf\xa3\x01\x00', 'video'),
+    (b'plain text file!', None)
+])
+def test_sniff_media_kind(header, kind):
+    assert sniff_media_kind(header[:upload_stream.SNIFF_BYTES]) == kind
+
+def test_stream_hashes_sniffs_and_spills():
+    data = PNG * 100
+    with UploadStream(max_bytes=None, memory_bytes=1024, suffix='.png') as upload:
+        for offset in range(0, len(data), 7):
+            upload.write(data[offset:offset + 7])
+        assert upload.sniffed_kind == 'image'
+        assert upload.content_hash == hashlib.sha256(data).hexdigest()
+        assert not upload.in_memory
+        upload.seek(0)
+        assert upload.read() == data
+
+def test_stream_refuses_bytes_over_the_limit():
+    upload = UploadStream(max_bytes=10, memory_bytes=1024)
+    upload.write(b'x' * 10)
+    with pytest.raises(RequestEntityTooLarge):
+        upload.write(b'x')
+    upload.close()
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(upload_stream.UPLOAD_CONFIG, 'max_bytes', {'image': 1024, 'video': 4096})
+    monkeypatch.setitem(upload_stream.UPLOAD_CONFIG, 'form_overhead_bytes', 512)
+    
+    app = Flask(__name__)
+    app.request_class = UploadRequest
+    file_service = FileService()
+    
+    @app.route('/upload', methods=['POST'])
+    def upload():
+        file = request.files['file']
+        is_valid, result = file_service.validate_file(file)
+        if not is_valid:
+            return jsonify({'error': result}), 400
+        return jsonify(dict(result, sha256=file.stream.content_hash, in_memory=file.stream.in_memory))
+    
+    @app.errorhandler(413)
+    def request_too_large(error):
+        return jsonify({'error': error.description}), 413
+    
+    return app.test_client()
+
+def post(client, data, filename):
+    return client.post('/upload', data={'file': (io.BytesIO(data), filename)}, content_type='multipart/form-data')
+
+def test_upload_is_hashed_while_streamed(client):
+    response = post(client, PNG, 'face.png')
+    assert response.status_code == 200
+    assert response.get_json()['sha256'] == hashlib.sha256(PNG).hexdigest()
+    assert response.get_json()['in_memory']
+    assert response.get_json()['type'] == 'image'
+
+def test_content_must_match_the_extension(client):
+    response = post(client, PNG, 'clip.mp4')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'File content does not match its extension'
+    
+    assert post(client, MP4, 'clip.mp4').status_code == 200
+
+def test_oversized_upload_is_refused_with_413(client):
+    # Over the image limit, though a video this size would be accepted
+    response = post(client, PNG + b'\x00' * 2048, 'face.png')
+    assert response.status_code == 413
+    assert 'File too large' in response.get_json()['error']
+    
+    assert post(client, MP4 + b'\x00' * 2048, 'clip.mp4').status_code == 200
@@ -1,11 +1,31 @@
-from threading import Thread
-from queue import Queue
+from threading import Thread, Lock, Condition
+from collections import OrderedDict, deque
+import math
 import time
+from utils.fair_scheduler import FairScheduler
+
+FINISHED_STATES = ('completed', 'failed')
+
+class QueueFullError(Exception):
+    """Raised by TaskQueue.submit when the queue is at capacity"""
+    
+    def __init__(self, retry_after):
+        super().__init__(f"Task queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
 
 class TaskQueue:
-    def __init__(self, max_workers=4):
-        self.queue = Queue()
-        self.results = {}
+    """Bounded worker pool; waiting tasks are ordered by a FairScheduler"""
+    
+    def __init__(self, max_workers=4, max_queue_size=0, result_ttl=3600, max_results=1000, scheduler=None):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size  # 0 = unbounded
+        self.scheduler = scheduler or FairScheduler()
+        self.ready = Condition()
+        self.results = OrderedDict()
+        self.result_ttl = result_ttl
+        self.max_results = max_results
+        self.lock = Lock()
+        self.durations = deque(maxlen=50)  # Recent task run times, for Retry-After estimates
         self.workers = []
         
         for _ in range(max_workers):
@@ -13,28 +33,117 @@ class TaskQueue:
             worker.start()
             self.workers.append(worker)
     
+    def _next_task(self):
+        with self.ready:
+            while True:
+                task = self.scheduler.next_ready()
+                if task is not None:
+                    return task
+                self.ready.wait()
+    
     def _worker(self):
         while True:
+            task_id, (func, args, kwargs), owner, _ = self._next_task()
+            started = time.time()
+            self._update(task_id, status='running', started_at=started)
             try:
-                task_id, func, args, kwargs = self.queue.get()
                 result = func(*args, **kwargs)
-                self.results[task_id] = {'status': 'completed', 'result': result}
+                self._update(task_id, status='completed', result=result, progress=100)
             except Exception as e:
-                self.results[task_id] = {'status': 'failed', 'error': str(e)}
+                self._update(task_id, status='failed', error=str(e))
             finally:
-                self.queue.task_done()
+                finished = time.time()
+                self._update(task_id, completed_at=finished)
+                with self.lock:
+                    self.durations.append(finished - started)
+                self.scheduler.release(owner)
+                # A capped owner may have become eligible again
+                with self.ready:
+                    self.ready.notify_all()
     
-    def submit(self, task_id, func, *args, **kwargs):
-        self.results[task_id] = {'status': 'pending'}
-        self.queue.put((task_id, func, args, kwargs))
+    def _update(self, task_id, **fields):
+        with self.lock:
+            entry = self.results.get(task_id)
+            if entry is not None:
+                entry.update(fields)
+    
+    def submit(self, task_id, func, *args, metadata=None, owner=None, priority_class=None, cost=None, **kwargs):
+        """Queue a task for fair scheduling.
+        
+        Raises QueueFullError when max_queue_size tasks are waiting or the
+        owner already has its maximum number of tasks queued.
+        """
+        self.cleanup_old_results()
+        with self.ready:
+            queue_full = self.max_queue_size and self.scheduler.pending_count() >= self.max_queue_size
+            if queue_full or not self.scheduler.can_accept(owner):
+                raise QueueFullError(self.estimate_retry_after())
+            
+            with self.lock:
+                self.results[task_id] = {
+                    'status': 'pending',
+                    'progress': 0,
+                    'message': 'Queued',
+                    'submitted_at': time.time(),
+                    'priority_class': self.scheduler.classify(requested=priority_class),
+                    **(metadata or {})
+                }
+            self.scheduler.enqueue(task_id, (func, args, kwargs), owner=owner, priority_class=priority_class, cost=cost)
+            self.ready.notify()
         return task_id
     
+    def update_progress(self, task_id, progress, message, verdict=None):
+        """Record progress reported by a running task, with its latest running verdict if any"""
+        fields = {'verdict': verdict} if verdict is not None else {}
+        self._update(task_id, progress=progress, message=message, updated_at=time.time(), **fields)
+    
     def get_result(self, task_id):
-        return self.results.get(task_id, {'status': 'not_found'})
+        self.cleanup_old_results()
+        with self.lock:
+            entry = self.results.get(task_id)
+            return dict(entry) if entry is not None else {'status': 'not_found'}
+    
+    def estimate_retry_after(self):
+        """Seconds until a queue slot is likely to free up"""
+        with self.lock:
+            average = sum(self.durations) / len(self.durations) if self.durations else 30.0
+        # The head of the queue starts once any of the workers finishes
+        return max(1, math.ceil(average * max(1, self.scheduler.pending_count()) / max(1, self.max_workers)))
+    
+    def cleanup_old_results(self, max_age=None):
+        """Evict finished results older than max_age seconds, then the oldest beyond max_results"""
+        max_age = self.result_ttl if max_age is None else max_age
+        now = time.time()
+        with self.lock:
+            expired = [
+                task_id for task_id, entry in self.results.items()
+                if entry['status'] in FINISHED_STATES and now - entry.get('completed_at', now) > max_age
+            ]
+            for task_id in expired:
+                del self.results[task_id]
+            
+            # Bounded retention: drop the oldest finished results first
+            overflow = len(self.results) - self.max_results
+            if overflow > 0:
+                finished = [t for t, e in self.results.items() if e['status'] in FINISHED_STATES]
+                for task_id in finished[:overflow]:
+                    del self.results[task_id]
+                    expired.append(task_id)
+        return len(expired)
     
-    def cleanup_old_results(self, max_age=3600):
-        # Cleanup results older than max_age seconds
-        pass
+    def get_stats(self):
+        """Queue depth, running tasks and retained results"""
+        with self.lock:
+            statuses = [entry['status'] for entry in self.results.values()]
+        return {
+            'workers': self.max_workers,
+            'queued': statuses.count('pending'),
+            'running': statuses.count('running'),
+            'retained_results': len(statuses),
+            'max_queue_size': self.max_queue_size,
+            'result_ttl_seconds': self.result_ttl,
+            'scheduler': self.scheduler.get_metrics()
+        }
 
 # Global task queue
 task_queue = TaskQueue(max_workers=4)
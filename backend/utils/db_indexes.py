@@ -16,6 +16,27 @@ def create_indexes(db):
         db.analyses.create_index('timestamp')
         db.analyses.create_index([('user_id', 1), ('timestamp', -1)])
         db.analyses.create_index('file_id')
+        db.analyses.create_index('content_hash')
+        db.analyses.create_index([('user_id', 1), ('cloudinary_url', 1)])
+        
+        # Result cache indexes (expired entries removed by MongoDB)
+        db.result_cache.create_index('key', unique=True)
+        db.result_cache.create_index('content_hash')
+        db.result_cache.create_index('expires_at', expireAfterSeconds=0)
+        
+        # Perceptual hash index (multi-index hashing substrings)
+        db.perceptual_hashes.create_index('content_hash', unique=True)
+        db.perceptual_hashes.create_index('chunks')
+        db.perceptual_hashes.create_index('expires_at', expireAfterSeconds=0)
+        
+        # Video fingerprint index (keyframe hash substrings)
+        db.video_fingerprints.create_index('content_hash', unique=True)
+        db.video_fingerprints.create_index('chunks')
+        db.video_fingerprints.create_index('expires_at', expireAfterSeconds=0)
+        
+        # Per-method output memo
+        db.method_memo.create_index('key', unique=True)
+        db.method_memo.create_index('expires_at', expireAfterSeconds=0)
         
         # OTP collection indexes
         db.otps.create_index('email')
@@ -0,0 +1,159 @@
+from threading import Lock
+from collections import deque
+import time
+import numpy as np
+from core.detection_config import FAIR_SCHEDULING_CONFIG
+
+class FairScheduler:
+    """Weighted fair queuing of analysis jobs across priority classes and users.
+    
+    Classes share worker time in proportion to their weights (stride
+    scheduling on predicted cost); inside a class every user is a flow
+    with start-time fair queuing tags, so one user's backlog cannot starve
+    another. Users at their concurrency cap are skipped until a job of
+    theirs finishes. Jobs without an owner are never capped.
+    """
+    
+    def __init__(self, class_weights=None, per_user_concurrency=None, max_pending_per_user=None,
+                 user_weights=None):
+        config = FAIR_SCHEDULING_CONFIG
+        self.class_weights = dict(class_weights or config['class_weights'])
+        self.per_user_concurrency = per_user_concurrency or config['per_user_concurrency']
+        self.max_pending_per_user = max_pending_per_user or config['max_pending_per_user']
+        self.user_weights = dict(user_weights or config['user_weights'])
+        self.default_class = config['default_class']
+        self.lock = Lock()
+        
+        self._flows = {cls: {} for cls in self.class_weights}  # class -> owner -> deque of jobs
+        self._virtual_time = {cls: 0.0 for cls in self.class_weights}
+        self._class_pass = {cls: 0.0 for cls in self.class_weights}
+        self._last_finish = {}  # (class, owner) -> finish tag of the owner's last job
+        self._pending = {}  # owner -> queued jobs
+        self._running = {}  # owner -> running jobs
+        self._waits = {cls: deque(maxlen=config['wait_window']) for cls in self.class_weights}
+        self._dispatched = {cls: 0 for cls in self.class_weights}
+    
+    def classify(self, file_type=None, requested=None):
+        """Priority class for a job: an explicit valid request, else by media type"""
+        if requested in self.class_weights:
+            return requested
+        if file_type == 'image':
+            return 'interactive'
+        if file_type == 'video':
+            return 'video'
+        return self.default_class
+    
+    def can_accept(self, owner):
+        """Whether the owner is below its queued-job limit"""
+        with self.lock:
+            return owner is None or self._pending.get(owner, 0) < self.max_pending_per_user
+    
+    def enqueue(self, task_id, item, owner=None, priority_class=None, cost=None):
+        """Queue a job; cost is its predicted run time in seconds"""
+        cls = priority_class if priority_class in self.class_weights else self.default_class
+        cost = max(1e-3, float(cost or FAIR_SCHEDULING_CONFIG['default_cost_seconds']))
+        
+        with self.lock:
+            if not self._has_pending(cls):
+                # A class waking up joins at the current pass, it earns no credit for idle time
+                active = [self._class_pass[c] for c in self.class_weights if self._has_pending(c)]
+                self._class_pass[cls] = max(self._class_pass[cls], min(active, default=self._class_pass[cls]))
+            
+            start = max(self._virtual_time[cls], self._last_finish.get((cls, owner), 0.0))
+            finish = start + cost / self.user_weights.get(owner, 1)
+            self._last_finish[(cls, owner)] = finish
+            
+            self._flows[cls].setdefault(owner, deque()).append({
+                'task_id': task_id,
+                'item': item,
+                'owner': owner,
+                'cost': cost,
+                'start_tag': start,
+                'finish_tag': finish,
+                'enqueued_at': time.time()
+            })
+            self._pending[owner] = self._pending.get(owner, 0) + 1
+    
+    def _has_pending(self, cls):
+        return any(self._flows[cls].values())
+    
+    def _eligible(self, owner):
+        return owner is None or self._running.get(owner, 0) < self.per_user_concurrency
+    
+    def next_ready(self):
+        """Pop the next job to run as (task_id, item, owner, priority_class), or None"""
+        with self.lock:
+            best = None
+            for cls, flows in self._flows.items():
+                heads = [queue[0] for owner, queue in flows.items() if queue and self._eligible(owner)]
+                if not heads:
+                    continue
+                head = min(heads, key=lambda job: job['finish_tag'])
+                key = (self._class_pass[cls], -self.class_weights[cls])
+                if best is None or key < best[0]:
+                    best = (key, cls, head)
+            
+            if best is None:
+                return None
+            
+            _, cls, job = best
+            owner = job['owner']
+            queue = self._flows[cls][owner]
+            queue.popleft()
+            if not queue:
+                del self._flows[cls][owner]
+            
+            self._virtual_time[cls] = job['start_tag']
+            self._class_pass[cls] += job['cost'] / self.class_weights[cls]
+            self._pending[owner] -= 1
+            if not self._pending[owner]:
+                del self._pending[owner]
+            self._running[owner] = self._running.get(owner, 0) + 1
+            self._waits[cls].append(time.time() - job['enqueued_at'])
+            self._dispatched[cls] += 1
+            
+            return job['task_id'], job['item'], owner, cls
+    
+    def release(self, owner):
+        """Mark one of the owner's running jobs as finished"""
+        with self.lock:
+            running = self._running.get(owner, 0) - 1
+            if running > 0:
+                self._running[owner] = running
+            else:
+                self._running.pop(owner, None)
+    
+    def pending_count(self):
+        with self.lock:
+            return sum(self._pending.values())
+    
+    def running_count(self):
+        with self.lock:
+            return sum(self._running.values())
+    
+    def get_metrics(self):
+        """Queue depth and recent wait times per priority class"""
+        with self.lock:
+            classes = {}
+            for cls, flows in self._flows.items():
+                waits = np.array(self._waits[cls]) if self._waits[cls] else None
+                classes[cls] = {
+                    'weight': self.class_weights[cls],
+                    'pending': sum(len(queue) for queue in flows.values()),
+                    'waiting_users': sum(1 for queue in flows.values() if queue),
+                    'dispatched': self._dispatched[cls],
+                    'wait_seconds': {
+                        'mean': round(float(waits.mean()), 3),
+                        'p50': round(float(np.percentile(waits, 50)), 3),
+                        'p95': round(float(np.percentile(waits, 95)), 3),
+                        'max': round(float(waits.max()), 3)
+                    } if waits is not None else None
+                }
+            return {
+                'classes': classes,
+                'pending': sum(self._pending.values()),
+                'running': sum(self._running.values()),
+                'users_running': len([o for o in self._running if o is not None]),
+                'per_user_concurrency': self.per_user_concurrency,
+                'max_pending_per_user': self.max_pending_per_user
+            }
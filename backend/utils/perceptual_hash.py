@@ -0,0 +1,42 @@
+import cv2
+import numpy as np
+
+HASH_BITS = 64
+
+def phash(image):
+    """64-bit DCT perceptual hash: low frequencies of a 32x32 grey thumbnail against their median"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    # The DC term only encodes mean brightness, leave it out of the median
+    bits = low > np.median(low[1:])
+    return _pack(bits)
+
+def dhash(image):
+    """64-bit difference hash: sign of horizontal gradients on a 9x8 grey thumbnail"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return _pack(bits)
+
+def _pack(bits):
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+def perceptual_hashes(image):
+    """Both hashes of a BGR image as a dict of 16-digit hex strings"""
+    return {'phash': f"{phash(image):016x}", 'dhash': f"{dhash(image):016x}"}
+
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def hamming_matrix(a, b):
+    """Pairwise Hamming distances between two arrays of 64-bit hashes, shape (len(a), len(b))"""
+    a = np.asarray(a, dtype=np.uint64)
+    b = np.asarray(b, dtype=np.uint64)
+    xor = np.bitwise_xor(a[:, None], b[None, :])
+    return _POPCOUNT[xor.view(np.uint8)].reshape(len(a), len(b), 8).sum(axis=2, dtype=np.int32)
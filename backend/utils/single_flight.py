@@ -0,0 +1,82 @@
+from threading import Lock, Event
+from core.detection_config import PERFORMANCE_CONFIG
+
+class _Flight:
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+        self.subscribers = []
+        self.last_progress = None
+
+class SingleFlight:
+    """Collapse identical concurrent calls into one execution.
+    
+    The first caller for a key runs the function; callers arriving while
+    it runs wait for and share its result (or exception). Progress the
+    leader reports (with any extra arguments, e.g. a running verdict) is
+    fanned out to every attached caller's callback.
+    """
+    
+    def __init__(self, timeout=None):
+        self.timeout = timeout or PERFORMANCE_CONFIG['timeout_seconds']
+        self.lock = Lock()
+        self.flights = {}
+        self.stats = {'leaders': 0, 'coalesced': 0, 'failed': 0}
+    
+    def do(self, key, fn, progress_callback=None):
+        """Run fn(progress) once per key in flight; returns (result, coalesced)"""
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self.flights[key] = flight
+                self.stats['leaders'] += 1
+            else:
+                self.stats['coalesced'] += 1
+            if progress_callback:
+                flight.subscribers.append(progress_callback)
+            last_progress = flight.last_progress
+        
+        if not leader:
+            if progress_callback and last_progress:
+                progress_callback(*last_progress)
+            if not flight.done.wait(self.timeout):
+                raise TimeoutError(f"Timed out waiting for in-flight analysis {key}")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        
+        def broadcast(progress, message, *extra):
+            with self.lock:
+                flight.last_progress = (progress, message, *extra)
+                subscribers = list(flight.subscribers)
+            for subscriber in subscribers:
+                try:
+                    subscriber(progress, message, *extra)
+                except Exception as e:
+                    print(f"Progress fan-out error: {e}")
+        
+        try:
+            flight.result = fn(broadcast)
+            return flight.result, False
+        except Exception as e:
+            flight.error = e
+            with self.lock:
+                self.stats['failed'] += 1
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+    
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['in_flight'] = len(self.flights)
+            stats['attached'] = sum(len(f.subscribers) for f in self.flights.values())
+        return stats
+
+# Global coalescer for analyses keyed by content hash
+analysis_flights = SingleFlight()
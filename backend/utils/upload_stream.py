@@ -0,0 +1,172 @@
+import hashlib
+import io
+import os
+import tempfile
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+from core.detection_config import UPLOAD_CONFIG
+
+MEDIA_EXTENSIONS = {
+    'image': {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'},
+    'video': {'.mp4', '.avi', '.mov', '.webm', '.mkv'}
+}
+
+# ISO-BMFF brands of still images; every other ftyp box is a video container
+IMAGE_BRANDS = (b'avif', b'avis', b'heic', b'heix', b'mif1', b'msf1')
+QUICKTIME_ATOMS = (b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot')
+SNIFF_BYTES = 16
+
+def media_kind(filename):
+    """'image' or 'video' from a file name's extension, None when unsupported"""
+    ext = os.path.splitext(filename or '')[1].lower()
+    return next((kind for kind, extensions in MEDIA_EXTENSIONS.items() if ext in extensions), None)
+
+def sniff_media_kind(header):
+    """'image' or 'video' from a file's first bytes, None when the signature is not recognised"""
+    if header.startswith((b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n', b'GIF87a', b'GIF89a', b'BM')):
+        return 'image'
+    if header[:4] == b'RIFF':
+        return {b'WEBP': 'image', b'AVI ': 'video'}.get(header[8:12])
+    if header[4:8] == b'ftyp':
+        return 'image' if header[8:12] in IMAGE_BRANDS else 'video'
+    if header[4:8] in QUICKTIME_ATOMS or header.startswith(b'\x1a\x45\xdf\xa3'):  # MP4/QuickTime atoms, Matroska/WebM
+        return 'video'
+    return None
+
+def size_label(size):
+    return f"{size // (1024 * 1024)}MB"
+
+class UploadStream:
+    """Destination werkzeug streams one uploaded file into while parsing the request body.
+    
+    Bytes are hashed (SHA-256), counted and sniffed as they arrive, so the
+    upload is never read back for validation. Images up to memory_bytes
+    stay in memory; videos and larger files go straight to a temp file
+    with the upload's extension, which then is the analysis input rather
+    than a second copy. close() deletes that file unless keep() handed it
+    over to the caller.
+    """
+    
+    def __init__(self, max_bytes, memory_bytes, suffix=''):
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.suffix = suffix
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.header = b''
+        self.buffer = io.BytesIO()
+        self.file = None
+        self.path = None
+        self.kept = False
+        self.closed = False
+        if not memory_bytes:
+            self._spill()
+    
+    def _spill(self):
+        fd, self.path = tempfile.mkstemp(suffix=self.suffix)
+        self.file = os.fdopen(fd, 'w+b')
+        position = self.buffer.tell()
+        self.file.write(self.buffer.getbuffer())
+        self.file.seek(position)
+        self.buffer = None
+    
+    @property
+    def _active(self):
+        return self.file if self.file is not None else self.buffer
+    
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise RequestEntityTooLarge(f"File too large. Maximum size: {size_label(self.max_bytes)}")
+        if len(self.header) < SNIFF_BYTES:
+            self.header += bytes(data[:SNIFF_BYTES - len(self.header)])
+        self.hasher.update(data)
+        if self.file is None and self.size > self.memory_bytes:
+            self._spill()
+        return self._active.write(data)
+    
+    def read(self, size=-1):
+        return self._active.read(size)
+    
+    def readline(self, size=-1):
+        return self._active.readline(size)
+    
+    def seek(self, offset, whence=0):
+        return self._active.seek(offset, whence)
+    
+    def tell(self):
+        return self._active.tell()
+    
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+    
+    def readable(self):
+        return True
+    
+    def writable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    @property
+    def content_hash(self):
+        return self.hasher.hexdigest()
+    
+    @property
+    def sniffed_kind(self):
+        return sniff_media_kind(self.header)
+    
+    @property
+    def in_memory(self):
+        return self.file is None
+    
+    def getbuffer(self):
+        """The in-memory bytes without a copy (in-memory uploads only)"""
+        return self.buffer.getbuffer()
+    
+    def keep(self):
+        """Path of the upload on disk, written out if it was in memory, owned by the caller from now on"""
+        if self.file is None:
+            self._spill()
+        self.file.flush()
+        self.kept = True
+        return self.path
+    
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.file is not None:
+            self.file.close()
+            if not self.kept:
+                try:
+                    os.remove(self.path)
+                except OSError as e:
+                    print(f"Upload cleanup error: {e}")
+        self.buffer = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+class UploadRequest(Request):
+    """Request class that parses file uploads into UploadStreams.
+    
+    The per-type size limit is checked against Content-Length when the
+    file part starts, before any of its bytes are read, and again while
+    streaming for bodies without a length.
+    """
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        kind = media_kind(filename)
+        max_bytes = UPLOAD_CONFIG['max_bytes'].get(kind) or max(UPLOAD_CONFIG['max_bytes'].values())
+        if total_content_length and total_content_length > max_bytes + UPLOAD_CONFIG['form_overhead_bytes']:
+            raise RequestEntityTooLarge(f"File too large. Maximum size: {size_label(max_bytes)}")
+        memory_bytes = UPLOAD_CONFIG['memory_image_bytes'] if kind != 'video' else 0
+        # The part's file name is client input, only a known extension reaches the temp file name
+        suffix = os.path.splitext(filename)[1].lower() if kind else ''
+        return UploadStream(max_bytes, memory_bytes, suffix)
@@ -0,0 +1,100 @@
+import cv2
+import numpy as np
+from core.detection_config import VIDEO_FINGERPRINT_CONFIG, SAMPLING_CONFIG
+from utils.perceptual_hash import phash
+
+AUDIO_BANDS = np.geomspace(300, 3000, 18)  # 17 bands, 16 band-difference bits
+
+def keyframe_indices(fps, total_frames, rate, max_seconds):
+    """Frame index of every 1/rate seconds over the first max_seconds of the clip"""
+    step = fps / rate
+    count = min(int(total_frames / step) + 1, int(max_seconds * rate))
+    return [i for i in (int(round(k * step)) for k in range(count)) if i < total_frames]
+
+def keyframe_hashes(cap, indices):
+    """pHash of each keyframe as hex, None for flat frames and frames that cannot be read"""
+    hashes = []
+    # Dense keyframes decode straight through, sparse ones seek
+    sequential = len(indices) > 1 and indices[1] - indices[0] <= SAMPLING_CONFIG['sequential_stride']
+    position = 0
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for frame_idx in indices:
+        if sequential:
+            while position < frame_idx and cap.grab():
+                position += 1
+            ret, frame = cap.read()
+            position += 1
+        else:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            ret, frame = cap.read()
+        if not ret:
+            hashes.append(None)
+            continue
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        hashes.append(f"{phash(gray):016x}" if gray.std() >= VIDEO_FINGERPRINT_CONFIG['min_std'] else None)
+    return hashes
+
+def audio_fingerprint(path, rate, count):
+    """16-bit sub-fingerprint per 1/rate seconds of soundtrack, None where silent.
+    
+    Bits are the signs of band-energy differences between adjacent bands,
+    differenced over time (Haitsma-Kalker), which survive re-encoding and
+    volume changes. Returns None when the clip has no decodable audio.
+    """
+    try:
+        import librosa
+        from analysis.audio_analysis import AUDIO_SAMPLE_RATE
+        # Only the seconds the keyframes cover are decoded
+        audio, sr = librosa.load(path, sr=AUDIO_SAMPLE_RATE, duration=count / rate)
+    except Exception as e:
+        print(f"Audio fingerprint unavailable: {e}")
+        return None
+    
+    hop = int(sr / rate)
+    n = min(count, len(audio) // hop) if hop else 0
+    if n < 2:
+        return None
+    
+    frames = audio[:n * hop].reshape(n, hop) * np.hanning(hop)
+    spectrum = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+    freqs = np.fft.rfftfreq(hop, 1.0 / sr)
+    energies = np.stack([
+        spectrum[:, (freqs >= low) & (freqs < high)].sum(axis=1)
+        for low, high in zip(AUDIO_BANDS[:-1], AUDIO_BANDS[1:])
+    ], axis=1)
+    band_diff = energies[:, :-1] - energies[:, 1:]
+    bits = np.vstack([np.zeros((1, band_diff.shape[1]), dtype=bool), (band_diff[1:] - band_diff[:-1]) > 0])
+    values = bits.astype(np.int64) @ (1 << np.arange(bits.shape[1], dtype=np.int64))
+    
+    silent = energies.sum(axis=1) <= 1e-6 * max(float(energies.sum(axis=1).max()), 1e-12)
+    return [None if quiet or k == 0 else int(v) for k, (v, quiet) in enumerate(zip(values, silent))]
+
+def video_fingerprint(path, max_seconds=None):
+    """Temporal fingerprint of a video: keyframe pHashes and audio sub-fingerprints on one time grid.
+    
+    Covers the first max_seconds (VIDEO_FINGERPRINT_CONFIG['max_seconds']
+    by default); duration is always that of the whole clip.
+    """
+    rate = VIDEO_FINGERPRINT_CONFIG['rate']
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return None
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        fps = fps if fps and fps > 0 else 30.0
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        indices = keyframe_indices(fps, total_frames, rate, max_seconds or VIDEO_FINGERPRINT_CONFIG['max_seconds'])
+        if not indices:
+            return None
+        keyframes = keyframe_hashes(cap, indices)
+    finally:
+        cap.release()
+    
+    if not any(keyframes):
+        return None
+    return {
+        'rate': rate,
+        'duration': round(total_frames / fps, 2),
+        'keyframes': keyframes,
+        'audio': audio_fingerprint(path, rate, len(keyframes))
+    }
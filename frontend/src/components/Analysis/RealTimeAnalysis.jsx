@@ -39,7 +39,7 @@ const RealTimeAnalysis = ({ file, onComplete }) => {
         if (data.session_id) {
           setSessionId(data.session_id);
           const eventSource = new EventSource(
-            `http://localhost:8000/api/progress/${data.session_id}`
+            `http://localhost:8000/api/progress/${data.session_id}?token=${encodeURIComponent(localStorage.getItem("token") || "")}`
           );
 
           eventSource.onmessage = (event) => {
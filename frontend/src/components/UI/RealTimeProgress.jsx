@@ -8,7 +8,7 @@ const RealTimeProgress = ({ sessionId, onComplete }) => {
     if (!sessionId) return;
 
     const eventSource = new EventSource(
-      `${process.env.REACT_APP_API_URL || 'http://localhost:8000'}/api/progress/${sessionId}`,
+      `${process.env.REACT_APP_API_URL || 'http://localhost:8000'}/api/progress/${sessionId}?token=${encodeURIComponent(localStorage.getItem('token') || '')}`,
       { withCredentials: true }
     );
 